@@ -1,17 +1,29 @@
+import heapq
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Iterable, List, Optional
 from points_util.points_classes import *
+from points_util.query_stats import QueryStats, QueryTracer
+from points_util.spatial_index import query_stats, sample_parts
+from points_util.tree_format import save_kdtree_flat, load_kdtree_flat
 
 class KDNode:
     def __init__(self, point: Point, left=None, right=None):
         self.point = point
         self.left = left  # Lewe/Dolne dziecko
         self.right = right  # Prawe/Górne dziecko
+        # liczba punktów w poddrzewie (do sample)
+        self.size = 1 + (left.size if left is not None else 0) + (right.size if right is not None else 0)
 
 
 class KDTree:
+    # (minx, miny, maxx, maxy) punktów - obszar korzenia dla sample; None = policz przy pierwszym użyciu
+    _bbox = None
+
     def __init__(self, points: List[Point]):
         self.root = self._build(points, depth=0)
+        if points:
+            # _build posortował listę po x (oś korzenia)
+            self._bbox = (points[0].x, min(p.y for p in points), points[-1].x, max(p.y for p in points))
 
     def _build(self, points: List[Point], depth: int) -> Optional[KDNode]:
         if not points:
@@ -32,12 +44,21 @@ class KDTree:
             right=self._build(points[median_idx + 1:], depth + 1)
         )
 
-    def query_range(self, range_rect: Rect) -> List[Point]:
-        """Zwraca wszystkie punkty znajdujące się wewnątrz podanego prostokąta."""
+    def query_range(self, range_rect: Rect, tracer: Optional[QueryTracer] = None) -> List[Point]:
+        """
+        Zwraca wszystkie punkty znajdujące się wewnątrz podanego prostokąta.
+        tracer: opcjonalne zaczepy przejścia (QueryTracer, np. QueryStats).
+        """
         result = []
-        self._search(self.root, range_rect, 0, result)
+        if tracer is not None:
+            self._search_traced(self.root, range_rect, 0, result, tracer)
+        else:
+            self._search(self.root, range_rect, 0, result)
         return result
 
+    # wspólna nazwa z pozostałymi indeksami (SpatialIndex)
+    query = query_range
+
     def _search(self, node: KDNode, range_rect: Rect, depth: int, result: List[Point]):
         if node is None:
             return
@@ -56,8 +77,164 @@ class KDTree:
             low = range_rect.bottom
             high = range_rect.top
 
-        if low < val:
+        # lewe poddrzewo ma współrzędne <= val (remisy z medianą trafiają na lewo),
+        # więc przy low == val też trzeba tam zejść
+        if low <= val:
             self._search(node.left, range_rect, depth + 1, result)
 
         if high >= val:
-            self._search(node.right, range_rect, depth + 1, result)
\ No newline at end of file
+            self._search(node.right, range_rect, depth + 1, result)
+
+    def _search_traced(self, node: KDNode, range_rect: Rect, depth: int, result: List[Point],
+                       tracer: QueryTracer):
+        """
+        To samo co _search, z wywołaniami tracera. Każdy węzeł KD trzyma punkt,
+        więc wejście = jeden test punktu; leaf = węzeł bez dzieci, prune =
+        niepuste poddrzewo, do którego nie schodzimy.
+        """
+        if node is None:
+            return
+
+        tracer.enter(node, depth)
+        if node.left is None and node.right is None:
+            tracer.leaf(node, depth)
+
+        tracer.test(node.point)
+        if range_rect.contains_point(node.point):
+            result.append(node.point)
+            tracer.report(node.point)
+
+        axis = depth % 2
+
+        if axis == 0:  # Oś X
+            val = node.point.x
+            low = range_rect.left
+            high = range_rect.right
+        else:  # Oś Y
+            val = node.point.y
+            low = range_rect.bottom
+            high = range_rect.top
+
+        if low <= val:
+            self._search_traced(node.left, range_rect, depth + 1, result, tracer)
+        elif node.left is not None:
+            tracer.prune(node.left, depth + 1)
+
+        if high >= val:
+            self._search_traced(node.right, range_rect, depth + 1, result, tracer)
+        elif node.right is not None:
+            tracer.prune(node.right, depth + 1)
+
+        tracer.leave(node, depth)
+
+    # ---------------------------------------------- SpatialIndex (points_util.spatial_index)
+    @classmethod
+    def from_points(cls, points: Iterable[Point]) -> "KDTree":
+        return cls(list(points))
+
+    @classmethod
+    def build(cls, xs, ys) -> "KDTree":
+        return cls([Point(float(x), float(y)) for x, y in zip(xs, ys)])
+
+    def count(self, range_rect: Rect) -> int:
+        return len(self.query_range(range_rect))
+
+    def nearest(self, x: float, y: float, k: int = 1) -> List[Point]:
+        """k najbliższych punktów, od najbliższego (gałąź bliższa najpierw, dalsza tylko gdy może pomóc)."""
+        if k <= 0:
+            return []
+        best = []  # kopiec max po odległości: (-odległość^2, licznik, punkt)
+        tie = 0
+        stack = [(self.root, 0, 0.0)]  # (węzeł, głębokość, dolne ograniczenie odległości^2)
+        while stack:
+            node, depth, bound = stack.pop()
+            if node is None or (len(best) == k and bound >= -best[0][0]):
+                continue
+            p = node.point
+            d = (p.x - x) ** 2 + (p.y - y) ** 2
+            if len(best) < k:
+                heapq.heappush(best, (-d, tie, p))
+            elif d < -best[0][0]:
+                heapq.heapreplace(best, (-d, tie, p))
+            tie += 1
+
+            diff = (x - p.x) if depth % 2 == 0 else (y - p.y)
+            near, far = (node.left, node.right) if diff <= 0 else (node.right, node.left)
+            # dalsza strona leży za płaszczyzną podziału - co najmniej |diff| od zapytania
+            stack.append((far, depth + 1, max(bound, diff * diff)))
+            stack.append((near, depth + 1, bound))
+        return [p for _, _, p in sorted(best, key=lambda e: (-e[0], e[1]))]
+
+    def _bounds(self):
+        if self._bbox is None and self.root is not None:
+            xs, ys = [], []
+            stack = [self.root]
+            while stack:
+                node = stack.pop()
+                xs.append(node.point.x)
+                ys.append(node.point.y)
+                stack.extend(c for c in (node.left, node.right) if c is not None)
+            self._bbox = (min(xs), min(ys), max(xs), max(ys))
+        return self._bbox
+
+    def sample(self, range_rect: Rect, k: int, seed=None) -> List[Point]:
+        """
+        Do k losowych punktów z prostokąta (bez powtórzeń, jednostajnie), bez
+        zbierania całego wyniku. Obszar węzła (domknięty, od prostokąta granicznego
+        punktów zawężany płaszczyznami podziału) w całości w range_rect to blok
+        o liczności size; punkty testujemy tylko w węzłach przeciętych brzegiem.
+        Koszt: węzły brzegu + k zejść po size dzieci (k * głębokość), a nie liczba trafień.
+        """
+        if self.root is None:
+            return []
+        left, right = range_rect.left, range_rect.right
+        bottom, top = range_rect.bottom, range_rect.top
+        full, extra = [], []
+        stack = [(self.root, 0, self._bounds())]
+        while stack:
+            node, depth, (x0, y0, x1, y1) = stack.pop()
+            if x1 < left or x0 >= right or y1 < bottom or y0 >= top:
+                continue
+            if left <= x0 and x1 < right and bottom <= y0 and y1 < top:
+                full.append((node, node.size))
+                continue
+            p = node.point
+            if range_rect.contains_point(p):
+                extra.append(p)
+            # lewe poddrzewo ma współrzędne <= val, prawe >= val (jak w _search)
+            if depth % 2 == 0:
+                lo_box, hi_box = (x0, y0, p.x, y1), (p.x, y0, x1, y1)
+            else:
+                lo_box, hi_box = (x0, y0, x1, p.y), (x0, p.y, x1, y1)
+            if node.left is not None:
+                stack.append((node.left, depth + 1, lo_box))
+            if node.right is not None:
+                stack.append((node.right, depth + 1, hi_box))
+        return sample_parts(full, extra, k, seed, KDTree._nth)
+
+    @staticmethod
+    def _nth(node: KDNode, j: int) -> Point:
+        """j-ty punkt poddrzewa w kolejności in-order, po licznościach dzieci."""
+        while True:
+            n_left = node.left.size if node.left is not None else 0
+            if j < n_left:
+                node = node.left
+            elif j == n_left:
+                return node.point
+            else:
+                j -= n_left + 1
+                node = node.right
+
+    def stats(self, range_rect: Rect) -> QueryStats:
+        return query_stats(self, range_rect)
+
+    def save(self, path) -> None:
+        save_kdtree_flat(self, path)
+
+    @classmethod
+    def load(cls, path) -> "KDTree":
+        flat = load_kdtree_flat(path)
+        try:
+            return flat.to_kdtree()
+        finally:
+            flat.close()
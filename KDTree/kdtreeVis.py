@@ -1,81 +1,27 @@
 import os
 import csv
 import glob
+import time
 
-from visualizer.main import Visualizer
+import numpy as np
+
+from visualizer.main import Visualizer, add_points_layer
 from points_util.points_classes import *
 from points_util.points_loaders import *
-import pickle
-from pathlib import Path
-
-KD_CACHE_DIR = Path("cache_kdtree_vis")
-
-def load_cached_kdtree(cache_path: Path):
-    with cache_path.open("rb") as f:
-        return pickle.load(f)
-
-def save_cached_kdtree(tree, cache_path: Path):
-    cache_path.parent.mkdir(parents=True, exist_ok=True)
-    with cache_path.open("wb") as f:
-        pickle.dump(tree, f, protocol=pickle.HIGHEST_PROTOCOL)
-
-
-
-class KDNode:
-    def __init__(self, point, left=None, right=None):
-        self.point = point
-        self.left = left
-        self.right = right
-
-
-class KDTree:
-    def __init__(self, points):
-        self.root = self._build(points, depth=0)
-
-    def _build(self, points, depth):
-        if not points:
-            return None
-
-        axis = depth % 2
-        if axis == 0:
-            points.sort(key=lambda p: p.x)
-        else:
-            points.sort(key=lambda p: p.y)
-
-        m = len(points) // 2
-        return KDNode(
-            point=points[m],
-            left=self._build(points[:m], depth + 1),
-            right=self._build(points[m + 1:], depth + 1),
-        )
-
-    def query_range(self, range_rect):
-        result = []
-        _kd_search_plain(self.root, range_rect, 0, result)
-        return result
-
+from points_util.tree_cache import default_cache
+from points_util.query_stats import QueryTracer
+from KDTree.kdtree import KDTree
 
-def _kd_search_plain(node, range_rect, depth, result):
-    if node is None:
-        return
-    if _rect_contains_point(range_rect, node.point):
-        result.append(node.point)
-
-    axis = depth % 2
-    left, right, bottom, top = _rect_lrbt(range_rect)
-
-    if axis == 0:
-        val = node.point.x
-        low, high = left, right
-    else:
-        val = node.point.y
-        low, high = bottom, top
-
-    if low < val:
-        _kd_search_plain(node.left, range_rect, depth + 1, result)
-    if high >= val:
-        _kd_search_plain(node.right, range_rect, depth + 1, result)
 
+def get_kdtree(points):
+    """
+    KDTree z cache (wspólnego z benchmarkiem) albo świeżo zbudowane.
+    To samo KDTree.kdtree.KDTree, które mierzy benchmark (także po odczycie z cache).
+    """
+    tree, used_cache = default_cache().get_or_build("kdtree", points, None, lambda pts: KDTree(list(pts)))
+    if used_cache:
+        tree = tree.to_kdtree()
+    return tree, used_cache
 
 
 def _rect_lrbt(r):
@@ -91,13 +37,6 @@ def _rect_lrbt(r):
     return left, right, bottom, top
 
 
-def _rect_contains_point(r, p):
-    if hasattr(r, "contains_point"):
-        return r.contains_point(p)
-    left, right, bottom, top = _rect_lrbt(r)
-    return (left <= p.x <= right) and (bottom <= p.y <= top)
-
-
 def _rect_from_lrbt(left, right, bottom, top):
     # tylko do rysowania (nie musisz mieć klasy Rect)
     return (left, right, bottom, top)
@@ -144,93 +83,105 @@ def _world_bounds(points, pad_ratio=0.05):
     return xmin - pad_x, xmax + pad_x, ymin - pad_y, ymax + pad_y
 
 
-
 def _draw_kdtree_splits(vis: Visualizer, node, xmin, xmax, ymin, ymax, depth=0, max_levels=10,
                         color="black", alpha=0.25, linewidths=1):
-    if node is None:
-        return
-    if max_levels is not None and depth > max_levels:
-        return
-
-    axis = depth % 2
-    if axis == 0:
-        x = node.point.x
-        vis.add_line_segment(((x, ymin), (x, ymax)), color=color, alpha=alpha, linewidths=linewidths)
-        _draw_kdtree_splits(vis, node.left, xmin, x, ymin, ymax, depth + 1, max_levels, color, alpha, linewidths)
-        _draw_kdtree_splits(vis, node.right, x, xmax, ymin, ymax, depth + 1, max_levels, color, alpha, linewidths)
-    else:
-        y = node.point.y
-        vis.add_line_segment(((xmin, y), (xmax, y)), color=color, alpha=alpha, linewidths=linewidths)
-        _draw_kdtree_splits(vis, node.left, xmin, xmax, ymin, y, depth + 1, max_levels, color, alpha, linewidths)
-        _draw_kdtree_splits(vis, node.right, xmin, xmax, y, ymax, depth + 1, max_levels, color, alpha, linewidths)
-
-
-
-def _kd_query_with_visualization(node, query_rect, vis: Visualizer,
+    """
+    Linie podziału poziomami: na każdy poziom jedna kolekcja odcinków,
+    składana w NumPy z tablic (wartość podziału, obszar węzła).
+    """
+    level = [(node, xmin, xmax, ymin, ymax)] if node is not None else []
+    while level and (max_levels is None or depth <= max_levels):
+        axis = depth % 2
+        vals = np.array([n.point.x if axis == 0 else n.point.y for n, *_ in level])
+        reg = np.array([r for _, *r in level])
+        x0, x1, y0, y1 = reg[:, 0], reg[:, 1], reg[:, 2], reg[:, 3]
+
+        if axis == 0:
+            segs = np.stack([np.stack([vals, y0], axis=-1), np.stack([vals, y1], axis=-1)], axis=1)
+        else:
+            segs = np.stack([np.stack([x0, vals], axis=-1), np.stack([x1, vals], axis=-1)], axis=1)
+        vis.add_line_segment(segs, color=color, alpha=alpha, linewidths=linewidths)
+
+        nxt = []
+        for (n, a, b, c, d), v in zip(level, vals.tolist()):
+            if axis == 0:
+                if n.left is not None:
+                    nxt.append((n.left, a, v, c, d))
+                if n.right is not None:
+                    nxt.append((n.right, v, b, c, d))
+            else:
+                if n.left is not None:
+                    nxt.append((n.left, a, b, c, v))
+                if n.right is not None:
+                    nxt.append((n.right, a, b, v, d))
+        level = nxt
+        depth += 1
+
+
+class KDQueryGifTracer(QueryTracer):
+    """
+    Tracer rysujący przejście KDTree.query_range klatka po klatce.
+    KDNode nie zna swojego obszaru, więc tracer trzyma stos (węzeł, obszar)
+    i wylicza obszar dziecka z podziału rodzica.
+    """
+    def __init__(self, vis: Visualizer, xmin, xmax, ymin, ymax,
+                 visit_color="orange", found_point_color="red", prune_color=None, linewidths=2):
+        self.vis = vis
+        self.world = (xmin, xmax, ymin, ymax)
+        self.visit_color = visit_color
+        self.found_point_color = found_point_color
+        self.prune_color = prune_color
+        self.linewidths = linewidths
+        self._stack = []  # (węzeł, obszar, podświetlenie)
+
+    def _region(self, node, depth):
+        if not self._stack:
+            return self.world
+        parent, (xmin, xmax, ymin, ymax), _ = self._stack[-1]
+        if (depth - 1) % 2 == 0:
+            x = parent.point.x
+            return (xmin, x, ymin, ymax) if node is parent.left else (x, xmax, ymin, ymax)
+        y = parent.point.y
+        return (xmin, xmax, ymin, y) if node is parent.left else (xmin, xmax, y, ymax)
+
+    def enter(self, node, depth):
+        region = self._region(node, depth)
+        xmin, xmax, ymin, ymax = region
+        if depth % 2 == 0:
+            x = node.point.x
+            hi = self.vis.add_line_segment(((x, ymin), (x, ymax)), color=self.visit_color,
+                                           linewidths=self.linewidths, alpha=0.9)
+        else:
+            y = node.point.y
+            hi = self.vis.add_line_segment(((xmin, y), (xmax, y)), color=self.visit_color,
+                                           linewidths=self.linewidths, alpha=0.9)
+        self._stack.append((node, region, hi))
+
+    def prune(self, node, depth):
+        if self.prune_color is not None:
+            tmp = _add_rect_lrbt(self.vis, *self._region(node, depth), color=self.prune_color,
+                                 alpha=0.1, linewidths=1)
+            self.vis.remove_figure(tmp)
+
+    def report(self, p):
+        self.vis.add_point((p.x, p.y), color=self.found_point_color, s=25)
+
+    def leave(self, node, depth):
+        _, _, hi = self._stack.pop()
+        self.vis.remove_figure(hi)
+
+
+def _kd_query_with_visualization(tree, query_rect, vis: Visualizer,
                                  xmin, xmax, ymin, ymax,
-                                 depth=0, found=None,
                                  visit_color="orange",
                                  found_point_color="red",
                                  prune_color=None,
                                  linewidths=2):
-    if found is None:
-        found = []
-    if node is None:
-        return found
-
-    left, right, bottom, top = _rect_lrbt(query_rect)
-
-    axis = depth % 2
-    if axis == 0:
-        x = node.point.x
-        hi = vis.add_line_segment(((x, ymin), (x, ymax)), color=visit_color, linewidths=linewidths, alpha=0.9)
-    else:
-        y = node.point.y
-        hi = vis.add_line_segment(((xmin, y), (xmax, y)), color=visit_color, linewidths=linewidths, alpha=0.9)
-
-    if _rect_contains_point(query_rect, node.point):
-        found.append(node.point)
-        vis.add_point((node.point.x, node.point.y), color=found_point_color, s=25)
-
-    if axis == 0:
-        val = node.point.x
-        go_left = left < val
-        go_right = right >= val
-        if go_left:
-            _kd_query_with_visualization(node.left, query_rect, vis, xmin, val, ymin, ymax,
-                                         depth + 1, found, visit_color, found_point_color, prune_color, linewidths)
-        elif prune_color is not None:
-            tmp = _add_rect_lrbt(vis, xmin, val, ymin, ymax, color=prune_color, alpha=0.1, linewidths=1)
-            vis.remove_figure(tmp)
-
-        if go_right:
-            _kd_query_with_visualization(node.right, query_rect, vis, val, xmax, ymin, ymax,
-                                         depth + 1, found, visit_color, found_point_color, prune_color, linewidths)
-        elif prune_color is not None:
-            tmp = _add_rect_lrbt(vis, val, xmax, ymin, ymax, color=prune_color, alpha=0.1, linewidths=1)
-            vis.remove_figure(tmp)
-
-    else:
-        val = node.point.y
-        go_down = bottom < val
-        go_up = top >= val
-
-        if go_down:
-            _kd_query_with_visualization(node.left, query_rect, vis, xmin, xmax, ymin, val,
-                                         depth + 1, found, visit_color, found_point_color, prune_color, linewidths)
-        elif prune_color is not None:
-            tmp = _add_rect_lrbt(vis, xmin, xmax, ymin, val, color=prune_color, alpha=0.1, linewidths=1)
-            vis.remove_figure(tmp)
-
-        if go_up:
-            _kd_query_with_visualization(node.right, query_rect, vis, xmin, xmax, val, ymax,
-                                         depth + 1, found, visit_color, found_point_color, prune_color, linewidths)
-        elif prune_color is not None:
-            tmp = _add_rect_lrbt(vis, xmin, xmax, val, ymax, color=prune_color, alpha=0.1, linewidths=1)
-            vis.remove_figure(tmp)
-
-    vis.remove_figure(hi)
-    return found
+    """KDTree.query_range z tracerem rysującym - to samo przejście, które mierzy benchmark."""
+    tracer = KDQueryGifTracer(vis, xmin, xmax, ymin, ymax, visit_color=visit_color,
+                              found_point_color=found_point_color, prune_color=prune_color,
+                              linewidths=linewidths)
+    return tree.query_range(query_rect, tracer=tracer)
 
 
 def render_kdtree_image_from_csv(
@@ -240,20 +191,12 @@ def render_kdtree_image_from_csv(
     out_png="kdtree.png",
     sample_points=5000,
     max_levels=10,
+    point_mode="sample",
 ):
     points = _load_points_csv_as_simple_points(csv_path, PointClass)
 
-    csv_p = Path(csv_path)
-    cache_path = KD_CACHE_DIR / f"{csv_p.stem}.pkl"
-
-    used_cache = cache_path.exists() and cache_path.stat().st_mtime >= csv_p.stat().st_mtime
-    print(f"[KD][IMAGE] {'CACHE' if used_cache else 'BUILD'} | {csv_p.name} | {cache_path.resolve()}")
-
-    if used_cache:
-        tree = load_cached_kdtree(cache_path)
-    else:
-        tree = KDTree(points)
-        save_cached_kdtree(tree, cache_path)
+    tree, used_cache = get_kdtree(points)
+    print(f"[KD][IMAGE] {'CACHE' if used_cache else 'BUILD'} | {os.path.basename(csv_path)}")
 
     xmin, xmax, ymin, ymax = _world_bounds(points)
 
@@ -262,15 +205,13 @@ def render_kdtree_image_from_csv(
     vis.axis_equal()
     vis.add_title(f"KDTree (image): {os.path.basename(csv_path)} [{'CACHE' if used_cache else 'BUILD'}]")
 
-    pts_vis = points
-    if sample_points is not None and len(points) > sample_points:
-        step = max(1, len(points) // sample_points)
-        pts_vis = points[::step]
-    vis.add_point([(p.x, p.y) for p in pts_vis], color="blue", s=8, alpha=0.6)
+    add_points_layer(vis, points, point_mode, sample_points, extent=(xmin, xmax, ymin, ymax))
 
     _add_rect_lrbt(vis, xmin, xmax, ymin, ymax, color="black", linewidths=2)
+    t0 = time.perf_counter()
     _draw_kdtree_splits(vis, tree.root, xmin, xmax, ymin, ymax, depth=0, max_levels=max_levels,
-                        color="black", alpha=0.25, linewidths=linewidths if 'linewidths' in locals() else 1)
+                        color="black", alpha=0.25, linewidths=1)
+    draw_s = time.perf_counter() - t0
 
     ql, qr, qb, qt = _rect_lrbt(query_rect)
     _add_rect_lrbt(vis, ql, qr, qb, qt, color="purple", linewidths=2)
@@ -279,11 +220,13 @@ def render_kdtree_image_from_csv(
     if found:
         vis.add_point([(p.x, p.y) for p in found], color="red", s=25)
 
+    t0 = time.perf_counter()
     vis.save(out_png)
+    png_s = time.perf_counter() - t0
+    print(f"[KD][IMAGE] {os.path.basename(csv_path)} | tree={draw_s:.3f}s png={png_s:.3f}s")
     return found
 
 
-
 def render_kdtree_gif_from_csv(
     csv_path: str,
     query_rect,
@@ -294,20 +237,13 @@ def render_kdtree_gif_from_csv(
     max_levels=10,
     show_pruned=False,
     interval=120,
+    max_frames=None,
+    point_mode="sample",
 ):
     points = _load_points_csv_as_simple_points(csv_path, PointClass)
 
-    csv_p = Path(csv_path)
-    cache_path = KD_CACHE_DIR / f"{csv_p.stem}.pkl"
-
-    used_cache = cache_path.exists() and cache_path.stat().st_mtime >= csv_p.stat().st_mtime
-    print(f"[KD][GIF]   {'CACHE' if used_cache else 'BUILD'} | {csv_p.name} | {cache_path.resolve()}")
-
-    if used_cache:
-        tree = load_cached_kdtree(cache_path)
-    else:
-        tree = KDTree(points)
-        save_cached_kdtree(tree, cache_path)
+    tree, used_cache = get_kdtree(points)
+    print(f"[KD][GIF]   {'CACHE' if used_cache else 'BUILD'} | {os.path.basename(csv_path)}")
 
     xmin, xmax, ymin, ymax = _world_bounds(points)
 
@@ -316,11 +252,7 @@ def render_kdtree_gif_from_csv(
     vis.axis_equal()
     vis.add_title(f"KDTree (gif): {os.path.basename(csv_path)} [{'CACHE' if used_cache else 'BUILD'}]")
 
-    pts_vis = points
-    if sample_points is not None and len(points) > sample_points:
-        step = max(1, len(points) // sample_points)
-        pts_vis = points[::step]
-    vis.add_point([(p.x, p.y) for p in pts_vis], color="blue", s=8, alpha=0.6)
+    add_points_layer(vis, points, point_mode, sample_points, extent=(xmin, xmax, ymin, ymax))
 
     _add_rect_lrbt(vis, xmin, xmax, ymin, ymax, color="black", linewidths=2)
     _draw_kdtree_splits(vis, tree.root, xmin, xmax, ymin, ymax, depth=0, max_levels=max_levels,
@@ -330,16 +262,16 @@ def render_kdtree_gif_from_csv(
     _add_rect_lrbt(vis, ql, qr, qb, qt, color="purple", linewidths=2)
 
     found = _kd_query_with_visualization(
-        tree.root, query_rect, vis,
+        tree, query_rect, vis,
         xmin, xmax, ymin, ymax,
-        depth=0,
         prune_color=("lightgray" if show_pruned else None),
         found_point_color="red",
         visit_color="orange",
         linewidths=2
     )
 
-    vis.save_gif(out_gif, interval=interval)
+    # strumieniowo: klatki kodowane na bieżąco; max_frames łączy kolejne kroki w jedną klatkę
+    vis.save_gif(out_gif, interval=interval, max_frames=max_frames, stream=True)
     if out_png is not None:
         vis.save(out_png)
 
@@ -349,7 +281,8 @@ def render_kdtree_gif_from_csv(
 def run_images_for_N_kdtree(
     N: int,
     sample_points=5000,
-    max_levels=10
+    max_levels=10,
+    point_mode="sample"
 ):
     in_dir = os.path.join("../output", f"N_{N}")
     out_dir = os.path.join("results", f"N_{N}", "images_kdtree")
@@ -377,7 +310,8 @@ def run_images_for_N_kdtree(
             PointClass=Point,
             out_png=out_png,
             sample_points=sample_points,
-            max_levels=max_levels
+            max_levels=max_levels,
+            point_mode=point_mode
         )
         print(f"[IMG-KD] {csv_path} -> hits={len(found)} | png={out_png}")
 
@@ -388,7 +322,9 @@ def run_gifs_for_N_kdtree(
     max_levels=10,
     show_pruned=False,
     interval=120,
-    also_save_png=True
+    also_save_png=True,
+    max_frames=None,
+    point_mode="sample"
 ):
     in_dir = os.path.join("../output", f"N_{N}")
     out_dir = os.path.join("results", f"N_{N}", "gifs_kdtree")
@@ -421,7 +357,9 @@ def run_gifs_for_N_kdtree(
             sample_points=sample_points,
             max_levels=max_levels,
             show_pruned=show_pruned,
-            interval=interval
+            interval=interval,
+            max_frames=max_frames,
+            point_mode=point_mode
         )
 
         msg = f"[GIF-KD] {csv_path} -> hits={len(found)} | gif={out_gif}"
@@ -430,10 +368,10 @@ def run_gifs_for_N_kdtree(
         print(msg)
 
 
-
 def run_for_custom_kdtree(custom_dir, RectClass, PointClass,
                                sample_points=1500, max_levels=10,
-                               show_pruned=False, interval=120, also_save_png=True):
+                               show_pruned=False, interval=120, also_save_png=True,
+                               max_frames=None, point_mode="sample"):
     out_dir = os.path.join("results", "custom", "gifs_kdtree")
     os.makedirs(out_dir, exist_ok=True)
 
@@ -461,7 +399,9 @@ def run_for_custom_kdtree(custom_dir, RectClass, PointClass,
             sample_points=sample_points,
             max_levels=max_levels,
             show_pruned=show_pruned,
-            interval=interval
+            interval=interval,
+            max_frames=max_frames,
+            point_mode=point_mode
         )
         msg = f"[GIF-KD] {csv_path} -> hits={len(found)} | gif={out_gif}"
         if out_png:
@@ -1,23 +1,24 @@
 import os
 import glob
-from collections import deque
-from data_generators.query_picker import pick_query_for_existing_csv
-from points_util.points_loaders import load_points_csv,load_query_rect
-from visualizer.main import Visualizer
-from QuadTree.quadtree import Rect, QuadTree, Point as QTPoint, bounding_rect_pairwise
-import pickle
-from pathlib import Path
+import time
 
-CACHE_DIR = Path("cache_quadtree_vis")
+import numpy as np
+from points_util.points_loaders import load_points_csv,load_query_rect
+from visualizer.main import Visualizer, add_points_layer
+from QuadTree.quadtree import Rect, QuadTree, Point as QTPoint
+from points_util.tree_cache import default_cache
+from points_util.query_stats import QueryTracer
 
-def load_cached_quadtree(cache_path: Path):
-    with cache_path.open("rb") as f:
-        return pickle.load(f)
 
-def save_cached_quadtree(tree, cache_path: Path):
-    cache_path.parent.mkdir(parents=True, exist_ok=True)
-    with cache_path.open("wb") as f:
-        pickle.dump(tree, f, protocol=pickle.HIGHEST_PROTOCOL)
+def get_quadtree(points, capacity=8, max_depth=16):
+    """Drzewo obiektowe z cache (wspólnego z benchmarkiem) albo świeżo zbudowane."""
+    qt, used_cache = default_cache().get_or_build(
+        "quadtree", points, {"capacity": capacity, "max_depth": max_depth},
+        lambda pts: QuadTree.from_points(pts, capacity=capacity, max_depth=max_depth),
+    )
+    if used_cache:
+        qt = qt.to_quadtree()
+    return qt, used_cache
 
 def rect_segments(r: Rect):
     left = r.cx - r.hw
@@ -36,61 +37,65 @@ def add_rect(vis: Visualizer, r: Rect, **kwargs):
     return vis.add_line_segment(rect_segments(r), **kwargs)
 
 
-
-def rect_intersects(a: Rect, b: Rect) -> bool:
-    if hasattr(a, "intersects"):
-        return a.intersects(b)
-
-    a_left, a_right = a.cx - a.hw, a.cx + a.hw
-    a_bot, a_top = a.cy - a.hh, a.cy + a.hh
-    b_left, b_right = b.cx - b.hw, b.cx + b.hw
-    b_bot, b_top = b.cy - b.hh, b.cy + b.hh
-    return not (b_left >= a_right or b_right <= a_left or b_bot >= a_top or b_top <= a_bot)
-
-
-def rect_contains_point(r: Rect, p: QTPoint) -> bool:
-    if hasattr(r, "contains_point"):
-        return r.contains_point(p)
-
-    left, right = r.cx - r.hw, r.cx + r.hw
-    bottom, top = r.cy - r.hh, r.cy + r.hh
-    return (left <= p.x < right) and (bottom <= p.y < top)
-
+def rect_segments_array(left, right, bottom, top):
+    """Wektorowo: tablice brzegów n prostokątów -> tablica (4n, 2, 2) odcinków."""
+    lb = np.stack([left, bottom], axis=-1)
+    rb = np.stack([right, bottom], axis=-1)
+    rt = np.stack([right, top], axis=-1)
+    lt = np.stack([left, top], axis=-1)
+    segs = np.stack([
+        np.stack([lb, rb], axis=1),
+        np.stack([rb, rt], axis=1),
+        np.stack([rt, lt], axis=1),
+        np.stack([lt, lb], axis=1),
+    ], axis=1)
+    return segs.reshape(-1, 2, 2)
 
 
 def draw_tree_by_levels(vis: Visualizer, root: QuadTree, max_levels=10,
                         color="black", alpha=0.25, linewidths=1):
-    q = deque([(root, 0)])
-    current_level = 0
-    rects_this_level = []
-
-    while q:
-        node, lvl = q.popleft()
-        if max_levels is not None and lvl > max_levels:
-            continue
-
-        if lvl != current_level:
-            segs = []
-            for r in rects_this_level:
-                segs.extend(rect_segments(r))
-            if segs:
-                vis.add_line_segment(segs, color=color, alpha=alpha, linewidths=linewidths)
-            rects_this_level = []
-            current_level = lvl
-
-        rects_this_level.append(node.boundary)
-
-        if getattr(node, "divided", False):
-            for child in (node.nw, node.ne, node.sw, node.se):
-                if child is not None:
-                    q.append((child, lvl + 1))
-
-    segs = []
-    for r in rects_this_level:
-        segs.extend(rect_segments(r))
-    if segs:
-        vis.add_line_segment(segs, color=color, alpha=alpha, linewidths=linewidths)
-
+    """Jedna kolekcja odcinków na poziom; odcinki liczone w NumPy z tablicy (cx, cy, hw, hh)."""
+    level = [root]
+    lvl = 0
+    while level and (max_levels is None or lvl <= max_levels):
+        b = np.array([(n.boundary.cx, n.boundary.cy, n.boundary.hw, n.boundary.hh) for n in level])
+        cx, cy, hw, hh = b[:, 0], b[:, 1], b[:, 2], b[:, 3]
+        vis.add_line_segment(rect_segments_array(cx - hw, cx + hw, cy - hh, cy + hh),
+                             color=color, alpha=alpha, linewidths=linewidths)
+
+        level = [c for n in level if n.divided for c in (n.nw, n.ne, n.sw, n.se)]
+        lvl += 1
+
+
+class QueryGifTracer(QueryTracer):
+    """
+    Tracer rysujący przejście QuadTree.query klatka po klatce:
+    odwiedzany węzeł podświetlony na czas obsługi, trafienia jako punkty,
+    opcjonalnie mignięcie odciętych węzłów (prune_color).
+    """
+    def __init__(self, vis: Visualizer, visit_color="orange", prune_color=None,
+                 found_point_color="red", linewidths=2):
+        self.vis = vis
+        self.visit_color = visit_color
+        self.prune_color = prune_color
+        self.found_point_color = found_point_color
+        self.linewidths = linewidths
+        self._highlights = []
+
+    def enter(self, node, depth):
+        self._highlights.append(add_rect(self.vis, node.boundary, color=self.visit_color,
+                                         linewidths=self.linewidths, alpha=0.9))
+
+    def prune(self, node, depth):
+        if self.prune_color is not None:
+            tmp = add_rect(self.vis, node.boundary, color=self.prune_color, linewidths=1, alpha=0.2)
+            self.vis.remove_figure(tmp)
+
+    def report(self, p):
+        self.vis.add_point((p.x, p.y), color=self.found_point_color, s=25)
+
+    def leave(self, node, depth):
+        self.vis.remove_figure(self._highlights.pop())
 
 
 def query_with_visualization(node: QuadTree, query_rect: Rect, vis: Visualizer,
@@ -99,36 +104,10 @@ def query_with_visualization(node: QuadTree, query_rect: Rect, vis: Visualizer,
                              prune_color=None,
                              found_point_color="red",
                              linewidths=2):
-    if found is None:
-        found = []
-
-    if not rect_intersects(node.boundary, query_rect):
-        if prune_color is not None:
-            tmp = add_rect(vis, node.boundary, color=prune_color, linewidths=1, alpha=0.2)
-            vis.remove_figure(tmp)
-        return found
-
-    highlight = add_rect(vis, node.boundary, color=visit_color, linewidths=linewidths, alpha=0.9)
-
-    if not getattr(node, "divided", False):  # liść
-        for p in getattr(node, "points", []):
-            if rect_contains_point(query_rect, p):
-                found.append(p)
-                vis.add_point((p.x, p.y), color=found_point_color, s=25)
-        vis.remove_figure(highlight)
-        return found
-
-    for child in (node.nw, node.ne, node.sw, node.se):
-        if child is not None:
-            query_with_visualization(child, query_rect, vis, found,
-                                     visit_color=visit_color,
-                                     prune_color=prune_color,
-                                     found_point_color=found_point_color,
-                                     linewidths=linewidths)
-
-    vis.remove_figure(highlight)
-    return found
-
+    """QuadTree.query z tracerem rysującym - to samo przejście, które mierzy benchmark."""
+    tracer = QueryGifTracer(vis, visit_color=visit_color, prune_color=prune_color,
+                            found_point_color=found_point_color, linewidths=linewidths)
+    return node.query(query_rect, found, tracer=tracer)
 
 
 def render_quadtree_image_from_csv(
@@ -139,61 +118,38 @@ def render_quadtree_image_from_csv(
     out_png="quadtree.png",
     sample_points=5000,
     max_levels=10,
+    point_mode="sample",
 ):
     points = load_points_csv(csv_path)
 
-    csv_p = Path(csv_path)
-    cache_path = CACHE_DIR / f"{csv_p.stem}_cap{capacity}_d{max_depth}.pkl"
-
-    used_cache = cache_path.exists() and cache_path.stat().st_mtime >= csv_p.stat().st_mtime
-    print(f"[QT][IMAGE] {'CACHE' if used_cache else 'BUILD'} | {csv_p.name} | {cache_path.resolve()}")
-
-    if used_cache:
-        qt = load_cached_quadtree(cache_path)
-        world = qt.boundary
-    else:
-        world = bounding_rect_pairwise(points)
-        qt = QuadTree(world, capacity=capacity, max_depth=max_depth)
-        for p in points:
-            qt.insert(p)
-        save_cached_quadtree(qt, cache_path)
+    qt, used_cache = get_quadtree(points, capacity=capacity, max_depth=max_depth)
+    world = qt.boundary
+    print(f"[QT][IMAGE] {'CACHE' if used_cache else 'BUILD'} | {os.path.basename(csv_path)}")
 
     vis = Visualizer()
     vis.add_grid()
     vis.axis_equal()
     vis.add_title(f"Quadtree (image): {os.path.basename(csv_path)} [{'CACHE' if used_cache else 'BUILD'}]")
 
-    if sample_points is not None and len(points) > sample_points:
-        step = max(1, len(points) // sample_points)
-        pts_vis = points[::step]
-    else:
-        pts_vis = points
-    vis.add_point([(p.x, p.y) for p in pts_vis], color="blue", s=8, alpha=0.6)
+    add_points_layer(vis, points, point_mode, sample_points,
+                     extent=(world.left, world.right, world.bottom, world.top))
 
     add_rect(vis, world, color="black", linewidths=2)
+    t0 = time.perf_counter()
     draw_tree_by_levels(vis, qt, max_levels=max_levels, color="black", alpha=0.25, linewidths=1)
+    draw_s = time.perf_counter() - t0
 
     add_rect(vis, query_square, color="purple", linewidths=2)
 
-    found = []
-    stack = [qt]
-    while stack:
-        node = stack.pop()
-        if node is None:
-            continue
-        if not rect_intersects(node.boundary, query_square):
-            continue
-        if not getattr(node, "divided", False):
-            for p in getattr(node, "points", []):
-                if rect_contains_point(query_square, p):
-                    found.append(p)
-        else:
-            stack.extend([node.nw, node.ne, node.sw, node.se])
+    found = qt.query(query_square)
 
     if found:
         vis.add_point([(p.x, p.y) for p in found], color="red", s=25)
 
+    t0 = time.perf_counter()
     vis.save(out_png)
+    png_s = time.perf_counter() - t0
+    print(f"[QT][IMAGE] {os.path.basename(csv_path)} | tree={draw_s:.3f}s png={png_s:.3f}s")
     return found
 
 
@@ -207,37 +163,23 @@ def render_quadtree_gif_from_csv(
     sample_points=2000,
     max_levels=10,
     show_pruned=False,
-    interval=120
+    interval=120,
+    max_frames=None,
+    point_mode="sample"
 ):
     points = load_points_csv(csv_path)
 
-    csv_p = Path(csv_path)
-    cache_path = CACHE_DIR / f"{csv_p.stem}_cap{capacity}_d{max_depth}.pkl"
-
-    used_cache = cache_path.exists() and cache_path.stat().st_mtime >= csv_p.stat().st_mtime
-    print(f"[QT][GIF]   {'CACHE' if used_cache else 'BUILD'} | {csv_p.name} | {cache_path.resolve()}")
-
-    if used_cache:
-        qt = load_cached_quadtree(cache_path)
-        world = qt.boundary
-    else:
-        world = bounding_rect_pairwise(points)
-        qt = QuadTree(world, capacity=capacity, max_depth=max_depth)
-        for p in points:
-            qt.insert(p)
-        save_cached_quadtree(qt, cache_path)
+    qt, used_cache = get_quadtree(points, capacity=capacity, max_depth=max_depth)
+    world = qt.boundary
+    print(f"[QT][GIF]   {'CACHE' if used_cache else 'BUILD'} | {os.path.basename(csv_path)}")
 
     vis = Visualizer()
     vis.add_grid()
     vis.axis_equal()
     vis.add_title(f"Quadtree (gif): {os.path.basename(csv_path)} [{'CACHE' if used_cache else 'BUILD'}]")
 
-    if sample_points is not None and len(points) > sample_points:
-        step = max(1, len(points) // sample_points)
-        pts_vis = points[::step]
-    else:
-        pts_vis = points
-    vis.add_point([(p.x, p.y) for p in pts_vis], color="blue", s=8, alpha=0.6)
+    add_points_layer(vis, points, point_mode, sample_points,
+                     extent=(world.left, world.right, world.bottom, world.top))
 
     add_rect(vis, world, color="black", linewidths=2)
     draw_tree_by_levels(vis, qt, max_levels=max_levels, color="black", alpha=0.25, linewidths=1)
@@ -253,7 +195,8 @@ def render_quadtree_gif_from_csv(
         visit_color="orange"
     )
 
-    vis.save_gif(out_gif, interval=interval)
+    # strumieniowo: klatki kodowane na bieżąco; max_frames łączy kolejne kroki w jedną klatkę
+    vis.save_gif(out_gif, interval=interval, max_frames=max_frames, stream=True)
     if out_png is not None:
         vis.save(out_png)
 
@@ -265,8 +208,13 @@ def run_images_for_N(
     capacity=8,
     max_depth=16,
     sample_points=5000,
-    max_levels=10
+    max_levels=10,
+    point_mode="sample"
 ):
+    # picker ustawia TkAgg i otwiera okno - importujemy dopiero tutaj, żeby sam moduł
+    # dał się używać bez ekranu (points_util.render_parallel)
+    from data_generators.query_picker import pick_query_for_existing_csv
+
     in_dir = os.path.join("../output", f"N_{N}")
     out_dir = os.path.join("times", f"N_{N}", "images")
     os.makedirs(out_dir, exist_ok=True)
@@ -290,7 +238,8 @@ def run_images_for_N(
             max_depth=max_depth,
             out_png=out_png,
             sample_points=sample_points,
-            max_levels=max_levels
+            max_levels=max_levels,
+            point_mode=point_mode
         )
 
         print(f"[IMG] {csv_path} | query={query_path} -> hits={len(found)} | png={out_png}")
@@ -304,8 +253,13 @@ def run_for_N(
     max_levels=10,
     show_pruned=False,
     interval=120,
-    also_save_png=True
+    also_save_png=True,
+    max_frames=None,
+    point_mode="sample"
 ):
+    # leniwie, jak w run_images_for_N
+    from data_generators.query_picker import pick_query_for_existing_csv
+
     in_dir = os.path.join("../output", f"N_{N}")
     out_dir = os.path.join("times", f"N_{N}", "gifs")
     os.makedirs(out_dir, exist_ok=True)
@@ -334,7 +288,9 @@ def run_for_N(
             sample_points=sample_points,
             max_levels=max_levels,
             show_pruned=show_pruned,
-            interval=interval
+            interval=interval,
+            max_frames=max_frames,
+            point_mode=point_mode
         )
 
         msg = f"[GIF] {csv_path} | query={query_path} -> hits={len(found)} | gif={out_gif}"
@@ -351,7 +307,9 @@ def run_for_custom(
     max_levels=10,
     show_pruned=False,
     interval=120,
-    also_save_png=True
+    also_save_png=True,
+    max_frames=None,
+    point_mode="sample"
 ):
     out_dir = os.path.join("times", "custom", "gifs")
     os.makedirs(out_dir, exist_ok=True)
@@ -384,7 +342,9 @@ def run_for_custom(
             sample_points=sample_points,
             max_levels=max_levels,
             show_pruned=show_pruned,
-            interval=interval
+            interval=interval,
+            max_frames=max_frames,
+            point_mode=point_mode
         )
 
         msg = f"[GIF] {csv_path} -> hits={len(found)} | gif={out_gif}"
@@ -1,6 +1,10 @@
 
+import heapq
 from typing import List, Optional, Iterable
 from points_util.points_classes import *
+from points_util.query_stats import QueryStats, QueryTracer
+from points_util.spatial_index import query_stats, sample_parts
+from points_util.tree_format import save_quadtree_flat, load_quadtree_flat
 class QuadTree:
     """
     Quadtree w wariancie "punkty tylko w liściach":
@@ -9,12 +13,14 @@ class QuadTree:
 
     capacity: maks. liczba punktów w liściu zanim się podzieli
     max_depth: zabezpieczenie przed zbyt głębokim dzieleniem
+    size: liczba punktów w poddrzewie (do sample)
     """
     def __init__(self, boundary: Rect, capacity: int = 4, max_depth: int = 16, depth: int = 0):
         self.boundary = boundary
         self.capacity = capacity
         self.max_depth = max_depth
         self.depth = depth
+        self.size = 0
 
         self.points: List[Point] = []  # używane TYLKO gdy węzeł jest liściem
         self.divided: bool = False
@@ -50,14 +56,26 @@ class QuadTree:
         """
         Zwraca dziecko, do którego należy punkt.
         Zakładamy, że self.divided == True i punkt leży w self.boundary.
+        Decydują linie podziału (cx, cy), nie granice dzieci: te są liczone
+        z zaokrągleniem, więc punkt leżący dokładnie na linii mógłby nie
+        trafić do żadnego półotwartego dziecka.
         """
-        if self.nw.boundary.contains_point(p):
-            return self.nw
-        if self.ne.boundary.contains_point(p):
-            return self.ne
-        if self.sw.boundary.contains_point(p):
-            return self.sw
-        return self.se
+        b = self.boundary
+        if p.y >= b.cy:
+            return self.nw if p.x < b.cx else self.ne
+        return self.sw if p.x < b.cx else self.se
+
+    # obserwatorzy udanych wstawień (np. cache wyników zapytań);
+    # krotka klasowa = brak kosztu pamięci w węzłach, ustawiana tylko na korzeniu
+    insert_listeners: tuple = ()
+
+    def add_insert_listener(self, callback) -> None:
+        """callback(p) jest wołany po każdym udanym insert(p) na tym węźle."""
+        self.insert_listeners = self.insert_listeners + (callback,)
+
+    def remove_insert_listener(self, callback) -> None:
+        # != a nie "is not": każde self.metoda to nowy obiekt metody związanej
+        self.insert_listeners = tuple(c for c in self.insert_listeners if c != callback)
 
     def insert(self, p: Point) -> bool:
         """
@@ -66,11 +84,19 @@ class QuadTree:
         """
         if not self.boundary.contains_point(p):
             return False
-
+        self._insert(p)
+        if self.insert_listeners:
+            for callback in self.insert_listeners:
+                callback(p)
+        return True
+
+    def _insert(self, p: Point) -> None:
+        """Wstawia punkt leżący w self.boundary (sprawdzone w insert)."""
+        self.size += 1
         if self.is_leaf():
             if len(self.points) < self.capacity or self.depth >= self.max_depth:
                 self.points.append(p)
-                return True
+                return
 
             self.subdivide()
 
@@ -78,23 +104,27 @@ class QuadTree:
             self.points = []  # węzeł przestaje przechowywać punkty
 
             for op in old_points:
-                child = self._child_for_point(op)
-                child.insert(op)
+                self._child_for_point(op)._insert(op)
 
-            # po przerzuceniu starych punktów wstawiamy nowy
-            child = self._child_for_point(p)
-            return child.insert(p)
+        # po ewentualnym przerzuceniu starych punktów wstawiamy nowy
+        self._child_for_point(p)._insert(p)
 
-        child = self._child_for_point(p)
-        return child.insert(p)
-
-    def query(self, range_rect: Rect, found: Optional[List[Point]] = None) -> List[Point]:
+    def query(self, range_rect: Rect, found: Optional[List[Point]] = None,
+              tracer: Optional[QueryTracer] = None) -> List[Point]:
         """
         Zwraca listę punktów leżących w prostokącie range_rect.
         W stylu liście-only: punkty sprawdzamy tylko w liściach.
+        tracer: opcjonalne zaczepy przejścia (QueryTracer, np. QueryStats) - wtedy
+        osobna ścieżka z wywołaniami tracera.
         """
         if found is None:
             found = []
+        if tracer is not None:
+            if self.boundary.intersects(range_rect):
+                self._query_traced(range_rect, found, tracer)
+            else:
+                tracer.prune(self, self.depth)
+            return found
 
         # Jeśli obszary się nie przecinają, nie ma sensu schodzić w dół
         if not self.boundary.intersects(range_rect):
@@ -112,6 +142,112 @@ class QuadTree:
         self.se.query(range_rect, found)
         return found
 
+    def _query_traced(self, range_rect: Rect, found: List[Point], tracer: QueryTracer) -> None:
+        """To samo co query, z wywołaniami tracera. Wołane dla węzła, który przecina range_rect."""
+        tracer.enter(self, self.depth)
+
+        if self.is_leaf():
+            tracer.leaf(self, self.depth)
+            for p in self.points:
+                tracer.test(p)
+                if range_rect.contains_point(p):
+                    found.append(p)
+                    tracer.report(p)
+        else:
+            for child in (self.nw, self.ne, self.sw, self.se):
+                if child.boundary.intersects(range_rect):
+                    child._query_traced(range_rect, found, tracer)
+                else:
+                    tracer.prune(child, child.depth)
+
+        tracer.leave(self, self.depth)
+
+    # ---------------------------------------------- SpatialIndex (points_util.spatial_index)
+    @classmethod
+    def from_points(cls, points: Iterable[Point], capacity: int = 8, max_depth: int = 16) -> "QuadTree":
+        """Korzeń na prostokącie granicznym punktów, punkty wstawiane po kolei."""
+        pts = list(points)
+        tree = cls(bounding_rect_pairwise(pts), capacity=capacity, max_depth=max_depth)
+        for p in pts:
+            tree.insert(p)
+        return tree
+
+    @classmethod
+    def build(cls, xs, ys, capacity: int = 8, max_depth: int = 16) -> "QuadTree":
+        return cls.from_points([Point(float(x), float(y)) for x, y in zip(xs, ys)], capacity, max_depth)
+
+    def count(self, range_rect: Rect) -> int:
+        return len(self.query(range_rect))
+
+    def nearest(self, x: float, y: float, k: int = 1) -> List[Point]:
+        """k najbliższych punktów, od najbliższego (best-first po odległości do boundary węzła)."""
+        out: List[Point] = []
+        # (odległość^2, 0 = węzeł / 1 = punkt, licznik - żeby nie porównywać obiektów, obiekt)
+        heap = [(0.0, 0, 0, self)]
+        tie = 1
+        while heap and len(out) < k:
+            d, is_point, _, obj = heapq.heappop(heap)
+            if is_point:
+                out.append(obj)
+            elif obj.divided:
+                for child in (obj.nw, obj.ne, obj.sw, obj.se):
+                    b = child.boundary
+                    dx = max(b.left - x, 0.0, x - b.right)
+                    dy = max(b.bottom - y, 0.0, y - b.top)
+                    heapq.heappush(heap, (dx * dx + dy * dy, 0, tie, child))
+                    tie += 1
+            else:
+                for p in obj.points:
+                    heapq.heappush(heap, ((p.x - x) ** 2 + (p.y - y) ** 2, 1, tie, p))
+                    tie += 1
+        return out
+
+    def sample(self, range_rect: Rect, k: int, seed=None) -> List[Point]:
+        """
+        Do k losowych punktów z prostokąta (bez powtórzeń, jednostajnie), bez
+        zbierania całego wyniku: węzeł w całości w range_rect to blok o liczności
+        size, punkty testujemy tylko w liściach przeciętych brzegiem prostokąta.
+        Koszt: węzły brzegu + k zejść po size dzieci (k * głębokość), a nie liczba trafień.
+        """
+        full, extra = [], []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if not node.size or not node.boundary.intersects(range_rect):
+                continue
+            if range_rect.contains_rect(node.boundary):
+                full.append((node, node.size))
+            elif node.divided:
+                stack.extend((node.nw, node.ne, node.sw, node.se))
+            else:
+                extra.extend(p for p in node.points if range_rect.contains_point(p))
+        return sample_parts(full, extra, k, seed, QuadTree._nth)
+
+    @staticmethod
+    def _nth(node: "QuadTree", j: int) -> Point:
+        """j-ty punkt poddrzewa (kolejność NW, NE, SW, SE), po licznościach dzieci."""
+        while node.divided:
+            for child in (node.nw, node.ne, node.sw, node.se):
+                if j < child.size:
+                    node = child
+                    break
+                j -= child.size
+        return node.points[j]
+
+    def stats(self, range_rect: Rect) -> QueryStats:
+        return query_stats(self, range_rect)
+
+    def save(self, path) -> None:
+        save_quadtree_flat(self, path)
+
+    @classmethod
+    def load(cls, path) -> "QuadTree":
+        flat = load_quadtree_flat(path)
+        try:
+            return flat.to_quadtree()
+        finally:
+            flat.close()
+
 def bounding_rect_pairwise(points: Iterable[Point], padding: float = 1e-9) -> Rect:
     """
     Liczy prostokąt graniczny obejmujący wszystkie punkty,
@@ -0,0 +1,377 @@
+"""
+Piramida kafelków (z/x/y) z QuadTree - podgląd dużych zbiorów z przybliżaniem
+bez ponownych zapytań.
+
+Podział quadtree jest dokładnie podziałem kafelków: węzeł na głębokości d to
+kafelek (d, x, y) świata = boundary korzenia. Kafelek na poziomie z:
+- PNG tile_size x tile_size: gęstość punktów (liczba punktów na piksel, skala
+  logarytmiczna wspólna dla całego poziomu) + linie podziału węzłów od z do
+  z + levels,
+- opcjonalnie .npy z surowymi licznikami pikseli (save_counts=True),
+- wpis w tiles.json: liczba punktów i sygnatura.
+Powstają tylko niepuste kafelki. Numeracja jak w mapach XYZ: y rośnie w dół
+(y=0 to górny wiersz), plik <out_dir>/<z>/<x>/<y>.png.
+
+Przyrostowo: sygnatura kafelka = hash parametrów + (z, x, y) + skali poziomu +
+sygnatury węzła (hash poddrzewa: punkty liści i kształt podziału). Przy
+ponownym eksporcie renderujemy tylko kafelki o zmienionej sygnaturze; pliki
+kafelków, które zniknęły, są usuwane.
+
+Uruchamianie (z katalogu głównego repo):
+    python -m QuadTree.tiles output/N_1000000/uniform.csv tiles/N_1000000/uniform --max-zoom 8
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from points_util.tree_format import flatten_quadtree
+
+MANIFEST = "tiles.json"
+
+# stan współdzielony przez procesy robocze (ustawiany w _init_tiles)
+_state = None
+
+
+def _tree_arrays(tree):
+    """QuadTree albo FlatQuadTree (z cache) -> tablice NumPy w kolejności BFS."""
+    if hasattr(tree, "arrays"):
+        s = tree.arrays()
+    else:
+        _, s = flatten_quadtree(tree)
+    return {
+        "bounds": np.asarray(s["bounds"], dtype=np.float64).reshape(-1, 4),
+        "child": np.asarray(s["child"], dtype=np.int64),
+        "pt_start": np.asarray(s["pt_start"], dtype=np.int64),
+        "pt_count": np.asarray(s["pt_count"], dtype=np.int64),
+        "xs": np.asarray(s["xs"], dtype=np.float64),
+        "ys": np.asarray(s["ys"], dtype=np.float64),
+    }
+
+
+def _levels(child):
+    """Indeksy węzłów poziom po poziomie (BFS: dzieci węzła to child, child+1..+3)."""
+    levels = [np.array([0], dtype=np.int64)]
+    while True:
+        c = child[levels[-1]]
+        c = c[c >= 0]
+        if not c.size:
+            return levels
+        levels.append((c[:, None] + np.arange(4)).ravel())
+
+
+def prepare_tree(tree):
+    """
+    Tablice potrzebne do kafelków:
+    - depth, ix, iy: położenie węzła w siatce 2^depth x 2^depth (iy od dołu),
+    - lo, hi: zakres punktów poddrzewa w xs/ys ułożonych w kolejności DFS
+      (punkty każdego poddrzewa leżą obok siebie),
+    - sig: 16-bajtowy hash poddrzewa.
+    """
+    a = _tree_arrays(tree)
+    child, pt_start, pt_count = a["child"], a["pt_start"], a["pt_count"]
+    n_nodes = len(child)
+    levels = _levels(child)
+
+    depth = np.zeros(n_nodes, dtype=np.int64)
+    ix = np.zeros(n_nodes, dtype=np.int64)
+    iy = np.zeros(n_nodes, dtype=np.int64)
+    # NW, NE, SW, SE -> przesunięcia (dx, dy) w siatce dzieci
+    offsets = ((0, 1), (1, 1), (0, 0), (1, 0))
+    for level in levels:
+        parents = level[child[level] >= 0]
+        c = child[parents]
+        for k, (dx, dy) in enumerate(offsets):
+            depth[c + k] = depth[parents] + 1
+            ix[c + k] = 2 * ix[parents] + dx
+            iy[c + k] = 2 * iy[parents] + dy
+
+    count = pt_count.copy()
+    for level in reversed(levels):
+        parents = level[child[level] >= 0]
+        c = child[parents]
+        count[parents] = count[c] + count[c + 1] + count[c + 2] + count[c + 3]
+
+    # DFS preorder: poddrzewo zajmuje [lo, lo + count), dzieci kolejno po sobie
+    lo = np.zeros(n_nodes, dtype=np.int64)
+    for level in levels:
+        parents = level[child[level] >= 0]
+        c = child[parents]
+        start = lo[parents]
+        for k in range(4):
+            lo[c + k] = start
+            start = start + count[c + k]
+    hi = lo + count
+
+    leaves = np.flatnonzero((child < 0) & (pt_count > 0))
+    leaves = leaves[np.argsort(lo[leaves], kind="stable")]
+    lens = pt_count[leaves]
+    perm = np.repeat(pt_start[leaves] - np.cumsum(lens) + lens, lens) + np.arange(lens.sum())
+    xs = a["xs"][perm]
+    ys = a["ys"][perm]
+
+    sig = [b""] * n_nodes
+    for level in reversed(levels):
+        for i in level.tolist():
+            c = child[i]
+            h = hashlib.blake2b(digest_size=16)
+            if c < 0:
+                h.update(xs[lo[i]:hi[i]].tobytes())
+                h.update(ys[lo[i]:hi[i]].tobytes())
+            else:
+                h.update(b"".join(sig[c:c + 4]))
+            sig[i] = h.digest()
+
+    b = a["bounds"][0]
+    return {
+        "world": (b[0] - b[2], b[0] + b[2], b[1] - b[3], b[1] + b[3]),
+        "bounds": a["bounds"], "child": child,
+        "depth": depth, "ix": ix, "iy": iy, "lo": lo, "hi": hi,
+        "xs": xs, "ys": ys, "sig": sig,
+    }
+
+
+def _pixel_coords(state, xs, ys, z, tile_size):
+    """Globalne współrzędne pikseli na poziomie z (x od lewej, y od dołu)."""
+    left, right, bottom, top = state["world"]
+    side = (1 << z) * tile_size
+    gx = np.floor((xs - left) / (right - left) * side).astype(np.int64)
+    gy = np.floor((ys - bottom) / (top - bottom) * side).astype(np.int64)
+    np.clip(gx, 0, side - 1, out=gx)
+    np.clip(gy, 0, side - 1, out=gy)
+    return gx, gy
+
+
+def _zoom_tiles(state, z, tile_size):
+    """
+    Niepuste kafelki poziomu z: (tx, ty, liczba punktów, węzeł) + maks. liczba
+    punktów na piksel (wspólna skala kolorów poziomu).
+    węzeł: kafelek poziomu z, a gdy drzewo jest tu płytsze - najgłębszy przodek (liść).
+    """
+    gx, gy = _pixel_coords(state, state["xs"], state["ys"], z, tile_size)
+    side = (1 << z) * tile_size
+    _, px_counts = np.unique(gx * side + gy, return_counts=True)
+    vmax = int(px_counts.max()) if px_counts.size else 0
+
+    n = 1 << z
+    tile_keys, tile_counts = np.unique((gx // tile_size) * n + gy // tile_size, return_counts=True)
+    tx, ty = tile_keys // n, tile_keys % n
+
+    depth, ix, iy = state["depth"], state["ix"], state["iy"]
+    node = np.full(len(tile_keys), -1, dtype=np.int64)
+    for d in range(min(z, int(depth.max())), -1, -1):
+        todo = np.flatnonzero(node < 0)
+        if not todo.size:
+            break
+        at_d = np.flatnonzero(depth == d)
+        keys = ix[at_d] * (1 << d) + iy[at_d]
+        order = np.argsort(keys)
+        keys, at_d = keys[order], at_d[order]
+        want = (tx[todo] >> (z - d)) * (1 << d) + (ty[todo] >> (z - d))
+        pos = np.clip(np.searchsorted(keys, want), 0, max(len(keys) - 1, 0))
+        hit = keys[pos] == want
+        node[todo[hit]] = at_d[pos[hit]]
+    return tx, ty, tile_counts, node, vmax
+
+
+def _init_tiles(state):
+    global _state
+    _state = state
+
+
+def _render_tile(task):
+    """Rysuje jeden kafelek do PNG (i .npy); zwraca liczbę punktów na obrazie."""
+    from PIL import Image
+    from matplotlib import colormaps
+
+    z, tx, ty, node, vmax, png_path, npy_path, opts = task
+    s = _state
+    size = opts["tile_size"]
+
+    lo, hi = s["lo"][node], s["hi"][node]
+    gx, gy = _pixel_coords(s, s["xs"][lo:hi], s["ys"][lo:hi], z, size)
+    m = (gx // size == tx) & (gy // size == ty)
+    px = gx[m] - tx * size
+    row = size - 1 - (gy[m] - ty * size)  # wiersz 0 = góra kafelka
+    counts = np.bincount(row * size + px, minlength=size * size).reshape(size, size)
+
+    rgba = np.zeros((size, size, 4))
+    filled = counts > 0
+    if filled.any():
+        # log(1) = 0 -> najjaśniejszy kolor; podnosimy dół skali, żeby pojedyncze punkty było widać
+        v = np.log(counts[filled]) / np.log(vmax) if vmax > 1 else np.ones(int(filled.sum()))
+        rgba[filled] = colormaps[opts["cmap"]](0.3 + 0.7 * v)
+
+    lines = np.zeros((size, size), dtype=bool)
+    if s["depth"][node] == z:
+        left, right, bottom, top = s["world"]
+        n = 1 << z
+        tw, th = (right - left) / n, (top - bottom) / n
+        t_left, t_bottom = left + tx * tw, bottom + ty * th
+
+        def col(x):
+            return int(np.clip((x - t_left) / tw * size, 0, size - 1))
+
+        def row_of(y):
+            return int(np.clip(size - 1 - (y - t_bottom) / th * size, 0, size - 1))
+
+        child, bounds = s["child"], s["bounds"]
+        frontier = [node]
+        for _ in range(opts["levels"]):
+            nxt = []
+            for i in frontier:
+                c = child[i]
+                if c < 0:
+                    continue
+                cx, cy, hw, hh = bounds[i]
+                lines[row_of(cy + hh):row_of(cy - hh) + 1, col(cx)] = True
+                lines[row_of(cy), col(cx - hw):col(cx + hw) + 1] = True
+                nxt.extend(range(c, c + 4))
+            frontier = nxt
+
+    if lines.any():
+        # czarna linia z przezroczystością line_alpha nałożona "over" na gęstość
+        a = opts["line_alpha"]
+        out_a = a + rgba[lines, 3] * (1 - a)
+        rgba[lines, :3] *= (rgba[lines, 3] * (1 - a) / out_a)[:, None]
+        rgba[lines, 3] = out_a
+
+    os.makedirs(os.path.dirname(png_path), exist_ok=True)
+    Image.fromarray((rgba * 255 + 0.5).astype(np.uint8), "RGBA").save(png_path)
+    if npy_path is not None:
+        np.save(npy_path, counts.astype(np.uint32))
+    return int(counts.sum())
+
+
+def _tile_files(out_dir, key, save_counts):
+    png = os.path.join(out_dir, key + ".png")
+    return png, (os.path.join(out_dir, key + ".npy") if save_counts else None)
+
+
+def export_tiles(tree, out_dir, max_zoom=8, tile_size=256, levels=4, workers=None,
+                 save_counts=False, cmap="Blues", line_alpha=0.5, overwrite=False):
+    """
+    Eksportuje piramidę kafelków 0..max_zoom do out_dir (tiles.json + z/x/y.png).
+    tree: QuadTree albo FlatQuadTree z cache.
+    workers=None -> proces na rdzeń, workers=1 -> w bieżącym procesie.
+    overwrite=False: renderuje tylko kafelki o zmienionej sygnaturze (albo bez pliku).
+    Zwraca słownik: tiles, rendered, skipped, removed, seconds.
+    """
+    t0 = time.perf_counter()
+    state = prepare_tree(tree)
+    opts = {"tile_size": tile_size, "levels": levels, "cmap": cmap, "line_alpha": line_alpha}
+    params = dict(opts, world=list(state["world"]), save_counts=save_counts)
+    params_sig = hashlib.blake2b(json.dumps(params, sort_keys=True).encode("utf-8"), digest_size=16).digest()
+
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    old_tiles = {}
+    if os.path.exists(manifest_path) and not overwrite:
+        with open(manifest_path, encoding="utf-8") as f:
+            old_tiles = json.load(f).get("tiles", {})
+
+    tiles = {}
+    zooms = {}
+    tasks = []
+    skipped = 0
+    for z in range(max_zoom + 1):
+        tx, ty, tile_counts, node, vmax = _zoom_tiles(state, z, tile_size)
+        zooms[str(z)] = {"vmax": vmax, "tiles": len(tx)}
+        n = 1 << z
+        for x, y_up, cnt, i in zip(tx.tolist(), ty.tolist(), tile_counts.tolist(), node.tolist()):
+            key = f"{z}/{x}/{n - 1 - y_up}"
+            h = hashlib.blake2b(params_sig, digest_size=16)
+            h.update(f"{key}:{vmax}:{int(state['depth'][i] == z)}".encode("ascii"))
+            h.update(state["sig"][i])
+            sig = h.hexdigest()
+            tiles[key] = {"count": cnt, "sig": sig}
+
+            png, npy = _tile_files(out_dir, key, save_counts)
+            old = old_tiles.get(key)
+            if old is not None and old["sig"] == sig and os.path.exists(png):
+                skipped += 1
+                continue
+            tasks.append((z, x, y_up, i, vmax, png, npy, opts))
+
+    removed = 0
+    for key in old_tiles.keys() - tiles.keys():
+        for path in _tile_files(out_dir, key, True):
+            if os.path.exists(path):
+                os.remove(path)
+        removed += 1
+
+    if workers is None:
+        workers = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    workers = max(1, min(workers, len(tasks)))
+    if workers == 1:
+        _init_tiles(state)
+        for task in tasks:
+            _render_tile(task)
+    else:
+        chunk = max(1, len(tasks) // (workers * 8))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_tiles, initargs=(state,)) as pool:
+            for _ in pool.map(_render_tile, tasks, chunksize=chunk):
+                pass
+
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "bounds": {"left": state["world"][0], "right": state["world"][1],
+                   "bottom": state["world"][2], "top": state["world"][3]},
+        "max_zoom": max_zoom,
+        "params": params,
+        "zooms": zooms,
+        "tiles": tiles,
+    }
+    tmp = manifest_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp, manifest_path)
+
+    out = {"tiles": len(tiles), "rendered": len(tasks), "skipped": skipped, "removed": removed,
+           "seconds": time.perf_counter() - t0}
+    print(f"[TILES] {out_dir} | z=0..{max_zoom} tiles={out['tiles']} rendered={out['rendered']} "
+          f"skipped={skipped} removed={removed} | {out['seconds']:.2f}s")
+    return out
+
+
+def export_tiles_from_csv(csv_path, out_dir, capacity=8, max_depth=16, **kwargs):
+    """Jak export_tiles; drzewo z cache (wspólnego z benchmarkiem i wizualizacją) albo zbudowane."""
+    from QuadTree.quadtree import QuadTree
+    from points_util.points_loaders import load_points_csv
+    from points_util.tree_cache import default_cache
+
+    points = load_points_csv(csv_path)
+    tree, _ = default_cache().get_or_build(
+        "quadtree", points, {"capacity": capacity, "max_depth": max_depth},
+        lambda pts: QuadTree.from_points(pts, capacity=capacity, max_depth=max_depth),
+    )
+    return export_tiles(tree, out_dir, **kwargs)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Piramida kafelków z/x/y z QuadTree.")
+    ap.add_argument("csv")
+    ap.add_argument("out_dir")
+    ap.add_argument("--capacity", type=int, default=8)
+    ap.add_argument("--max-depth", type=int, default=16)
+    ap.add_argument("--max-zoom", type=int, default=8)
+    ap.add_argument("--tile-size", type=int, default=256)
+    ap.add_argument("--levels", type=int, default=4, help="ile poziomów podziału rysować w kafelku")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--save-counts", action="store_true", help="dodatkowo z/x/y.npy z licznikami pikseli")
+    ap.add_argument("--overwrite", action="store_true", help="renderuj wszystko od nowa")
+    args = ap.parse_args(argv)
+
+    export_tiles_from_csv(args.csv, args.out_dir, capacity=args.capacity, max_depth=args.max_depth,
+                          max_zoom=args.max_zoom, tile_size=args.tile_size, levels=args.levels,
+                          workers=args.workers, save_counts=args.save_counts, overwrite=args.overwrite)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
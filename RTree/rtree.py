@@ -0,0 +1,365 @@
+"""
+R-drzewo ładowane hurtowo metodą STR (Sort-Tile-Recursive), węzły w tablicach NumPy.
+
+Budowa od dołu: na każdym poziomie elementy (wpisy, potem węzły) są sortowane
+po x środka, cięte na ~sqrt(P) pionowych pasów po S * fanout elementów,
+w pasie sortowane po y i pakowane po fanout. Wszystkie liście są na jednej
+głębokości, a dzieci węzła (i wpisy liścia) leżą obok siebie, więc cały
+poziom to kilka tablic:
+    minx, miny, maxx, maxy  - MBR węzła,
+    first, nchild           - zakres dzieci (węzłów niżej albo wpisów dla liści),
+    lo, hi                  - zakres wszystkich wpisów poddrzewa.
+Węzły kolejnych poziomów są sklejone od korzenia (id 0) w dół - kolejność BFS;
+liście to id >= leaf_start.
+
+Wpisy to prostokąty [minx, maxx] x [miny, maxy]; punkt to prostokąt zdegenerowany
+(RTree.from_points / RTree(xs, ys)). Test wpisu z zapytaniem:
+    minx < right and maxx >= left and miny < top and maxy >= bottom,
+co dla punktów jest dokładnie Rect.contains_point (półotwarte) - liczba trafień
+zgadza się z QuadTree/KDTree. Węzeł leżący w całości w prostokącie oddaje
+cały zakres [lo, hi) bez testów (count() nawet nie patrzy na wpisy).
+
+Zapytania idą poziomami (cały front węzłów jednego poziomu naraz, NumPy);
+kNN to przeszukiwanie best-first z kopcem po odległości MBR.
+"""
+from __future__ import annotations
+
+import heapq
+import math
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+from points_util.points_classes import Point, Rect
+from points_util.query_stats import QueryStats, QueryTracer
+from points_util.spatial_index import query_stats
+from points_util.tree_format import gather_ranges, read_flat, to_array, write_flat
+
+RTREE_KIND = "rtree"
+
+
+def _str_order(cx, cy, fanout: int):
+    """Kolejność STR: pasy po x (po S * fanout elementów), w pasie po y."""
+    n = len(cx)
+    slab = math.ceil(math.sqrt(math.ceil(n / fanout))) * fanout
+    ox = np.argsort(cx, kind="stable")
+    slab_id = np.arange(n) // slab
+    return ox[np.lexsort((cy[ox], slab_id))]
+
+
+class RTree:
+    """
+    Wpisy-punkty (from_points, build) albo wpisy-prostokąty (from_boxes).
+    Metody SpatialIndex (query, nearest, przejście z tracerem) zwracają Point,
+    więc dla prostokąta oddają tylko jego lewy dolny róg - ale wybór wpisów jest
+    ten sam co niżej. Pełne wpisy-prostokąty dają query_indices, nearest_indices
+    i count: prostokąt trafia, gdy przecina zapytanie (także gdy zawiera je
+    w całości), a odległość kNN liczona jest do prostokąta.
+    """
+    def __init__(self, xs, ys, fanout: int = 16, maxx=None, maxy=None):
+        """
+        xs, ys: punkty, albo (z maxx, maxy) lewe dolne rogi prostokątów.
+        fanout: maks. liczba dzieci węzła i wpisów w liściu.
+        """
+        if fanout < 2:
+            raise ValueError("fanout musi być >= 2")
+        self.fanout = fanout
+        minx = np.asarray(xs, dtype=np.float64)
+        miny = np.asarray(ys, dtype=np.float64)
+        self.points_only = maxx is None
+        maxx = minx if maxx is None else np.asarray(maxx, dtype=np.float64)
+        maxy = miny if maxy is None else np.asarray(maxy, dtype=np.float64)
+        self._flat = None
+        self._build(minx, miny, maxx, maxy)
+
+    @classmethod
+    def build(cls, xs, ys, fanout: int = 16) -> "RTree":
+        return cls(xs, ys, fanout=fanout)
+
+    @classmethod
+    def from_points(cls, points, fanout: int = 16) -> "RTree":
+        n = len(points)
+        xs = np.fromiter((p.x for p in points), dtype=np.float64, count=n)
+        ys = np.fromiter((p.y for p in points), dtype=np.float64, count=n)
+        return cls(xs, ys, fanout=fanout)
+
+    @classmethod
+    def from_boxes(cls, minx, miny, maxx, maxy, fanout: int = 16) -> "RTree":
+        return cls(minx, miny, fanout=fanout, maxx=maxx, maxy=maxy)
+
+    def _build(self, minx, miny, maxx, maxy):
+        n = len(minx)
+        f = self.fanout
+
+        order = _str_order((minx + maxx) / 2, (miny + maxy) / 2, f) if n else np.zeros(0, np.int64)
+        self.ids = order  # indeks wpisu w danych wejściowych
+        self.e_minx, self.e_miny = minx[order], miny[order]
+        if self.points_only:
+            self.e_maxx, self.e_maxy = self.e_minx, self.e_miny
+        else:
+            self.e_maxx, self.e_maxy = maxx[order], maxy[order]
+
+        # poziomy od liści w górę; first/nchild wskazują na poziom niżej
+        levels = []
+        boxes = (self.e_minx, self.e_miny, self.e_maxx, self.e_maxy)
+        m = n
+        while True:
+            starts = np.arange(0, m, f, dtype=np.int64)
+            count = np.minimum(starts + f, m) - starts
+            if m:
+                level = [np.minimum.reduceat(boxes[0], starts), np.minimum.reduceat(boxes[1], starts),
+                         np.maximum.reduceat(boxes[2], starts), np.maximum.reduceat(boxes[3], starts)]
+            else:
+                level = [np.zeros(1) for _ in range(4)]
+                starts, count = np.zeros(1, np.int64), np.zeros(1, np.int64)
+            level += [starts, count]
+            if len(starts) == 1:
+                levels.append(level)
+                break
+            # nowy poziom węzłów układamy STR, zanim utworzymy ich rodziców
+            o = _str_order((level[0] + level[2]) / 2, (level[1] + level[3]) / 2, f)
+            levels.append([a[o] for a in level])
+            boxes = levels[-1][:4]
+            m = len(o)
+
+        levels.reverse()  # korzeń pierwszy
+        # STR poziomu przestawia węzły już po przydzieleniu im dzieci - od korzenia
+        # w dół układamy każdy poziom (i wpisy) w kolejności dzieci rodziców; wtedy
+        # poddrzewo to ciągły zakres na każdym poziomie, także wpisów [lo, hi)
+        for i, lv in enumerate(levels):
+            below = gather_ranges(lv[4], lv[4] + lv[5])
+            lv[4] = np.cumsum(lv[5]) - lv[5]
+            if i + 1 < len(levels):
+                levels[i + 1] = [a[below] for a in levels[i + 1]]
+            else:
+                self.ids = self.ids[below]
+                self.e_minx, self.e_miny = self.e_minx[below], self.e_miny[below]
+                if self.points_only:
+                    self.e_maxx, self.e_maxy = self.e_minx, self.e_miny
+                else:
+                    self.e_maxx, self.e_maxy = self.e_maxx[below], self.e_maxy[below]
+
+        sizes = [len(lv[4]) for lv in levels]
+        offsets = np.concatenate(([0], np.cumsum(sizes)))
+        self.height = len(levels)
+        self.leaf_start = int(offsets[-2])
+
+        self.minx, self.miny, self.maxx, self.maxy = (np.concatenate([lv[k] for lv in levels]) for k in range(4))
+        # first węzłów wewnętrznych -> globalne id dziecka; w liściach zostaje indeks wpisu
+        self.first = np.concatenate([lv[4] + (offsets[i + 1] if i + 1 < len(levels) else 0)
+                                     for i, lv in enumerate(levels)])
+        self.nchild = np.concatenate([lv[5] for lv in levels])
+
+        self.lo = np.zeros(len(self.first), np.int64)
+        self.hi = np.zeros(len(self.first), np.int64)
+        leaves = slice(self.leaf_start, None)
+        self.lo[leaves] = self.first[leaves]
+        self.hi[leaves] = self.first[leaves] + self.nchild[leaves]
+        for i in range(len(levels) - 2, -1, -1):
+            nodes = slice(offsets[i], offsets[i + 1])
+            self.lo[nodes] = self.lo[self.first[nodes]]
+            self.hi[nodes] = self.hi[self.first[nodes] + self.nchild[nodes] - 1]
+
+    def __len__(self) -> int:
+        return len(self.e_minx)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.first)
+
+    # ------------------------------------------------------------------ zakres
+    def _overlaps(self, idx, r: Rect, minx, miny, maxx, maxy):
+        return ((minx[idx] < r.right) & (maxx[idx] >= r.left) &
+                (miny[idx] < r.top) & (maxy[idx] >= r.bottom))
+
+    def _inside(self, idx, r: Rect):
+        return ((self.minx[idx] >= r.left) & (self.maxx[idx] < r.right) &
+                (self.miny[idx] >= r.bottom) & (self.maxy[idx] < r.top))
+
+    def _search(self, r: Rect):
+        """
+        (pozycje trafień z liści brzegowych, starty, końce zakresów węzłów leżących
+        w całości w r). Front węzłów schodzi poziom po poziomie.
+        """
+        empty = np.zeros(0, np.int64)
+        if not len(self):
+            return empty, empty, empty
+        full_lo, full_hi = [], []
+        frontier = np.zeros(1, np.int64)
+        while frontier.size:
+            frontier = frontier[self._overlaps(frontier, r, self.minx, self.miny, self.maxx, self.maxy)]
+            inside = self._inside(frontier, r)
+            full_lo.append(self.lo[frontier[inside]])
+            full_hi.append(self.hi[frontier[inside]])
+            frontier = frontier[~inside]
+            if frontier.size and frontier[0] >= self.leaf_start:
+                cand = gather_ranges(self.first[frontier], self.first[frontier] + self.nchild[frontier])
+                hits = cand[self._overlaps(cand, r, self.e_minx, self.e_miny, self.e_maxx, self.e_maxy)]
+                return hits, np.concatenate(full_lo), np.concatenate(full_hi)
+            frontier = gather_ranges(self.first[frontier], self.first[frontier] + self.nchild[frontier])
+        return empty, np.concatenate(full_lo), np.concatenate(full_hi)
+
+    def _hit_positions(self, r: Rect):
+        hits, lo, hi = self._search(r)
+        return np.concatenate((hits, gather_ranges(lo, hi)))
+
+    def query(self, range_rect: Rect, tracer: Optional[QueryTracer] = None) -> List[Point]:
+        """
+        Punkty w prostokącie (nowe obiekty Point, jak FlatQuadTree.query);
+        dla prostokątów - lewe dolne rogi, pełne wpisy daje query_indices.
+        """
+        if tracer is not None:
+            return self._query_traced(range_rect, tracer)
+        pos = self._hit_positions(range_rect)
+        return [Point(x, y) for x, y in zip(self.e_minx[pos].tolist(), self.e_miny[pos].tolist())]
+
+    def query_indices(self, range_rect: Rect) -> np.ndarray:
+        """Indeksy trafionych wpisów w kolejności wejściowej."""
+        return self.ids[self._hit_positions(range_rect)]
+
+    def count(self, range_rect: Rect) -> int:
+        hits, lo, hi = self._search(range_rect)
+        return len(hits) + int((hi - lo).sum())
+
+    def _query_traced(self, r: Rect, tracer: QueryTracer) -> List[Point]:
+        """To samo przejście co query, węzeł po węźle, z zaczepami tracera."""
+        found = []
+        if not len(self):
+            return found
+        if not self._overlaps(0, r, self.minx, self.miny, self.maxx, self.maxy):
+            tracer.prune(0, 0)
+            return found
+
+        def report_range(lo, hi):
+            for j in range(lo, hi):
+                p = Point(float(self.e_minx[j]), float(self.e_miny[j]))
+                found.append(p)
+                tracer.report(p)
+
+        stack = [(0, 0)]
+        while stack:
+            i, depth = stack.pop()
+            tracer.enter(i, depth)
+            if self._inside(i, r):
+                report_range(int(self.lo[i]), int(self.hi[i]))
+            elif i >= self.leaf_start:
+                tracer.leaf(i, depth)
+                for j in range(int(self.first[i]), int(self.first[i] + self.nchild[i])):
+                    p = Point(float(self.e_minx[j]), float(self.e_miny[j]))
+                    tracer.test(p)
+                    if self._overlaps(j, r, self.e_minx, self.e_miny, self.e_maxx, self.e_maxy):
+                        found.append(p)
+                        tracer.report(p)
+            else:
+                c0 = int(self.first[i])
+                for c in range(c0 + int(self.nchild[i]) - 1, c0 - 1, -1):
+                    if self._overlaps(c, r, self.minx, self.miny, self.maxx, self.maxy):
+                        stack.append((c, depth + 1))
+                    else:
+                        tracer.prune(c, depth + 1)
+            tracer.leave(i, depth)
+        return found
+
+    # -------------------------------------------------------------------- kNN
+    @staticmethod
+    def _box_dist2(x, y, minx, miny, maxx, maxy):
+        dx = np.maximum(np.maximum(minx - x, 0.0), x - maxx)
+        dy = np.maximum(np.maximum(miny - y, 0.0), y - maxy)
+        return dx * dx + dy * dy
+
+    def nearest_positions(self, x: float, y: float, k: int = 1):
+        """Pozycje (w tablicach wpisów) k najbliższych wpisów, od najbliższego."""
+        if not len(self) or k <= 0:
+            return []
+        heap = [(0.0, 0, 0)]  # (odległość^2, 0 = węzeł / 1 = wpis, id)
+        out = []
+        while heap and len(out) < k:
+            d, is_entry, i = heapq.heappop(heap)
+            if is_entry:
+                out.append(i)
+                continue
+            lo = int(self.first[i])
+            idx = np.arange(lo, lo + int(self.nchild[i]))
+            if i >= self.leaf_start:
+                dist = self._box_dist2(x, y, self.e_minx[idx], self.e_miny[idx], self.e_maxx[idx], self.e_maxy[idx])
+                flag = 1
+            else:
+                dist = self._box_dist2(x, y, self.minx[idx], self.miny[idx], self.maxx[idx], self.maxy[idx])
+                flag = 0
+            for dd, j in zip(dist.tolist(), idx.tolist()):
+                heapq.heappush(heap, (dd, flag, j))
+        return out
+
+    def nearest(self, x: float, y: float, k: int = 1) -> List[Point]:
+        """k najbliższych punktów (odległość euklidesowa; dla prostokątów - do prostokąta)."""
+        return [Point(float(self.e_minx[j]), float(self.e_miny[j])) for j in self.nearest_positions(x, y, k)]
+
+    def nearest_indices(self, x: float, y: float, k: int = 1) -> np.ndarray:
+        return self.ids[np.asarray(self.nearest_positions(x, y, k), dtype=np.int64)]
+
+    def stats(self, range_rect: Rect) -> QueryStats:
+        return query_stats(self, range_rect)
+
+    # ----------------------------------------------------------------- zapis
+    _NODE_ARRAYS = ("minx", "miny", "maxx", "maxy", "first", "nchild", "lo", "hi")
+
+    def copy(self) -> "RTree":
+        """Niezależna kopia w pamięci (np. z drzewa otwartego przez mmap)."""
+        t = RTree.__new__(RTree)
+        t.__dict__.update(self.__dict__)
+        for name in self._NODE_ARRAYS + ("ids", "e_minx", "e_miny"):
+            setattr(t, name, np.array(getattr(self, name)))
+        if self.points_only:
+            t.e_maxx, t.e_maxy = t.e_minx, t.e_miny
+        else:
+            t.e_maxx, t.e_maxy = np.array(self.e_maxx), np.array(self.e_maxy)
+        t._flat = None
+        return t
+
+    def save(self, path: str | Path) -> None:
+        save_rtree_flat(self, path)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "RTree":
+        return load_rtree_flat(path)
+
+    def close(self) -> None:
+        if self._flat is not None:
+            # widoki NumPy trzymają bufor mmap - muszą zniknąć przed jego zamknięciem
+            for name in self._NODE_ARRAYS + ("ids", "e_minx", "e_miny", "e_maxx", "e_maxy"):
+                setattr(self, name, None)
+            self._flat.close()
+            self._flat = None
+
+
+def save_rtree_flat(tree: RTree, path: str | Path) -> None:
+    meta = {"fanout": tree.fanout, "points_only": tree.points_only, "height": tree.height,
+            "leaf_start": tree.leaf_start, "n_nodes": tree.n_nodes, "n_entries": len(tree)}
+    sections = {name: to_array("d" if name.startswith(("min", "max")) else "q", getattr(tree, name))
+                for name in RTree._NODE_ARRAYS}
+    sections["ids"] = to_array("q", tree.ids)
+    sections["e_minx"] = to_array("d", tree.e_minx)
+    sections["e_miny"] = to_array("d", tree.e_miny)
+    if not tree.points_only:
+        sections["e_maxx"] = to_array("d", tree.e_maxx)
+        sections["e_maxy"] = to_array("d", tree.e_maxy)
+    write_flat(path, RTREE_KIND, meta, sections)
+
+
+def load_rtree_flat(path: str | Path, use_mmap: bool = True) -> RTree:
+    """RTree gotowe do zapytań; tablice to widoki na plik (mmap) do close()."""
+    flat = read_flat(path, use_mmap=use_mmap)
+    if flat.kind != RTREE_KIND:
+        raise ValueError(f"Oczekiwano '{RTREE_KIND}', jest '{flat.kind}'.")
+    m = flat.meta
+    t = RTree.__new__(RTree)
+    t.fanout, t.points_only = m["fanout"], m["points_only"]
+    t.height, t.leaf_start = m["height"], m["leaf_start"]
+    s = flat.sections
+    for name, mv in s.items():
+        setattr(t, name, np.frombuffer(mv, dtype=np.float64 if mv.format == "d" else np.int64))
+    if t.points_only:
+        t.e_maxx, t.e_maxy = t.e_minx, t.e_miny
+    t._flat = flat
+    return t
@@ -0,0 +1,235 @@
+"""
+Statyczne dwuwymiarowe drzewo przedziałowe (range tree) z kaskadowaniem ułamkowym.
+
+Punkty są posortowane po x (pozycja = ranga x). Drzewo jest pełne i niejawne:
+węzeł poziomu L (liście to L = 0) obejmuje rangi [k * 2^L, (k + 1) * 2^L) i trzyma
+swoje punkty posortowane po y. Cały poziom to więc jedna tablica długości N:
+    pos[L]          - rangi x punktów, blokami po 2^L, w bloku rosnąco po y,
+    left_before[L]  - ile z pierwszych p punktów bloku pochodzi z lewego dziecka.
+Jedno wyszukiwanie binarne po y robimy tylko w korzeniu (ys_by_y); przedział
+[a, b) pozycji w bloku rodzica przechodzi na dzieci w O(1) przez left_before
+(lewe: left_before[a], left_before[b], prawe: reszta) - to jest kaskadowanie
+ułamkowe w zwartej postaci, bez tablic y na niższych poziomach.
+
+Zapytanie schodzi dwiema ścieżkami granic x (O(log N) węzłów) i zbiera
+przedziały z węzłów kanonicznych (w całości w [left, right)): żaden punkt nie
+jest testowany, koszt to O(log N + k) niezależnie od rozkładu. count() nie
+dotyka punktów w ogóle. Pamięć: 2 * (log2 N + 1) liczb całkowitych na punkt
+(int32 do 2^31 punktów) - za przewidywalny czas płacimy pamięcią i budową.
+
+Prostokąt jest półotwarty, jak Rect.contains_point - liczba trafień zgadza się
+z QuadTree/KDTree. Zapis do FLATTREE (rodzaj "rangetree"), odczyt przez mmap.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+from points_util.points_classes import Point, Rect
+from points_util.query_stats import QueryStats, QueryTracer
+from points_util.spatial_index import nearest_by_count, query_stats
+from points_util.tree_format import read_flat, to_array, write_flat
+
+RANGE_TREE_KIND = "rangetree"
+
+
+class RangeTree:
+    def __init__(self, xs, ys):
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        n = len(xs)
+        order = np.lexsort((ys, xs))
+        self.xs = xs[order]
+        self.ys = ys[order]
+        self.ids = order  # indeks punktu w tablicy wejściowej
+        self.height = (n - 1).bit_length() if n > 1 else 0
+        self._flat = None
+        self._build()
+
+    @classmethod
+    def build(cls, xs, ys) -> "RangeTree":
+        return cls(xs, ys)
+
+    @classmethod
+    def from_points(cls, points) -> "RangeTree":
+        n = len(points)
+        xs = np.fromiter((p.x for p in points), dtype=np.float64, count=n)
+        ys = np.fromiter((p.y for p in points), dtype=np.float64, count=n)
+        return cls(xs, ys)
+
+    def _build(self):
+        n, levels = len(self.xs), self.height + 1
+        itype = np.int32 if n < 2 ** 31 else np.int64
+        yrank = np.empty(n, np.int64)
+        yrank[np.argsort(self.ys, kind="stable")] = np.arange(n)
+
+        pos = np.empty((levels, n), itype)
+        left_before = np.zeros((levels, n), itype)
+        at = np.arange(n)
+        cur = at
+        pos[0] = cur
+        for level in range(1, levels):
+            # bloki poziomu niżej są już po y - timsort scala je prawie liniowo
+            key = (cur >> level) * n + yrank[cur]
+            cur = cur[np.argsort(key, kind="stable")]
+            pos[level] = cur
+            is_left = ((cur >> (level - 1)) & 1) == 0
+            before = np.cumsum(is_left) - is_left
+            block_start = (at >> level) << level
+            left_before[level] = before - before[block_start]
+
+        self.pos = pos
+        self.left_before = left_before
+        self.ys_by_y = self.ys[cur]
+
+    def __len__(self) -> int:
+        return len(self.xs)
+
+    # ------------------------------------------------------------------ zakres
+    def _left_count(self, level: int, s: int, e: int, p: int) -> int:
+        """Ile z pierwszych p punktów bloku [s, e) poziomu level leży w lewym dziecku."""
+        if p < e - s:
+            return int(self.left_before[level][s + p])
+        return min(1 << (level - 1), e - s)
+
+    def _walk(self, r: Rect, tracer: Optional[QueryTracer] = None, found: Optional[list] = None):
+        """
+        Węzły kanoniczne jako trójki (poziom, start, koniec) przedziałów w pos[poziom].
+        Z tracerem punkty węzłów kanonicznych idą też do found (jako Point).
+        """
+        n = len(self.xs)
+        if not n or r.right <= r.left or r.top <= r.bottom:
+            return []
+        xa = int(np.searchsorted(self.xs, r.left, "left"))
+        xb = int(np.searchsorted(self.xs, r.right, "left"))
+        ya = int(np.searchsorted(self.ys_by_y, r.bottom, "left"))
+        yb = int(np.searchsorted(self.ys_by_y, r.top, "left"))
+
+        out = []
+        stack = [(self.height, 0, ya, yb)]  # (poziom, początek bloku, przedział [a, b) w bloku)
+        while stack:
+            level, s, a, b = stack.pop()
+            e = min(s + (1 << level), n)
+            depth = self.height - level
+            if a >= b or e <= xa or s >= xb:
+                if tracer is not None:
+                    tracer.prune((level, s), depth)
+                continue
+            if tracer is not None:
+                tracer.enter((level, s), depth)
+            if xa <= s and e <= xb:
+                out.append((level, s + a, s + b))
+                if tracer is not None:
+                    for j in self.pos[level][s + a:s + b].tolist():
+                        p = Point(float(self.xs[j]), float(self.ys[j]))
+                        found.append(p)
+                        tracer.report(p)
+            else:
+                la, lb = self._left_count(level, s, e, a), self._left_count(level, s, e, b)
+                m = s + (1 << (level - 1))
+                if m < n:
+                    stack.append((level - 1, m, a - la, b - lb))
+                stack.append((level - 1, s, la, lb))
+            if tracer is not None:
+                tracer.leave((level, s), depth)
+        return out
+
+    def _hit_positions(self, r: Rect) -> np.ndarray:
+        """Rangi x trafionych punktów."""
+        parts = [self.pos[level][lo:hi] for level, lo, hi in self._walk(r)]
+        return np.concatenate(parts).astype(np.int64, copy=False) if parts else np.zeros(0, np.int64)
+
+    def query(self, range_rect: Rect, tracer: Optional[QueryTracer] = None) -> List[Point]:
+        """
+        Punkty w prostokącie (nowe obiekty Point, jak FlatQuadTree.query).
+        Z tracerem: węzeł = (poziom, początek bloku), głębokość liczona od korzenia;
+        punkty nie są testowane, więc points_tested zostaje 0.
+        """
+        if tracer is not None:
+            found = []
+            self._walk(range_rect, tracer, found)
+            return found
+        pos = self._hit_positions(range_rect)
+        return [Point(x, y) for x, y in zip(self.xs[pos].tolist(), self.ys[pos].tolist())]
+
+    def query_indices(self, range_rect: Rect) -> np.ndarray:
+        """Indeksy trafionych punktów w kolejności wejściowej (jak np_baselines)."""
+        return self.ids[self._hit_positions(range_rect)]
+
+    def count(self, range_rect: Rect) -> int:
+        return sum(hi - lo for _, lo, hi in self._walk(range_rect))
+
+    def nearest(self, x: float, y: float, k: int = 1) -> List[Point]:
+        """k najbliższych punktów, od najbliższego (count jest O(log N) - patrz nearest_by_count)."""
+        if not len(self):
+            return []
+        bounds = (float(self.xs[0]), float(self.ys_by_y[0]), float(self.xs[-1]), float(self.ys_by_y[-1]))
+        return nearest_by_count(self, x, y, k, bounds)
+
+    def stats(self, range_rect: Rect) -> QueryStats:
+        return query_stats(self, range_rect)
+
+    # ----------------------------------------------------------------- zapis
+    _ARRAYS = ("xs", "ys", "ids", "ys_by_y", "pos", "left_before")
+
+    def copy(self) -> "RangeTree":
+        """Niezależna kopia w pamięci (np. z drzewa otwartego przez mmap)."""
+        t = RangeTree.__new__(RangeTree)
+        t.__dict__.update(self.__dict__)
+        for name in self._ARRAYS:
+            setattr(t, name, np.array(getattr(self, name)))
+        t._flat = None
+        return t
+
+    def save(self, path: str | Path) -> None:
+        save_range_tree_flat(self, path)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "RangeTree":
+        return load_range_tree_flat(path)
+
+    def close(self) -> None:
+        if self._flat is not None:
+            # widoki NumPy trzymają bufor mmap - muszą zniknąć przed jego zamknięciem
+            for name in self._ARRAYS:
+                setattr(self, name, None)
+            self._flat.close()
+            self._flat = None
+
+
+def save_range_tree_flat(tree: RangeTree, path: str | Path) -> None:
+    # poziomy (pos, left_before) zapisane wierszami jedna za drugą
+    itype = "i" if tree.pos.dtype == np.int32 else "q"
+    meta = {"height": tree.height, "n_points": len(tree)}
+    sections = {
+        "xs": to_array("d", tree.xs),
+        "ys": to_array("d", tree.ys),
+        "ids": to_array("q", tree.ids),
+        "ys_by_y": to_array("d", tree.ys_by_y),
+        "pos": to_array(itype, tree.pos.ravel()),
+        "left_before": to_array(itype, tree.left_before.ravel()),
+    }
+    write_flat(path, RANGE_TREE_KIND, meta, sections)
+
+
+def load_range_tree_flat(path: str | Path, use_mmap: bool = True) -> RangeTree:
+    """RangeTree gotowe do zapytań; tablice to widoki na plik (mmap) do close()."""
+    flat = read_flat(path, use_mmap=use_mmap)
+    if flat.kind != RANGE_TREE_KIND:
+        raise ValueError(f"Oczekiwano '{RANGE_TREE_KIND}', jest '{flat.kind}'.")
+    m = flat.meta
+    t = RangeTree.__new__(RangeTree)
+    t.height = m["height"]
+    s = flat.sections
+    t.xs = np.frombuffer(s["xs"], dtype=np.float64)
+    t.ys = np.frombuffer(s["ys"], dtype=np.float64)
+    t.ids = np.frombuffer(s["ids"], dtype=np.int64)
+    t.ys_by_y = np.frombuffer(s["ys_by_y"], dtype=np.float64)
+    shape = (t.height + 1, m["n_points"])
+    for name in ("pos", "left_before"):
+        dtype = np.int32 if s[name].format == "i" else np.int64
+        setattr(t, name, np.frombuffer(s[name], dtype=dtype).reshape(shape))
+    t._flat = flat
+    return t
@@ -112,43 +112,63 @@ def grid_side_from_n(n):
     return max(1, side)
 
 
-if __name__ == "__main__":
-    OUT = "../output"
-    ensure_dir(OUT)
+DATASET_NAMES = ("uniform", "normal", "collinear", "rectangle_border", "square_axes_diags", "grid", "clusters_k3")
 
-    sizes = [1000000]
 
-    for N in sizes:
-        folder = os.path.join(OUT, f"N_{N}")
-        ensure_dir(folder)
-
-        pts = generate_uniform_points(left=-10, right=10, n=N, seed=1)
-        save_csv(pts, os.path.join(folder, "uniform.csv"))
+def generate_dataset(name, N, seed=None):
+    """
+    Generuje jeden ze standardowych zbiorów o ok. N punktach (jak w output/N_*).
+    Zwraca (nazwa_pliku_bez_rozszerzenia, punkty). Domyślne ziarna są takie same
+    jak przy generowaniu plików w output/.
+    """
+    if name == "uniform":
+        return "uniform", generate_uniform_points(left=-10, right=10, n=N, seed=1 if seed is None else seed)
 
-        pts = generate_normal_points(mean=0, std=3, n=N, seed=2)
-        save_csv(pts, os.path.join(folder, "normal.csv"))
+    if name == "normal":
+        return "normal", generate_normal_points(mean=0, std=3, n=N, seed=2 if seed is None else seed)
 
-        pts = generate_collinear_segment_points(a=(0, 0), b=(10, 5), n=N, seed=3)
-        save_csv(pts, os.path.join(folder, "collinear.csv"))
+    if name == "collinear":
+        return "collinear", generate_collinear_segment_points(a=(0, 0), b=(10, 5), n=N,
+                                                              seed=3 if seed is None else seed)
 
-        pts = generate_rectangle_points(a=(-10, -10), b=(10, -10), c=(10, 10), d=(-10, 10), n=N, seed=4)
-        save_csv(pts, os.path.join(folder, "rectangle_border.csv"))
+    if name == "rectangle_border":
+        return "rectangle_border", generate_rectangle_points(a=(-10, -10), b=(10, -10), c=(10, 10), d=(-10, 10),
+                                                             n=N, seed=4 if seed is None else seed)
 
+    if name == "square_axes_diags":
         axis_n = max(0, (N - 4) // 4)
         diag_n = axis_n
-        pts = generate_square_points(a=(0, 0), b=(10, 0), c=(10, 10), d=(0, 10),
-                                     axis_n=axis_n, diag_n=diag_n, seed=5)
-        save_csv(pts, os.path.join(folder, "square_axes_diags.csv"))
+        return "square_axes_diags", generate_square_points(a=(0, 0), b=(10, 0), c=(10, 10), d=(0, 10),
+                                                           axis_n=axis_n, diag_n=diag_n,
+                                                           seed=5 if seed is None else seed)
 
+    if name == "grid":
         side = grid_side_from_n(N)
-        pts = generate_grid_points(n=side)
-        save_csv(pts, os.path.join(folder, f"grid_{side}x{side}.csv"))
+        return f"grid_{side}x{side}", generate_grid_points(n=side)
 
+    if name == "clusters_k3":
         k = 3
         per_cluster = N // k
         centers = [(-20, -20), (0, 15), (25, -5)]
-        pts = generate_clustered_points(cluster_centers=centers, cluster_std=2.0,
-                                        points_per_cluster=per_cluster, seed=6)
-        save_csv(pts, os.path.join(folder, f"clusters_k{k}.csv"))
+        return f"clusters_k{k}", generate_clustered_points(cluster_centers=centers, cluster_std=2.0,
+                                                           points_per_cluster=per_cluster,
+                                                           seed=6 if seed is None else seed)
+
+    raise ValueError(f"Nieznany zbiór: {name}")
+
+
+if __name__ == "__main__":
+    OUT = "../output"
+    ensure_dir(OUT)
+
+    sizes = [1000000]
+
+    for N in sizes:
+        folder = os.path.join(OUT, f"N_{N}")
+        ensure_dir(folder)
+
+        for name in DATASET_NAMES:
+            stem, pts = generate_dataset(name, N)
+            save_csv(pts, os.path.join(folder, f"{stem}.csv"))
 
         print(f"Zapisano dane dla N={N} do: {folder}")
@@ -0,0 +1,184 @@
+"""
+Nieinteraktywny generator zapytań (workload) o zadanej selektywności.
+
+Dla każdego zbioru powstają tysiące prostokątów: dla selektywności s
+(ułamek punktów w wyniku, domyślnie 0.001%..10%) prostokąt startowy ma
+w przestrzeni kwantyli brzegowych szerokość sqrt(s) w x i w y wokół losowego
+punktu danych. Ponieważ x i y bywają zależne (współliniowe, obwód), skala
+prostokąta jest potem dociągana bisekcją, aż liczba trafień jest bliska s*n.
+
+Workloady zapisujemy w workloads/N_<N>/<zbiór>.workload.csv (osobny katalog,
+żeby nie mieszać się z *.csv / *.query.csv w output/).
+"""
+import os
+import csv
+import glob
+import math
+
+import numpy as np
+
+DEFAULT_SELECTIVITIES = (1e-5, 1e-4, 1e-3, 1e-2, 1e-1)
+
+
+def load_xy_array(path: str) -> np.ndarray:
+    return np.loadtxt(path, delimiter=",", skiprows=1, ndmin=2)
+
+
+class _Counter:
+    """Dokładne zliczanie punktów w prostokącie (półotwartym, jak Rect.contains_point)."""
+    def __init__(self, xs: np.ndarray, ys: np.ndarray):
+        order = np.argsort(xs, kind="stable")
+        self.xs = xs[order]
+        self.ys = ys[order]
+
+    def count(self, left, right, bottom, top) -> int:
+        lo = np.searchsorted(self.xs, left, side="left")
+        hi = np.searchsorted(self.xs, right, side="left")
+        y = self.ys[lo:hi]
+        return int(np.count_nonzero((y >= bottom) & (y < top)))
+
+
+def _quantile_sorted(sorted_values: np.ndarray, u: float) -> float:
+    """Kwantyl z już posortowanej tablicy (bez kopiowania/partycjonowania)."""
+    u = min(1.0, max(0.0, u))
+    return float(sorted_values[int(round(u * (len(sorted_values) - 1)))])
+
+
+def _fit_scale(counter, cx, cy, hw, hh, target, tol, max_iter):
+    """Bisekcja (w skali log) po współczynniku skali prostokąta; zwraca (k, trafienia)."""
+    def hits(k):
+        return counter.count(cx - k * hw, cx + k * hw, cy - k * hh, cy + k * hh)
+
+    lo, hi = 0.0, 1.0
+    h = hits(hi)
+    best_k, best_h = hi, h
+
+    # najpierw rozszerzamy, aż przekroczymy cel
+    it = 0
+    while h < target and it < max_iter:
+        lo, hi = hi, hi * 2.0
+        h = hits(hi)
+        best_k, best_h = hi, h
+        it += 1
+
+    for _ in range(max_iter):
+        if abs(best_h - target) <= tol * target:
+            break
+        mid = math.sqrt(lo * hi) if lo > 0 else hi / 2.0
+        h = hits(mid)
+        if abs(h - target) < abs(best_h - target):
+            best_k, best_h = mid, h
+        if h < target:
+            lo = mid
+        else:
+            hi = mid
+
+    return best_k, best_h
+
+
+def generate_workload(xs, ys, selectivities=DEFAULT_SELECTIVITIES, per_selectivity=1000,
+                      seed=None, tol=0.25, max_iter=20):
+    """
+    Zwraca listę słowników: cx, cy, hw, hh, target_selectivity, target_hits, hits.
+    target_hits = max(1, round(s * n)) - dla małych n najmniejsze selektywności
+    schodzą do pojedynczych punktów.
+    """
+    xs = np.asarray(xs, dtype=float)
+    ys = np.asarray(ys, dtype=float)
+    n = len(xs)
+    if n == 0:
+        raise ValueError("Pusty zbiór punktów.")
+
+    rng = np.random.default_rng(seed)
+    counter = _Counter(xs, ys)
+    sx = np.sort(xs)
+    sy = np.sort(ys)
+
+    # minimalny rozmiar, gdy kwantyle się pokrywają (duplikaty, siatka)
+    eps_x = max(sx[-1] - sx[0], 1.0) * 1e-9
+    eps_y = max(sy[-1] - sy[0], 1.0) * 1e-9
+
+    out = []
+    for s in selectivities:
+        target = max(1, int(round(s * n)))
+        w = math.sqrt(s)
+
+        anchors = rng.integers(0, n, size=per_selectivity)
+        for a in anchors:
+            cx, cy = xs[a], ys[a]
+
+            ux = np.searchsorted(sx, cx) / n
+            uy = np.searchsorted(sy, cy) / n
+            x0 = _quantile_sorted(sx, ux - w / 2)
+            x1 = _quantile_sorted(sx, ux + w / 2)
+            y0 = _quantile_sorted(sy, uy - w / 2)
+            y1 = _quantile_sorted(sy, uy + w / 2)
+            hw = max((x1 - x0) / 2.0, eps_x)
+            hh = max((y1 - y0) / 2.0, eps_y)
+
+            k, hits = _fit_scale(counter, cx, cy, hw, hh, target, tol, max_iter)
+            out.append({
+                "cx": float(cx),
+                "cy": float(cy),
+                "hw": float(k * hw),
+                "hh": float(k * hh),
+                "target_selectivity": s,
+                "target_hits": target,
+                "hits": hits,
+            })
+    return out
+
+
+WORKLOAD_FIELDS = ["cx", "cy", "hw", "hh", "target_selectivity", "target_hits", "hits"]
+
+
+def save_workload(queries, path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=WORKLOAD_FIELDS)
+        w.writeheader()
+        w.writerows(queries)
+
+
+def load_workload(path: str):
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    for r in rows:
+        for k in ("cx", "cy", "hw", "hh", "target_selectivity"):
+            r[k] = float(r[k])
+        for k in ("target_hits", "hits"):
+            r[k] = int(r[k])
+    return rows
+
+
+def workload_path_for(csv_path: str, output_root="output", workload_root="workloads") -> str:
+    """output/N_1000/uniform.csv -> workloads/N_1000/uniform.workload.csv"""
+    rel = os.path.relpath(csv_path, output_root)
+    base = os.path.splitext(rel)[0]
+    return os.path.join(workload_root, base + ".workload.csv")
+
+
+def generate_workloads_for_root(output_root="output", workload_root="workloads",
+                                selectivities=DEFAULT_SELECTIVITIES, per_selectivity=1000,
+                                seed=0, overwrite=False):
+    csv_files = sorted(glob.glob(os.path.join(output_root, "**", "*.csv"), recursive=True))
+    csv_files = [p for p in csv_files if not p.endswith(".query.csv")]
+
+    saved = []
+    for csv_path in csv_files:
+        path = workload_path_for(csv_path, output_root, workload_root)
+        if os.path.exists(path) and not overwrite:
+            print(f"[SKIP] workload już jest: {path}")
+            continue
+
+        xy = load_xy_array(csv_path)
+        queries = generate_workload(xy[:, 0], xy[:, 1], selectivities=selectivities,
+                                    per_selectivity=per_selectivity, seed=seed)
+        save_workload(queries, path)
+        saved.append(path)
+        print(f"[OK] {csv_path} -> {path} ({len(queries)} zapytań)")
+    return saved
+
+
+if __name__ == "__main__":
+    generate_workloads_for_root("output", "workloads", per_selectivity=1000)
@@ -1,13 +1,35 @@
 from points_util.prepare_queries import prepare_queries_for_N
-from points_util.time_compare import bench_both_all, save_separate_tables_both
+from points_util.time_compare import bench_both_all, save_separate_tables_both, save_tradeoff_table, bench_workload_all
+from points_util.bench_results import save_run_jsonl
+from points_util.tree_cache import default_cache
+from data_generators.query_workload import generate_workloads_for_root
 
 # sizes = [100,1000,10000,100000]
 # for s in sizes:
 # prepare_queries_for_N(1000000)
 
+# workload o zadanej selektywności (zamiast jednego ręcznego query na zbiór)
+RUN_WORKLOAD = False
+if RUN_WORKLOAD:
+    generate_workloads_for_root("output", "workloads", per_selectivity=1000)
+    bench_workload_all("output", "workloads", capacity=8, max_depth=16, out_dir="times/workload")
+
+# silnik i capacity/max_depth dobrane osobno dla każdego zbioru (krótka kalibracja na próbce);
+# wybór i przewidywany koszt lądują obok wpisu w cache_trees/ (*.json):
+# python -m points_util.advisor output/N_100000/*.csv --queries 1000
+
+# measure_memory=True: dodatkowy przebieg z tracemalloc (szczyt/retencja, bajty na punkt)
+# workers=None: komórki (plik, silnik, parametry) w puli procesów, po jednym na rdzeń;
+# param_grid=[(8, 16), (16, 16), ...]: przegląd capacity/max_depth
 OUTPUT_ROOT = "output"
 results = bench_both_all(OUTPUT_ROOT, capacity=8, max_depth=16)
 paths = save_separate_tables_both(results, out_dir="times", prefer_xlsx=True)
+# KDTree vs drzewo przedziałowe w funkcji N (pamięć tylko z measure_memory=True)
+paths.append(save_tradeoff_table(results, base="kd", other="rg", out_dir="times"))
+# ten sam przebieg jako JSONL ze środowiskiem i surowymi próbkami;
+# porównanie: python -m points_util.bench_results compare times/runs/A.jsonl times/runs/B.jsonl
+paths.append(save_run_jsonl(results, out_dir="times/runs", cache=default_cache(),
+                            params={"output_root": OUTPUT_ROOT, "capacity": 8, "max_depth": 16}))
 print("Zapisano pliki:")
 for p in paths:
     print(" -", p)
\ No newline at end of file
@@ -0,0 +1,308 @@
+"""
+Dobór silnika i parametrów (capacity/max_depth) dla konkretnego zbioru.
+
+Najlepsza struktura i capacity różnią się między rozkładami (siatka, klastry,
+współliniowe, ...), więc zamiast stałego capacity=8, max_depth=16:
+1. profil - tanie statystyki na próbce punktów (rozrzut, duplikaty, skupienie),
+2. kandydaci - silniki z rejestru (points_util.engines) x capacity x max_depth,
+   zawężeni regułami z profilu,
+3. kalibracja - każdy kandydat jest budowany na próbce i odpytywany krótkim
+   workloadem (data_generators.query_workload) o kilku selektywnościach,
+4. wybór - najmniejszy przewidywany koszt dla pełnego N:
+       total_s = build_s + queries * query_s
+   Budowa skaluje się jak N log N, zapytanie o stałej selektywności jak N
+   (liczba trafień rośnie liniowo) - to zgrubna ekstrapolacja z próbki.
+
+build_advised() buduje (albo wczytuje z TreeCache) wybrany indeks i zapisuje
+wybór razem z przewidywanym kosztem obok wpisu cache (TreeCache.put_meta);
+kolejne wywołanie dla tych samych punktów i tych samych ustawień kalibracji
+(calibration_settings: silniki, capacity, max_depth, próbka, ...) ją pomija.
+
+Uruchamianie (z katalogu głównego repo):
+    python -m points_util.advisor output/N_100000/*.csv --queries 1000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import time
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from data_generators.query_workload import generate_workload
+from points_util.bench_stats import measure, summarize
+from points_util.engines import ENGINES, get_engine
+from points_util.points_classes import Point, Rect
+from points_util.points_loaders import load_points_csv
+from points_util.tree_cache import TreeCache, default_cache, points_digest
+
+ADVICE_KIND = "advice"
+DEFAULT_SAMPLE = 20000
+DEFAULT_CAPACITIES = (4, 8, 16, 32)
+DEFAULT_MAX_DEPTHS = (16,)
+DEFAULT_SELECTIVITIES = (1e-4, 1e-3, 1e-2)
+# siatka kubełków przy silnym skupieniu: prawie wszystkie komórki puste, kilka przepełnionych
+GRID_MAX_DISPERSION = 50.0
+MAX_CAPACITY = 256
+
+
+def _xy(points: Sequence[Point]):
+    n = len(points)
+    xs = np.fromiter((p.x for p in points), dtype=np.float64, count=n)
+    ys = np.fromiter((p.y for p in points), dtype=np.float64, count=n)
+    return xs, ys
+
+
+def _sample(xs, ys, size, seed):
+    if len(xs) <= size:
+        return xs, ys
+    idx = np.random.default_rng(seed).choice(len(xs), size=size, replace=False)
+    idx.sort()  # kolejność wstawiania jak w pełnym zbiorze
+    return xs[idx], ys[idx]
+
+
+def dataset_profile(xs, ys, sample_size: int = DEFAULT_SAMPLE, seed: int = 0) -> dict:
+    """
+    Tanie statystyki rozkładu (na próbce):
+    - width/height/aspect       - rozrzut: prostokąt graniczny i stosunek boków,
+    - anisotropy                - 1 - λmin/λmax kowariancji (~1: punkty na prostej),
+    - duplicate_ratio/max_dup   - udział powtórzonych punktów i największa grupa,
+    - dispersion                - wariancja/średnia liczności komórek siatki ~4 pkt/komórkę
+                                  (1: losowo, < 1: regularnie jak siatka, >> 1: klastry),
+    - empty_ratio               - udział pustych komórek tej siatki.
+    """
+    n = len(xs)
+    sx, sy = _sample(np.asarray(xs, np.float64), np.asarray(ys, np.float64), sample_size, seed)
+    m = len(sx)
+    if m == 0:
+        raise ValueError("Pusty zbiór punktów.")
+    width, height = float(sx.max() - sx.min()), float(sy.max() - sy.min())
+
+    cov = np.cov(sx, sy) if m > 1 else np.zeros((2, 2))
+    ev = np.linalg.eigvalsh(cov)
+    anisotropy = 1.0 - ev[0] / ev[1] if ev[1] > 0 else 0.0
+
+    _, counts = np.unique(np.stack([sx, sy], axis=1), axis=0, return_counts=True)
+    duplicate_ratio = 1.0 - len(counts) / m
+
+    side = max(1, int(math.sqrt(m / 4)))
+    cx = np.minimum(((sx - sx.min()) / (width or 1.0) * side).astype(np.int64), side - 1)
+    cy = np.minimum(((sy - sy.min()) / (height or 1.0) * side).astype(np.int64), side - 1)
+    cells = np.bincount(cx * side + cy, minlength=side * side)
+    mean = cells.mean()
+
+    return {
+        "n": n,
+        "sample_size": m,
+        "width": width,
+        "height": height,
+        "aspect": min(width, height) / max(width, height) if max(width, height) > 0 else 1.0,
+        "anisotropy": float(anisotropy),
+        "duplicate_ratio": float(duplicate_ratio),
+        "max_dup": int(counts.max()),
+        "dispersion": float(cells.var() / mean) if mean > 0 else 0.0,
+        "empty_ratio": float(np.mean(cells == 0)),
+    }
+
+
+def candidates(profile: dict, engines: Optional[Sequence[str]] = None,
+               capacities=DEFAULT_CAPACITIES, max_depths=DEFAULT_MAX_DEPTHS) -> List[dict]:
+    """
+    Kandydaci (silnik, capacity, max_depth, params) bez powtórzeń params.
+    Reguły z profilu:
+    - duplikaty: grupa max_dup > capacity dzieli liść aż do max_depth (QuadTree)
+      albo przepełnia węzeł, więc dochodzi capacity >= max_dup (potęga 2, do MAX_CAPACITY),
+    - dispersion > GRID_MAX_DISPERSION: siatka kubełków odpada.
+    """
+    capacities = sorted(set(capacities))
+    if profile["max_dup"] > capacities[-1]:
+        capacities.append(min(MAX_CAPACITY, 1 << (profile["max_dup"] - 1).bit_length()))
+
+    out, seen = [], set()
+    for name in engines or ENGINES:
+        if name == "grid" and profile["dispersion"] > GRID_MAX_DISPERSION:
+            continue
+        params_fn = get_engine(name)["params"]
+        for capacity in capacities:
+            for max_depth in max_depths:
+                params = params_fn(capacity, max_depth)
+                key = (name, json.dumps(params, sort_keys=True))
+                if key in seen:
+                    continue
+                seen.add(key)
+                out.append({"engine": name, "capacity": capacity, "max_depth": max_depth, "params": params})
+    return out
+
+
+def calibrate(xs, ys, cands: List[dict], n: int, queries: int = 1000, sample_size: int = DEFAULT_SAMPLE,
+              selectivities=DEFAULT_SELECTIVITIES, per_selectivity: int = 10, repeat: int = 3,
+              seed: int = 0, verbose: bool = False) -> List[dict]:
+    """
+    Buduje każdego kandydata na próbce, mierzy budowę i zapytania, ekstrapoluje do n.
+    Zwraca kandydatów z kluczami sample_build_s, sample_query_s i expected
+    (build_s, query_s, total_s, queries), posortowanych rosnąco po total_s.
+    """
+    sx, sy = _sample(np.asarray(xs, np.float64), np.asarray(ys, np.float64), sample_size, seed)
+    m = len(sx)
+    pts = [Point(x, y) for x, y in zip(sx.tolist(), sy.tolist())]
+    wl = generate_workload(sx, sy, selectivities=selectivities, per_selectivity=per_selectivity, seed=seed)
+    rects = [Rect(w["cx"], w["cy"], w["hw"], w["hh"]) for w in wl]
+
+    build_scale = (n / m) * (math.log(max(n, 2)) / math.log(max(m, 2)))
+    query_scale = n / m
+
+    out = []
+    for c in cands:
+        cls = get_engine(c["engine"])["cls"]
+        index = None
+
+        def run_build():
+            nonlocal index
+            index = cls.from_points(pts, **(c["params"] or {}))
+
+        build_s = summarize(measure(run_build, warmup=0, repeat=1))["median_s"]
+        # mediana (po zapytaniach) z median (po powtórzeniach), jak w points_util.scaling
+        query_s = summarize([summarize(measure(lambda r=r: index.query(r), warmup=1, repeat=repeat))["median_s"]
+                             for r in rects])["median_s"]
+        del index
+
+        expected = {"build_s": build_s * build_scale, "query_s": query_s * query_scale, "queries": queries}
+        expected["total_s"] = expected["build_s"] + queries * expected["query_s"]
+        out.append({**c, "sample_build_s": build_s, "sample_query_s": query_s, "expected": expected})
+        if verbose:
+            print(f"[ADVISOR] {c['engine']:10s} {json.dumps(c['params'] or {}, sort_keys=True):36s} | "
+                  f"sample build={build_s:.4f}s query={query_s * 1e3:.3f}ms | "
+                  f"expected total={expected['total_s']:.3f}s")
+    out.sort(key=lambda c: c["expected"]["total_s"])
+    return out
+
+
+def calibration_settings(queries: int = 1000, engines: Optional[Sequence[str]] = None,
+                         capacities=DEFAULT_CAPACITIES, max_depths=DEFAULT_MAX_DEPTHS,
+                         sample_size: int = DEFAULT_SAMPLE, seed: int = 0, selectivities=DEFAULT_SELECTIVITIES,
+                         per_selectivity: int = 10, repeat: int = 3, verbose: bool = False) -> dict:
+    """
+    Ustawienia, od których zależy wybór - zapisywane w wyborze i porównywane przed
+    jego ponownym użyciem. Postać jak po odczycie z JSON (listy zamiast krotek).
+    """
+    settings = {
+        "queries": queries,
+        "engines": list(engines or ENGINES),
+        "capacities": sorted(set(capacities)),
+        "max_depths": sorted(set(max_depths)),
+        "sample_size": sample_size,
+        "seed": seed,
+        "selectivities": list(selectivities),
+        "per_selectivity": per_selectivity,
+        "repeat": repeat,
+    }
+    return json.loads(json.dumps(settings))
+
+
+def advise_arrays(xs, ys, queries: int = 1000, engines: Optional[Sequence[str]] = None,
+                  capacities=DEFAULT_CAPACITIES, max_depths=DEFAULT_MAX_DEPTHS,
+                  sample_size: int = DEFAULT_SAMPLE, seed: int = 0, verbose: bool = False, **calibration) -> dict:
+    """
+    Wybór silnika dla zbioru: słownik z engine, capacity, max_depth, params,
+    expected (przewidywany koszt dla pełnego zbioru), profile i candidates
+    (wszyscy kandydaci z kalibracji, od najtańszego).
+    queries: ile zapytań przypada na jedną budowę - waży budowę względem zapytań.
+    """
+    profile = dataset_profile(xs, ys, sample_size=sample_size, seed=seed)
+    cands = calibrate(xs, ys, candidates(profile, engines, capacities, max_depths), n=len(xs),
+                      queries=queries, sample_size=sample_size, seed=seed, verbose=verbose, **calibration)
+    best = cands[0]
+    settings = calibration_settings(queries, engines, capacities, max_depths, sample_size, seed, **calibration)
+    return {
+        "kind": ADVICE_KIND,
+        "settings": settings,
+        "engine": best["engine"],
+        "capacity": best["capacity"],
+        "max_depth": best["max_depth"],
+        "params": best["params"],
+        "expected": best["expected"],
+        "profile": profile,
+        "candidates": [{k: c[k] for k in ("engine", "capacity", "max_depth", "params", "expected")}
+                       for c in cands],
+        "seed": seed,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def advise(points: Sequence[Point], **kwargs) -> dict:
+    xs, ys = _xy(points)
+    return advise_arrays(xs, ys, **kwargs)
+
+
+def load_advice(cache: TreeCache, points: Sequence[Point], digest: Optional[str] = None,
+                settings: Optional[dict] = None) -> Optional[dict]:
+    """
+    Zapisany wcześniej wybór dla tych punktów (po hashu zawartości) albo None.
+    settings (calibration_settings): tylko wybór z tymi samymi ustawieniami kalibracji.
+    """
+    digest = digest or points_digest(points)
+    for _, meta in cache.metas():
+        if meta.get("kind") != ADVICE_KIND or meta.get("digest") != digest:
+            continue
+        if settings is None or meta.get("settings") == settings:
+            return meta
+    return None
+
+
+def build_advised(points: Sequence[Point], cache: Optional[TreeCache] = None, queries: int = 1000,
+                  recalibrate: bool = False, **kwargs):
+    """
+    Indeks wybrany przez advise(), przez TreeCache (ten sam klucz co w benchmarku).
+    Zwraca (indeks, wybór, czy_z_cache); wybór trafia obok wpisu cache.
+    Zapisany wybór jest użyty ponownie tylko przy tych samych ustawieniach
+    (queries, silniki, capacity, max_depth, próbka, ...) - inaczej nowa kalibracja.
+    """
+    cache = cache or default_cache()
+    digest = points_digest(points)
+    settings = calibration_settings(queries, **kwargs)
+    advice = None if recalibrate else load_advice(cache, points, digest, settings)
+    if advice is None:
+        advice = advise(points, queries=queries, **kwargs)
+        advice["digest"] = digest
+
+    engine = advice["engine"]
+    cls, params = get_engine(engine)["cls"], advice["params"]
+    index, from_cache = cache.get_or_build(engine, points, params,
+                                           lambda pts: cls.from_points(pts, **(params or {})))
+    cache.put_meta(engine, cache.key_for(engine, points, params), advice)
+    return index, advice, from_cache
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Dobór silnika i parametrów dla zbiorów CSV.")
+    ap.add_argument("csv", nargs="+", help="pliki punktów (x,y)")
+    ap.add_argument("--queries", type=int, default=1000, help="zapytań na jedną budowę")
+    ap.add_argument("--sample", type=int, default=DEFAULT_SAMPLE, help="rozmiar próbki kalibracji")
+    ap.add_argument("--engines", default=None, help="silniki oddzielone przecinkami (domyślnie wszystkie)")
+    ap.add_argument("--recalibrate", action="store_true", help="ignoruj zapisany wybór")
+    ap.add_argument("--verbose", action="store_true")
+    args = ap.parse_args(argv)
+
+    engines = args.engines.split(",") if args.engines else None
+    for path in args.csv:
+        if path.endswith(".query.csv"):
+            continue
+        pts = load_points_csv(path)
+        index, advice, from_cache = build_advised(pts, queries=args.queries, recalibrate=args.recalibrate,
+                                                  engines=engines, sample_size=args.sample,
+                                                  verbose=args.verbose)
+        e = advice["expected"]
+        print(f"{path} | {advice['engine']} {json.dumps(advice['params'] or {}, sort_keys=True)} | "
+              f"expected build={e['build_s']:.3f}s query={e['query_s'] * 1e3:.3f}ms "
+              f"total={e['total_s']:.3f}s ({e['queries']} zapytań) | "
+              f"dispersion={advice['profile']['dispersion']:.2f} "
+              f"duplicates={advice['profile']['duplicate_ratio']:.3f}"
+              f"{' | z cache' if from_cache else ''}")
+        if hasattr(index, "close"):
+            index.close()
+
+
+if __name__ == "__main__":
+    main()
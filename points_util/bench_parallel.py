@@ -0,0 +1,126 @@
+"""
+Równoległy benchmark: komórki (plik CSV, silnik, capacity/max_depth) w puli procesów.
+
+Każdy proces roboczy:
+- jest przypięty do jednego rdzenia (sched_setaffinity, tam gdzie jest) - dwa
+  pomiary nie dzielą rdzenia, a proces nie wędruje między rdzeniami w trakcie,
+- ma własny TreeCache na tym samym katalogu (zapis do cache jest atomowy),
+- liczy jedną komórkę naraz; po każdej komórce gc.collect(), żeby śmieci po
+  poprzednim drzewie nie wpadały w czasy następnego.
+
+Baseline'y NumPy (skan, sort po x) to osobna komórka (tag None) - raz na
+(plik, parametry), nie raz na silnik. Wyniki komórek jednego (pliku, parametrów)
+są sklejane w jeden wiersz, a przyspieszenia względem baseline'ów liczone po
+sklejeniu (add_speedups), więc wiersz jest taki sam jak z bench_both_file
+i dalej idzie do save_separate_tables_both bez zmian.
+Liczba procesów domyślnie = liczba dostępnych rdzeni; więcej nie ma sensu, bo
+wtedy pomiary znowu dzielą rdzenie.
+"""
+import gc
+import os
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from points_util.tree_cache import TreeCache, default_cache
+from points_util.time_compare import BENCH_ENGINES, add_speedups, bench_both_file
+
+_worker_cache = None
+_worker_cpu = None
+
+
+def available_cpus():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _init_worker(cpu_queue, cache_root, max_bytes, pin_cpus):
+    global _worker_cache, _worker_cpu
+    _worker_cpu = cpu_queue.get()
+    if pin_cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {_worker_cpu})
+    _worker_cache = TreeCache(cache_root, max_bytes)
+
+
+def _run_cell(cell):
+    csv_path, query_rect, tag, capacity, max_depth, options = cell
+    cache = _worker_cache
+    before = (cache.hits, cache.misses, cache.evictions)
+
+    if tag is None:
+        # komórka baseline'ów: bez drzew
+        r = bench_both_file(csv_path, query_rect, capacity=capacity, max_depth=max_depth,
+                            cache=cache, engines=(), baselines=True, **options)
+    else:
+        r = bench_both_file(csv_path, query_rect, capacity=capacity, max_depth=max_depth,
+                            cache=cache, engines=(tag,), baselines=False, **options)
+        r[f"{tag}_worker_cpu"] = _worker_cpu
+
+    after = (cache.hits, cache.misses, cache.evictions)
+    gc.collect()
+    return r, tuple(a - b for a, b in zip(after, before))
+
+
+def make_cells(inputs, param_grid, engines=tuple(BENCH_ENGINES), baselines=True, **options):
+    """
+    inputs: pary (plik CSV, prostokąt zapytania) - np. z time_compare.dataset_files.
+    baselines: dodatkowa komórka (tag None) z baseline'ami NumPy dla każdego (pliku, parametrów).
+    """
+    tags = (*engines, None) if baselines else tuple(engines)
+    return [
+        (csv_path, query_rect, tag, capacity, max_depth, options)
+        for csv_path, query_rect in inputs
+        for capacity, max_depth in param_grid
+        for tag in tags
+    ]
+
+
+def run_parallel(inputs, param_grid, workers=None, pin_cpus=True, cache: TreeCache = None,
+                 engines=tuple(BENCH_ENGINES), baselines=True, **options):
+    """
+    Uruchamia wszystkie komórki w puli procesów i zwraca wiersze w kolejności
+    (plik, parametry) - tej samej, co wersja szeregowa.
+    options: jak w bench_both_file (compare_pickle, measure_memory, cold_build, repeat, ...).
+    Liczniki trafień/chybień cache z procesów są doliczane do przekazanego cache.
+    """
+    if cache is None:
+        cache = default_cache()
+
+    cpus = available_cpus()
+    if workers is None:
+        workers = len(cpus)
+
+    cells = make_cells(inputs, param_grid, engines=engines, baselines=baselines, **options)
+    workers = max(1, min(workers, len(cells)))
+    if workers > len(cpus):
+        print(f"[PARALLEL] uwaga: {workers} procesów na {len(cpus)} rdzeniach - pomiary będą dzielić rdzenie")
+
+    ctx = mp.get_context()
+    cpu_queue = ctx.Queue()
+    for i in range(workers):
+        cpu_queue.put(cpus[i % len(cpus)])
+
+    rows = {}
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker,
+                             initargs=(cpu_queue, str(cache.root), cache.max_bytes, pin_cpus)) as pool:
+        futures = [pool.submit(_run_cell, cell) for cell in cells]
+        for fut in as_completed(futures):
+            r, (hits, misses, evictions) = fut.result()
+            cache.hits += hits
+            cache.misses += misses
+            cache.evictions += evictions
+
+            row_key = (r["path"], r["capacity"], r["max_depth"])
+            # pola wspólne (file, n, load_csv_s, ...) bierzemy z pierwszej komórki
+            row = rows.setdefault(row_key, {})
+            for k, v in r.items():
+                row.setdefault(k, v)
+
+    order = [(csv_path, capacity, max_depth)
+             for csv_path, _ in inputs
+             for capacity, max_depth in param_grid]
+    out = [rows[k] for k in order]
+    if baselines:
+        for row in out:
+            add_speedups(row, engines)
+    return out
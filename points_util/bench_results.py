@@ -0,0 +1,233 @@
+"""
+Wyniki benchmarku w formie do maszynowego porównywania.
+
+Jeden przebieg = jeden plik JSON Lines (times/runs/<run_id>.jsonl):
+- pierwsza linia: {"type": "run", "run_id", "created", "env": {...}, "params": {...}}
+  env: CPU, liczba rdzeni, Python, platforma, wersje numpy/pandas, commit git
+  (+ czy drzewo robocze było brudne), stan cache drzew,
+- kolejne linie: {"type": "result", ...} - wiersz z bench_both_file 1:1,
+  z surowymi próbkami (*_samples) i angielskimi nazwami kolumn.
+NaN/inf zapisujemy jako null (JSON ich nie zna).
+
+Porównanie dwóch przebiegów:
+    python -m points_util.bench_results compare times/runs/A.jsonl times/runs/B.jsonl
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from points_util.bench_stats import percentile
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_RUNS_DIR = "times/runs"
+
+# metryki czasu porównywane domyślnie (mniejsze = lepsze)
+TIME_SUFFIXES = ("_build_s", "_load_s", "_query_s")
+DEFAULT_THRESHOLD = 0.10
+
+
+def _git(*args):
+    try:
+        out = subprocess.run(["git", *args], cwd=REPO_ROOT, capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() if out.returncode == 0 else None
+
+
+def cpu_model() -> str:
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def environment(cache=None) -> dict:
+    import numpy
+    import pandas
+
+    status = _git("status", "--porcelain", "--untracked-files=no")
+    env = {
+        "hostname": socket.gethostname(),
+        "cpu": cpu_model(),
+        "cpu_count": os.cpu_count(),
+        "cpu_affinity": len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else None,
+        "python": sys.version.split()[0],
+        "python_impl": platform.python_implementation(),
+        "platform": platform.platform(),
+        "numpy": numpy.__version__,
+        "pandas": pandas.__version__,
+        "git_commit": _git("rev-parse", "HEAD"),
+        "git_dirty": bool(status) if status is not None else None,
+    }
+    if cache is not None:
+        st = cache.stats()
+        env["cache"] = {"root": str(cache.root), "entries": len(cache.entries()), **st}
+    return env
+
+
+def _clean(value):
+    """NaN/inf -> None, rekurencyjnie (listy próbek, słowniki)."""
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, (list, tuple)):
+        return [_clean(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _clean(v) for k, v in value.items()}
+    if hasattr(value, "item"):  # skalary numpy
+        return _clean(value.item())
+    return value
+
+
+def _create_run_file(out_dir, run_id):
+    """Otwiera nowy plik przebiegu ("x" - nigdy nie nadpisuje); przy kolizji run_id-1, run_id-2, ..."""
+    i = 0
+    while True:
+        rid = run_id if i == 0 else f"{run_id}-{i}"
+        path = os.path.join(out_dir, f"{rid}.jsonl")
+        try:
+            return rid, path, open(path, "x", encoding="utf-8")
+        except FileExistsError:
+            i += 1
+
+
+def save_run_jsonl(results, out_dir=DEFAULT_RUNS_DIR, cache=None, params=None, run_id=None) -> str:
+    """
+    Zapisuje przebieg do nowego pliku. Domyślny run_id: czas, commit i pid
+    (równoległe procesy w tej samej sekundzie); istniejący plik nigdy nie jest nadpisywany.
+    """
+    created = time.strftime("%Y-%m-%d %H:%M:%S")
+    if run_id is None:
+        commit = (_git("rev-parse", "--short", "HEAD") or "nogit")
+        run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{commit}-{os.getpid()}"
+
+    os.makedirs(out_dir, exist_ok=True)
+    run_id, path, f = _create_run_file(out_dir, run_id)
+    header = {"type": "run", "run_id": run_id, "created": created,
+              "env": environment(cache), "params": params or {}}
+    with f:
+        f.write(json.dumps(_clean(header), ensure_ascii=False) + "\n")
+        for r in results:
+            f.write(json.dumps(_clean({"type": "result", **r}), ensure_ascii=False) + "\n")
+    return path
+
+
+def load_run(path: str):
+    """Zwraca (nagłówek przebiegu, lista wierszy)."""
+    header, rows = None, []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            if rec.get("type") == "run":
+                header = rec
+            else:
+                rows.append(rec)
+    return header, rows
+
+
+def _row_key(r):
+    # ścieżka zależy od maszyny - klucz z nazwy pliku i rozmiaru
+    return r.get("file"), r.get("n"), r.get("capacity"), r.get("max_depth")
+
+
+def _disjoint(a_samples, b_samples, lo=10, hi=90) -> bool:
+    """
+    Czy przedziały [p_lo, p_hi] próbek się nie nakładają. Bez powtórzonych
+    próbek (pojedynczy pomiar, np. scan_build_s) nie da się odróżnić zmiany
+    od szumu - wtedy False, czyli zmiana nieistotna.
+    """
+    a = [v for v in a_samples or [] if v is not None]
+    b = [v for v in b_samples or [] if v is not None]
+    if len(a) < 2 or len(b) < 2:
+        return False
+    return percentile(a, hi) < percentile(b, lo) or percentile(b, hi) < percentile(a, lo)
+
+
+def compare_runs(rows_a, rows_b, threshold=DEFAULT_THRESHOLD, metrics=None):
+    """
+    Lista zmian dla wspólnych wierszy: słowniki file, n, metric, a, b, change
+    (b/a - 1) i significant - |change| >= threshold i rozkłady próbek
+    (p10..p90) rozłączne; metryki bez surowych próbek w obu przebiegach nigdy
+    nie są istotne (widać je z --all).
+    """
+    by_key = {_row_key(r): r for r in rows_a}
+    out = []
+    for rb in rows_b:
+        ra = by_key.get(_row_key(rb))
+        if ra is None:
+            continue
+        names = metrics or sorted(k for k in rb if k.endswith(TIME_SUFFIXES) and k in ra)
+        for name in names:
+            a, b = ra.get(name), rb.get(name)
+            if not a or b is None:
+                continue
+            change = b / a - 1.0
+            samples = name[:-2] + "_samples"
+            significant = abs(change) >= threshold and _disjoint(ra.get(samples), rb.get(samples))
+            out.append({"file": rb.get("file"), "n": rb.get("n"), "metric": name,
+                        "a": a, "b": b, "change": change, "significant": significant})
+    return out
+
+
+def env_diff(header_a, header_b):
+    ea = (header_a or {}).get("env", {})
+    eb = (header_b or {}).get("env", {})
+    keys = ("cpu", "cpu_count", "python", "platform", "numpy", "git_commit", "git_dirty")
+    return [(k, ea.get(k), eb.get(k)) for k in keys if ea.get(k) != eb.get(k)]
+
+
+def print_comparison(path_a, path_b, threshold=DEFAULT_THRESHOLD, show_all=False):
+    """Wypisuje różnice środowiska i istotne zmiany. Zwraca listę zmian."""
+    ha, rows_a = load_run(path_a)
+    hb, rows_b = load_run(path_b)
+
+    print(f"A: {path_a}\nB: {path_b}")
+    for k, va, vb in env_diff(ha, hb):
+        print(f"[ENV] {k}: {va} -> {vb}")
+
+    changes = compare_runs(rows_a, rows_b, threshold=threshold)
+    for c in changes:
+        if not (c["significant"] or show_all):
+            continue
+        mark = ("WOLNIEJ" if c["change"] > 0 else "SZYBCIEJ") if c["significant"] else ""
+        print(f"{c['file']:28s} N={c['n']:>8} {c['metric']:18s} "
+              f"{c['a'] * 1e3:10.3f}ms -> {c['b'] * 1e3:10.3f}ms {c['change'] * 100:+7.1f}% {mark}")
+
+    n_sig = sum(c["significant"] for c in changes)
+    n_slow = sum(c["significant"] and c["change"] > 0 for c in changes)
+    print(f"[COMPARE] metryk={len(changes)} istotnych={n_sig} (wolniej={n_slow}) próg={threshold:.0%}")
+    return changes
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Porównanie dwóch przebiegów benchmarku (JSONL).")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    cmp_ = sub.add_parser("compare", help="różnice między dwoma przebiegami")
+    cmp_.add_argument("a")
+    cmp_.add_argument("b")
+    cmp_.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    cmp_.add_argument("--all", action="store_true", help="pokaż też zmiany nieistotne")
+    cmp_.add_argument("--fail-on-slower", action="store_true",
+                      help="kod wyjścia 1, gdy któraś metryka jest istotnie wolniejsza")
+    args = ap.parse_args(argv)
+
+    changes = print_comparison(args.a, args.b, threshold=args.threshold, show_all=args.all)
+    if args.fail_on_slower and any(c["significant"] and c["change"] > 0 for c in changes):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Pomiary czasu do benchmarku: rozgrzewka, powtórzenia, percentyle.
+
+Pojedyncza para perf_counter() dla zapytania trwającego mikrosekundy to szum
+(w tabelach wychodziło 0,000). Tu każdy pomiar to lista próbek, z której
+liczymy medianę, p95, p99 i przepustowość.
+"""
+import math
+import time
+from typing import Callable, List, Optional, Sequence
+
+
+def measure(fn: Callable[[], object], warmup: int = 1, repeat: int = 5,
+            min_time: float = 0.0) -> List[float]:
+    """
+    Uruchamia fn() warmup razy bez pomiaru, potem repeat razy z pomiarem.
+    min_time > 0: każda próbka to średnia z tylu wywołań w pętli, ile trzeba,
+    żeby pętla trwała co najmniej min_time sekund (dla bardzo krótkich zapytań).
+    """
+    for _ in range(warmup):
+        fn()
+
+    loops = 1
+    if min_time > 0:
+        while True:
+            t0 = time.perf_counter()
+            for _ in range(loops):
+                fn()
+            elapsed = time.perf_counter() - t0
+            if elapsed >= min_time:
+                break
+            loops *= 2
+
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        samples.append((time.perf_counter() - t0) / loops)
+    return samples
+
+
+def percentile(samples: Sequence[float], q: float) -> float:
+    """Percentyl q (0..100) z interpolacją liniową, jak numpy.percentile."""
+    if not samples:
+        return math.nan
+    xs = sorted(samples)
+    if len(xs) == 1:
+        return xs[0]
+    k = (len(xs) - 1) * q / 100.0
+    lo = math.floor(k)
+    hi = math.ceil(k)
+    if lo == hi:
+        return xs[lo]
+    return xs[lo] + (xs[hi] - xs[lo]) * (k - lo)
+
+
+def summarize(samples: Sequence[float], items: Optional[int] = None) -> dict:
+    """
+    median/p95/p99/mean/min w sekundach + przepustowość:
+    ops_s = 1/median, items_s = items/median (np. znalezione punkty na sekundę).
+    """
+    if not samples:
+        return {"median_s": math.nan, "p95_s": math.nan, "p99_s": math.nan,
+                "mean_s": math.nan, "min_s": math.nan, "ops_s": math.nan, "runs": 0}
+
+    med = percentile(samples, 50)
+    out = {
+        "median_s": med,
+        "p95_s": percentile(samples, 95),
+        "p99_s": percentile(samples, 99),
+        "mean_s": sum(samples) / len(samples),
+        "min_s": min(samples),
+        "ops_s": 1.0 / med if med > 0 else math.inf,
+        "runs": len(samples),
+    }
+    if items is not None:
+        out["items_s"] = items / med if med > 0 else math.inf
+    return out
@@ -0,0 +1,360 @@
+"""
+Indeks na krzywej wypełniającej przestrzeń: punkty posortowane po kodzie Mortona (Z-order)
+albo Hilberta w płaskich tablicach NumPy.
+
+Prostokąt graniczny punktów jest dzielony na 2^bits x 2^bits komórek (ix, iy); kod
+komórki to przeplot bitów (Morton) albo numer na krzywej Hilberta. Obie krzywe
+mają tę samą własność co QuadTree: każdy wyrównany kwadrat 2^k x 2^k (węzeł
+drzewa czwórkowego na poziomie bits - k) to ciągły przedział kodów. Budowa to
+jedno sortowanie, a tablice codes/xs/ys/ids można mapować z pliku bez kopiowania.
+
+Zapytanie rozkłada prostokąt na przedziały kodów, schodząc po tym niejawnym
+drzewie czwórkowym (cały poziom naraz, NumPy):
+- węzeł ściśle wewnątrz (bez komórek brzegowych) -> przedział "pełny", bez testów,
+- węzeł przecinający brzeg -> dzielony dalej, aż do pojedynczej komórki albo do
+  limitu max_ranges przedziałów; wtedy przedział "do sprawdzenia".
+Każdy przedział kodów zamienia się na zakres pozycji dwoma searchsorted.
+Komórki brzegowe są wyznaczane tak jak w GridIndex (floor jest monotoniczny),
+więc prostokąt jest półotwarty, jak Rect.contains_point - liczba trafień zgadza
+się z drzewami. Zapis do FLATTREE (rodzaj "curve").
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+from points_util.points_classes import Point, Rect
+from points_util.query_stats import QueryStats, QueryTracer
+from points_util.spatial_index import nearest_by_count, query_stats
+from points_util.tree_format import gather_ranges, read_flat, to_array, write_flat
+
+CURVE_KIND = "curve"
+CURVES = ("morton", "hilbert")
+MAX_BITS = 31
+
+
+def _spread_bits(v):
+    """Bity v (< 2^32) na pozycjach parzystych."""
+    v = v.astype(np.uint64) & np.uint64(0xFFFFFFFF)
+    for shift, mask in ((16, 0x0000FFFF0000FFFF), (8, 0x00FF00FF00FF00FF), (4, 0x0F0F0F0F0F0F0F0F),
+                        (2, 0x3333333333333333), (1, 0x5555555555555555)):
+        v = (v | (v << np.uint64(shift))) & np.uint64(mask)
+    return v
+
+
+def morton_codes(ix, iy):
+    return _spread_bits(np.asarray(ix)) | (_spread_bits(np.asarray(iy)) << np.uint64(1))
+
+
+def hilbert_codes(ix, iy, bits: int):
+    """Numer komórki na krzywej Hilberta rzędu bits (xy2d, wektorowo)."""
+    x = np.array(ix, dtype=np.int64, copy=True, ndmin=1)
+    y = np.array(iy, dtype=np.int64, copy=True, ndmin=1)
+    n = np.int64(1) << bits
+    d = np.zeros(x.shape, dtype=np.int64)
+    s = n >> 1
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        d += s * s * ((3 * rx.astype(np.int64)) ^ ry.astype(np.int64))
+        # obrót ćwiartki, żeby kolejne bity czytać w jej układzie
+        flip = ~ry & rx
+        x = np.where(flip, n - 1 - x, x)
+        y = np.where(flip, n - 1 - y, y)
+        x, y = np.where(ry, x, y), np.where(ry, y, x)
+        s >>= 1
+    return d.astype(np.uint64)
+
+
+def _child_digit(curve: str, qx, qy, f, s):
+    """
+    Cyfra (0..3) ćwiartki (qx, qy) w kodzie i nowy stan (f, s) dziecka.
+    Stan Hilberta = złożenie obrotów z hilbert_codes: f - dopełnienie obu
+    współrzędnych, s - zamiana x z y (oba przemienne, więc wystarczą dwa bity).
+    Działa na int i na tablicach NumPy.
+    """
+    if curve == "morton":
+        return qx | (qy << 1), f, s
+    rx, ry = qx ^ f, qy ^ f
+    swap = (rx ^ ry) & s
+    rx, ry = rx ^ swap, ry ^ swap
+    turn = 1 - ry
+    return (3 * rx) ^ ry, f ^ (turn & rx), s ^ turn
+
+
+# ćwiartki dzieci w kolejności (0,0), (1,0), (0,1), (1,1); stan = 2 * f + s
+_QX = np.array([0, 1, 0, 1], np.int64)
+_QY = np.array([0, 0, 1, 1], np.int64)
+
+
+def _child_tables(curve: str):
+    """(cyfra[ćwiartka, stan], następny stan[ćwiartka, stan]) jako tablice 4 x 4."""
+    digit = np.zeros((4, 4), np.uint64)
+    nxt = np.zeros((4, 4), np.int64)
+    for q in range(4):
+        for st in range(4):
+            d, f, s = _child_digit(curve, int(_QX[q]), int(_QY[q]), st >> 1, st & 1)
+            digit[q, st], nxt[q, st] = d, 2 * f + s
+    return digit, nxt
+
+
+_CHILD_TABLES = {curve: _child_tables(curve) for curve in CURVES}
+
+
+def _merge(lo, hi):
+    """Sklejenie przedziałów [lo, hi) stykających się końcami (lo posortowane)."""
+    if lo.size <= 1:
+        return lo, hi
+    start = np.ones(lo.size, dtype=bool)
+    start[1:] = lo[1:] != hi[:-1]
+    idx = np.flatnonzero(start)
+    return lo[idx], hi[np.append(idx[1:] - 1, lo.size - 1)]
+
+
+class CurveIndex:
+    def __init__(self, xs, ys, curve: str = "hilbert", bits: int = 16, max_ranges: int = 256):
+        """
+        curve: "morton" (Z-order) albo "hilbert"; bits: rozdzielczość siatki (2^bits
+        komórek na oś, jak max_depth QuadTree); max_ranges: limit przedziałów "do
+        sprawdzenia" na zapytanie (mniej = mniej searchsorted, więcej testów punktów).
+        """
+        if curve not in CURVES:
+            raise ValueError(f"Nieznana krzywa: {curve} ({'|'.join(CURVES)})")
+        if not 1 <= bits <= MAX_BITS:
+            raise ValueError(f"bits musi być w [1, {MAX_BITS}]")
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        self.curve, self.bits, self.max_ranges = curve, bits, max_ranges
+
+        if len(xs):
+            self.x0, self.x1 = float(xs.min()), float(xs.max())
+            self.y0, self.y1 = float(ys.min()), float(ys.max())
+        else:
+            self.x0 = self.x1 = self.y0 = self.y1 = 0.0
+        side = 1 << bits
+        # zdegenerowany wymiar (współliniowe) = jedna kolumna/wiersz
+        self.sx = side / (self.x1 - self.x0) if self.x1 > self.x0 else 0.0
+        self.sy = side / (self.y1 - self.y0) if self.y1 > self.y0 else 0.0
+
+        codes = self._codes(self._cell(xs, self.x0, self.sx), self._cell(ys, self.y0, self.sy))
+        order = np.argsort(codes, kind="stable")
+        self.codes = codes[order]
+        self.xs = xs[order]
+        self.ys = ys[order]
+        self.ids = order  # indeks punktu w tablicy wejściowej
+        self._flat = None
+
+    @classmethod
+    def build(cls, xs, ys, curve: str = "hilbert", bits: int = 16, max_ranges: int = 256) -> "CurveIndex":
+        return cls(xs, ys, curve=curve, bits=bits, max_ranges=max_ranges)
+
+    @classmethod
+    def from_points(cls, points, curve: str = "hilbert", bits: int = 16, max_ranges: int = 256) -> "CurveIndex":
+        n = len(points)
+        xs = np.fromiter((p.x for p in points), dtype=np.float64, count=n)
+        ys = np.fromiter((p.y for p in points), dtype=np.float64, count=n)
+        return cls(xs, ys, curve=curve, bits=bits, max_ranges=max_ranges)
+
+    def __len__(self) -> int:
+        return len(self.xs)
+
+    def _cell(self, v, v0: float, scale: float):
+        return np.clip(np.floor((np.asarray(v) - v0) * scale), 0, (1 << self.bits) - 1).astype(np.int64)
+
+    def _codes(self, ix, iy):
+        if self.curve == "morton":
+            return morton_codes(ix, iy)
+        return hilbert_codes(ix, iy, self.bits)
+
+    def _node_prefix(self, ix: int, iy: int, k: int):
+        """(prefiks kodu, f, s) węzła 2^k x 2^k o lewej dolnej komórce (ix, iy)."""
+        prefix = f = s = 0
+        for j in range(self.bits - 1, k - 1, -1):
+            digit, f, s = _child_digit(self.curve, (ix >> j) & 1, (iy >> j) & 1, f, s)
+            prefix = 4 * prefix + digit
+        return prefix, f, s
+
+    # ------------------------------------------------------------------ zakres
+    def decompose(self, r: Rect):
+        """
+        (pełne, do sprawdzenia): pary tablic [lo, hi) przedziałów kodów, posortowane
+        i sklejone. None, gdy prostokąt nie przecina punktów.
+        """
+        if not len(self.xs) or r.right <= r.left or r.top <= r.bottom:
+            return None
+        if r.right <= self.x0 or r.left > self.x1 or r.top <= self.y0 or r.bottom > self.y1:
+            return None
+        tx0, tx1 = int(self._cell(r.left, self.x0, self.sx)), int(self._cell(r.right, self.x0, self.sx))
+        ty0, ty1 = int(self._cell(r.bottom, self.y0, self.sy)), int(self._cell(r.top, self.y0, self.sy))
+
+        full_lo, full_hi, check_lo, check_hi = [], [], [], []
+        # start od najmniejszego wyrównanego węzła zawierającego wszystkie komórki brzegowe
+        top = ((tx0 ^ tx1) | (ty0 ^ ty1)).bit_length()
+        ox, oy = tx0 >> top << top, ty0 >> top << top
+        prefix, f, s = self._node_prefix(ox, oy, top)
+        digit, nxt = _CHILD_TABLES[self.curve]
+        # węzły bieżącego poziomu: lewa dolna komórka, prefiks kodu, stan krzywej
+        ox, oy = np.array([ox], np.int64), np.array([oy], np.int64)
+        prefix, state = np.array([prefix], np.uint64), np.array([2 * f + s], np.int64)
+        for k in range(top, -1, -1):
+            size = 1 << k
+            ex, ey = ox + size - 1, oy + size - 1
+            # wnętrze = komórki ściśle między brzegowymi
+            inner = (ox > tx0) & (ex < tx1) & (oy > ty0) & (ey < ty1)
+            lo = prefix << np.uint64(2 * k)
+            full_lo.append(lo[inner])
+            full_hi.append(lo[inner] + np.uint64(size * size))
+            keep = ~inner
+            ox, oy, prefix, state, lo = ox[keep], oy[keep], prefix[keep], state[keep], lo[keep]
+            if not ox.size:
+                break
+            if k == 0 or 4 * ox.size > self.max_ranges:
+                check_lo.append(lo)
+                check_hi.append(lo + np.uint64(size * size))
+                break
+            # dzieci wszystkich węzłów naraz, od razu bez tych poza komórkami brzegowymi
+            half = size >> 1
+            cx = (ox + half * _QX[:, None]).ravel()
+            cy = (oy + half * _QY[:, None]).ravel()
+            hit = (cx + half - 1 >= tx0) & (cx <= tx1) & (cy + half - 1 >= ty0) & (cy <= ty1)
+            ox, oy = cx[hit], cy[hit]
+            prefix = (prefix * np.uint64(4) + digit[:, state]).ravel()[hit]
+            state = nxt[:, state].ravel()[hit]
+
+        out = []
+        for los, his in ((full_lo, full_hi), (check_lo, check_hi)):
+            lo, hi = np.concatenate(los), np.concatenate(his)
+            order = np.argsort(lo)
+            out.append(_merge(lo[order], hi[order]))
+        return out[0], out[1]
+
+    def _positions(self, lo, hi):
+        return np.searchsorted(self.codes, lo, "left"), np.searchsorted(self.codes, hi, "left")
+
+    def _check_hits(self, r: Rect, starts, ends):
+        cand = gather_ranges(starts, ends)
+        x, y = self.xs[cand], self.ys[cand]
+        return cand[(x >= r.left) & (x < r.right) & (y >= r.bottom) & (y < r.top)]
+
+    def _hit_positions(self, r: Rect):
+        ranges = self.decompose(r)
+        if ranges is None:
+            return np.zeros(0, np.int64)
+        full, check = ranges
+        return np.concatenate((self._check_hits(r, *self._positions(*check)), gather_ranges(*self._positions(*full))))
+
+    def query(self, range_rect: Rect, tracer: Optional[QueryTracer] = None) -> List[Point]:
+        """Punkty w prostokącie (nowe obiekty Point, jak FlatQuadTree.query)."""
+        if tracer is not None:
+            return self._query_traced(range_rect, tracer)
+        pos = self._hit_positions(range_rect)
+        return [Point(x, y) for x, y in zip(self.xs[pos].tolist(), self.ys[pos].tolist())]
+
+    def query_indices(self, range_rect: Rect) -> np.ndarray:
+        """Indeksy trafionych punktów w kolejności wejściowej (jak np_baselines)."""
+        return self.ids[self._hit_positions(range_rect)]
+
+    def count(self, range_rect: Rect) -> int:
+        ranges = self.decompose(range_rect)
+        if ranges is None:
+            return 0
+        full, check = ranges
+        fs, fe = self._positions(*full)
+        return len(self._check_hits(range_rect, *self._positions(*check))) + int((fe - fs).sum())
+
+    def _query_traced(self, r: Rect, tracer: QueryTracer) -> List[Point]:
+        """
+        To samo co query, z zaczepami tracera: indeks = węzeł na głębokości 0,
+        każdy przedział kodów = węzeł na głębokości 1 (do sprawdzenia: liść z testami).
+        """
+        found = []
+        tracer.enter(self, 0)
+        ranges = self.decompose(r)
+        if ranges is not None:
+            full, check = ranges
+            for tested, (starts, ends) in ((True, self._positions(*check)), (False, self._positions(*full))):
+                for s, e in zip(starts.tolist(), ends.tolist()):
+                    tracer.enter((s, e), 1)
+                    if tested:
+                        tracer.leaf((s, e), 1)
+                    for j in range(s, e):
+                        p = Point(float(self.xs[j]), float(self.ys[j]))
+                        if tested:
+                            tracer.test(p)
+                            if not r.contains_point(p):
+                                continue
+                        found.append(p)
+                        tracer.report(p)
+                    tracer.leave((s, e), 1)
+        tracer.leave(self, 0)
+        return found
+
+    def nearest(self, x: float, y: float, k: int = 1) -> List[Point]:
+        """k najbliższych punktów, od najbliższego (przez count - patrz nearest_by_count)."""
+        return nearest_by_count(self, x, y, k, (self.x0, self.y0, self.x1, self.y1))
+
+    def stats(self, range_rect: Rect) -> QueryStats:
+        return query_stats(self, range_rect)
+
+    # ----------------------------------------------------------------- zapis
+    _ARRAYS = ("codes", "xs", "ys", "ids")
+
+    def save(self, path: str | Path) -> None:
+        save_curve_flat(self, path)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "CurveIndex":
+        return load_curve_flat(path)
+
+    def copy(self) -> "CurveIndex":
+        """Niezależna kopia w pamięci (np. z indeksu otwartego przez mmap)."""
+        c = CurveIndex.__new__(CurveIndex)
+        c.__dict__.update(self.__dict__)
+        for name in self._ARRAYS:
+            setattr(c, name, np.array(getattr(self, name)))
+        c._flat = None
+        return c
+
+    def close(self) -> None:
+        if self._flat is not None:
+            # widoki NumPy trzymają bufor mmap - muszą zniknąć przed jego zamknięciem
+            for name in self._ARRAYS:
+                setattr(self, name, None)
+            self._flat.close()
+            self._flat = None
+
+
+def save_curve_flat(index: CurveIndex, path: str | Path) -> None:
+    meta = {
+        "curve": index.curve, "bits": index.bits, "max_ranges": index.max_ranges,
+        "x0": index.x0, "y0": index.y0, "x1": index.x1, "y1": index.y1,
+        "sx": index.sx, "sy": index.sy, "n_points": len(index),
+    }
+    sections = {
+        "codes": to_array("Q", index.codes),
+        "xs": to_array("d", index.xs),
+        "ys": to_array("d", index.ys),
+        "ids": to_array("q", index.ids),
+    }
+    write_flat(path, CURVE_KIND, meta, sections)
+
+
+def load_curve_flat(path: str | Path, use_mmap: bool = True) -> CurveIndex:
+    """CurveIndex gotowy do zapytań; tablice to widoki na plik (mmap) do close()."""
+    flat = read_flat(path, use_mmap=use_mmap)
+    if flat.kind != CURVE_KIND:
+        raise ValueError(f"Oczekiwano '{CURVE_KIND}', jest '{flat.kind}'.")
+    m = flat.meta
+    c = CurveIndex.__new__(CurveIndex)
+    c.curve, c.bits, c.max_ranges = m["curve"], m["bits"], m["max_ranges"]
+    c.x0, c.y0, c.x1, c.y1 = m["x0"], m["y0"], m["x1"], m["y1"]
+    c.sx, c.sy = m["sx"], m["sy"]
+    s = flat.sections
+    c.codes = np.frombuffer(s["codes"], dtype=np.uint64)
+    c.xs = np.frombuffer(s["xs"], dtype=np.float64)
+    c.ys = np.frombuffer(s["ys"], dtype=np.float64)
+    c.ids = np.frombuffer(s["ids"], dtype=np.int64)
+    c._flat = flat
+    return c
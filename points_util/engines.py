@@ -0,0 +1,107 @@
+"""
+Rejestr silników (indeksów przestrzennych) po nazwie.
+
+Nazwa silnika to ta sama nazwa, której używa TreeCache (SERIALIZERS). Wpis:
+    cls          - klasa spełniająca SpatialIndex (points_util.spatial_index),
+    tag          - krótki prefiks kolumn benchmarku (qt_query_s, kd_hits, ...),
+    label        - nazwa do tabel i wykresów (QuadTreeBuildTime, ...),
+    short        - skrót do kolumny trafień (QT_FoundPoints, ...),
+    traversal    - pola QueryStats pokazywane w tabelach -> przyrostek kolumny,
+    params       - params(capacity, max_depth) -> parametry budowy (dict) albo None;
+                   to samo idzie do klucza cache i do cls.from_points(pts, **params),
+    materialize  - drzewo odczytane z cache (SERIALIZERS[nazwa][1]) -> indeks w pamięci,
+    suffix       - rozszerzenie pliku FLATTREE przy porównaniu z pickle,
+    version      - wersja algorytmu budowy w kluczu cache (tree_cache.ENGINE_VERSIONS);
+                   podbicie unieważnia drzewa zbudowane starym kodem.
+
+Benchmark (time_compare.BENCH_ENGINES), skalowanie (scaling.ENGINES) i bench workloadu
+biorą silniki stąd, więc nowy silnik wystarczy zarejestrować:
+    register_engine("moj", MojIndex, tag="mj", label="MójIndex")
+Bez save/load w SERIALIZERS rejestracja dopisuje je z cls.save / cls.load.
+"""
+from typing import Callable, Dict, Optional
+
+from points_util.tree_cache import ENGINE_VERSIONS, SERIALIZERS, engine_version, register_serializer
+from points_util.spatial_index import SpatialIndex
+from QuadTree.quadtree import QuadTree
+from KDTree.kdtree import KDTree
+from points_util.grid_index import GridIndex
+from points_util.curve_index import CurveIndex
+from RTree.rtree import RTree
+from RangeTree.range_tree import RangeTree
+
+ENGINES: Dict[str, dict] = {}
+
+TRAVERSAL_COLUMNS = {
+    "nodes_visited": "NodesVisited",
+    "nodes_pruned": "NodesPruned",
+    "leaves_scanned": "LeavesScanned",
+    "points_tested": "PointsTested",
+    "max_depth": "MaxDepthReached",
+}
+
+
+def register_engine(name: str, cls, tag: str, label: Optional[str] = None, short: Optional[str] = None,
+                    params: Callable = lambda capacity, max_depth: None,
+                    materialize: Callable = lambda tree: tree, suffix: str = ".flat",
+                    traversal: Optional[Dict[str, str]] = None, version: Optional[int] = None) -> None:
+    if not issubclass(cls, SpatialIndex):
+        raise TypeError(f"{cls.__name__} nie spełnia SpatialIndex")
+    if any(e["tag"] == tag for n, e in ENGINES.items() if n != name):
+        raise ValueError(f"Tag '{tag}' jest już zajęty")
+    if version is not None:
+        ENGINE_VERSIONS[name] = version
+    ENGINES[name] = {"cls": cls, "tag": tag, "label": label or cls.__name__, "short": short or tag.upper(),
+                     "params": params, "materialize": materialize, "suffix": suffix,
+                     "traversal": TRAVERSAL_COLUMNS if traversal is None else traversal,
+                     "version": engine_version(name)}
+    if name not in SERIALIZERS:
+        register_serializer(name, lambda tree, path: tree.save(path), cls.load)
+
+
+def get_engine(name: str) -> dict:
+    try:
+        return ENGINES[name]
+    except KeyError:
+        raise KeyError(f"Nieznany silnik: {name} ({'|'.join(ENGINES)})") from None
+
+
+def build_index(name: str, xs, ys, **params):
+    """Indeks z tablic współrzędnych (SpatialIndex.build)."""
+    return get_engine(name)["cls"].build(xs, ys, **params)
+
+
+def build_from_points(name: str, points, capacity=8, max_depth=16):
+    """Indeks z listy Point z parametrami jak w benchmarku (capacity/max_depth -> params)."""
+    e = get_engine(name)
+    return e["cls"].from_points(points, **(e["params"](capacity, max_depth) or {}))
+
+
+register_engine("quadtree", QuadTree, tag="qt", label="QuadTree",
+                params=lambda capacity, max_depth: {"capacity": capacity, "max_depth": max_depth},
+                materialize=lambda flat: flat.to_quadtree(), suffix=".qtf")
+register_engine("kdtree", KDTree, tag="kd", label="KDTree",
+                materialize=lambda flat: flat.to_kdtree(), suffix=".kdf")
+# siatka kubełków: capacity = docelowa średnia liczba punktów w komórce
+register_engine("grid", GridIndex, tag="grid", label="Grid", short="Grid",
+                params=lambda capacity, max_depth: {"per_cell": capacity},
+                materialize=lambda flat: flat.copy(), suffix=".grf",
+                traversal={"nodes_visited": "CellRangesVisited", "points_tested": "PointsTested"})
+# R-drzewo STR: capacity = fanout (maks. dzieci węzła / wpisów liścia)
+register_engine("rtree", RTree, tag="rt", label="RTree",
+                params=lambda capacity, max_depth: {"fanout": capacity},
+                materialize=lambda flat: flat.copy(), suffix=".rtf")
+# drzewo przedziałowe z kaskadowaniem: bez parametrów (capacity/max_depth ignorowane)
+register_engine("rangetree", RangeTree, tag="rg", label="RangeTree",
+                materialize=lambda flat: flat.copy(), suffix=".rgf",
+                traversal={"nodes_visited": "NodesVisited", "nodes_pruned": "NodesPruned",
+                           "max_depth": "MaxDepthReached"})
+# krzywe wypełniające: max_depth = bits (ta sama siatka 2^d x 2^d, co najgłębszy QuadTree)
+CURVE_TRAVERSAL = {"nodes_visited": "RangesVisited", "leaves_scanned": "CheckedRanges",
+                   "points_tested": "PointsTested"}
+register_engine("zorder", CurveIndex, tag="zo", label="ZOrder",
+                params=lambda capacity, max_depth: {"curve": "morton", "bits": max_depth},
+                materialize=lambda flat: flat.copy(), suffix=".zof", traversal=CURVE_TRAVERSAL)
+register_engine("hilbert", CurveIndex, tag="hc", label="Hilbert",
+                params=lambda capacity, max_depth: {"curve": "hilbert", "bits": max_depth},
+                materialize=lambda flat: flat.copy(), suffix=".hcf", traversal=CURVE_TRAVERSAL)
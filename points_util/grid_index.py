@@ -0,0 +1,254 @@
+"""
+Płaska siatka kubełków (uniform grid) jako trzeci indeks obok QuadTree i KDTree.
+
+Świat = prostokąt graniczny punktów, dzielony na nx * ny równych komórek tak,
+żeby średnio wypadało per_cell punktów na komórkę (proporcje komórek jak
+proporcje świata). Budowa to jeden przebieg NumPy: numer komórki każdego
+punktu, stabilne sortowanie i tablica offsets w stylu CSR - punkty komórki c
+leżą w xs/ys[offsets[c]:offsets[c + 1]], a komórki jednego wiersza siatki
+leżą obok siebie (c = iy * nx + ix).
+
+Zapytanie wycina z każdego wiersza ciągły zakres komórek. Punkty z komórek
+leżących ściśle wewnątrz zakresu (nie brzegowych) na pewno trafiają - floor
+jest monotoniczny - więc testujemy tylko komórki brzegowe; count() dla
+wnętrza w ogóle nie patrzy na punkty, tylko na offsets.
+
+Prostokąt jest półotwarty, jak Rect.contains_point - liczba trafień zgadza się
+z drzewami. Zapis do FLATTREE (rodzaj "grid"), odczyt przez mmap bez kopiowania.
+"""
+from __future__ import annotations
+
+import math
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+from points_util.points_classes import Point, Rect
+from points_util.query_stats import QueryStats, QueryTracer
+from points_util.spatial_index import nearest_by_count, query_stats
+from points_util.tree_format import gather_ranges, read_flat, to_array, write_flat
+
+GRID_KIND = "grid"
+
+
+class GridIndex:
+    def __init__(self, xs, ys, per_cell: int = 8):
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        n = len(xs)
+        self.per_cell = per_cell
+
+        if n:
+            x0, x1 = float(xs.min()), float(xs.max())
+            y0, y1 = float(ys.min()), float(ys.max())
+        else:
+            x0 = x1 = y0 = y1 = 0.0
+        w, h = x1 - x0, y1 - y0
+
+        # liczba komórek ~ n / per_cell; zdegenerowany wymiar (współliniowe) = jedna kolumna/wiersz
+        cells = max(1, math.ceil(n / max(1, per_cell)))
+        if w > 0 and h > 0:
+            nx = max(1, round(math.sqrt(cells * w / h)))
+            ny = max(1, math.ceil(cells / nx))
+        elif w > 0:
+            nx, ny = cells, 1
+        elif h > 0:
+            nx, ny = 1, cells
+        else:
+            nx = ny = 1
+
+        self.nx, self.ny = nx, ny
+        self.x0, self.y0 = x0, y0
+        self.x1, self.y1 = x1, y1
+        # odwrotność szerokości komórki; w == 0 -> wszystko w kolumnie 0
+        self.inv_cw = nx / w if w > 0 else 0.0
+        self.inv_ch = ny / h if h > 0 else 0.0
+
+        cell = self._cell_iy(ys) * nx + self._cell_ix(xs)
+        order = np.argsort(cell, kind="stable")
+        offsets = np.zeros(nx * ny + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cell, minlength=nx * ny), out=offsets[1:])
+
+        self.offsets = offsets
+        self.xs = xs[order]
+        self.ys = ys[order]
+        self.ids = order  # indeks punktu w tablicy wejściowej
+        self._flat = None
+
+    @classmethod
+    def build(cls, xs, ys, per_cell: int = 8) -> "GridIndex":
+        return cls(xs, ys, per_cell=per_cell)
+
+    @classmethod
+    def from_points(cls, points, per_cell: int = 8) -> "GridIndex":
+        n = len(points)
+        xs = np.fromiter((p.x for p in points), dtype=np.float64, count=n)
+        ys = np.fromiter((p.y for p in points), dtype=np.float64, count=n)
+        return cls(xs, ys, per_cell=per_cell)
+
+    def _cell_ix(self, x):
+        return np.clip(np.floor((np.asarray(x) - self.x0) * self.inv_cw), 0, self.nx - 1).astype(np.int64)
+
+    def _cell_iy(self, y):
+        return np.clip(np.floor((np.asarray(y) - self.y0) * self.inv_ch), 0, self.ny - 1).astype(np.int64)
+
+    def __len__(self) -> int:
+        return len(self.xs)
+
+    def _ranges(self, r: Rect):
+        """
+        (brzegowe, wewnętrzne): pary tablic (start, koniec) zakresów w xs/ys.
+        Wewnętrzne to komórki ściśle między komórkami brzegowymi - bez testu punktów.
+        None, gdy prostokąt nie przecina siatki.
+        """
+        if not len(self.xs) or r.right <= r.left or r.top <= r.bottom:
+            return None
+        # poza prostokątem granicznym punktów; w środku przycięcie komórek do siatki jest bezpieczne
+        if r.right <= self.x0 or r.left > self.x1 or r.top <= self.y0 or r.bottom > self.y1:
+            return None
+
+        ix0, ix1 = int(self._cell_ix(r.left)), int(self._cell_ix(r.right))
+        iy0, iy1 = int(self._cell_iy(r.bottom)), int(self._cell_iy(r.top))
+        rows = np.arange(iy0, iy1 + 1) * self.nx
+        off = self.offsets
+
+        inner_rows = rows[1:-1]
+        if ix1 - ix0 >= 2 and inner_rows.size:
+            inner = (off[inner_rows + ix0 + 1], off[inner_rows + ix1])
+            # w wierszach wewnętrznych brzegowe są tylko skrajne kolumny
+            edge_cols = [(inner_rows + ix0, inner_rows + ix0 + 1), (inner_rows + ix1, inner_rows + ix1 + 1)]
+        else:
+            inner = (np.zeros(0, np.int64), np.zeros(0, np.int64))
+            edge_cols = [(inner_rows + ix0, inner_rows + ix1 + 1)]
+
+        edge_rows = rows[[0, -1]] if len(rows) > 1 else rows
+        starts = [off[edge_rows + ix0]] + [off[a] for a, _ in edge_cols]
+        ends = [off[edge_rows + ix1 + 1]] + [off[b] for _, b in edge_cols]
+        edge = (np.concatenate(starts), np.concatenate(ends))
+        return edge, inner
+
+    def _edge_hits(self, r: Rect, starts, ends):
+        """Pozycje trafień w komórkach brzegowych (tu punkty trzeba sprawdzić)."""
+        cand = gather_ranges(starts, ends)
+        x, y = self.xs[cand], self.ys[cand]
+        return cand[(x >= r.left) & (x < r.right) & (y >= r.bottom) & (y < r.top)]
+
+    def _hit_positions(self, r: Rect):
+        ranges = self._ranges(r)
+        if ranges is None:
+            return np.zeros(0, np.int64)
+        (es, ee), (is_, ie) = ranges
+        return np.concatenate((self._edge_hits(r, es, ee), gather_ranges(is_, ie)))
+
+    def query(self, range_rect: Rect, tracer: Optional[QueryTracer] = None) -> List[Point]:
+        """Punkty w prostokącie (nowe obiekty Point, jak FlatQuadTree.query)."""
+        if tracer is not None:
+            return self._query_traced(range_rect, tracer)
+        pos = self._hit_positions(range_rect)
+        return [Point(x, y) for x, y in zip(self.xs[pos].tolist(), self.ys[pos].tolist())]
+
+    def query_indices(self, range_rect: Rect) -> np.ndarray:
+        """Indeksy trafionych punktów w kolejności wejściowej (jak np_baselines)."""
+        return self.ids[self._hit_positions(range_rect)]
+
+    def count(self, range_rect: Rect) -> int:
+        ranges = self._ranges(range_rect)
+        if ranges is None:
+            return 0
+        (es, ee), (is_, ie) = ranges
+        return len(self._edge_hits(range_rect, es, ee)) + int((ie - is_).sum())
+
+    def _query_traced(self, r: Rect, tracer: QueryTracer) -> List[Point]:
+        """
+        To samo co query, z zaczepami tracera: siatka = węzeł na głębokości 0,
+        każdy ciągły zakres komórek = węzeł na głębokości 1 (brzegowy: liść z testami).
+        """
+        found = []
+        tracer.enter(self, 0)
+        ranges = self._ranges(r)
+        if ranges is not None:
+            (es, ee), (is_, ie) = ranges
+            for s, e in zip(es.tolist(), ee.tolist()):
+                tracer.enter((s, e), 1)
+                tracer.leaf((s, e), 1)
+                for j in range(s, e):
+                    p = Point(float(self.xs[j]), float(self.ys[j]))
+                    tracer.test(p)
+                    if r.contains_point(p):
+                        found.append(p)
+                        tracer.report(p)
+                tracer.leave((s, e), 1)
+            for s, e in zip(is_.tolist(), ie.tolist()):
+                tracer.enter((s, e), 1)
+                for j in range(s, e):
+                    p = Point(float(self.xs[j]), float(self.ys[j]))
+                    found.append(p)
+                    tracer.report(p)
+                tracer.leave((s, e), 1)
+        tracer.leave(self, 0)
+        return found
+
+    def nearest(self, x: float, y: float, k: int = 1) -> List[Point]:
+        """k najbliższych punktów, od najbliższego (przez count - patrz nearest_by_count)."""
+        return nearest_by_count(self, x, y, k, (self.x0, self.y0, self.x1, self.y1))
+
+    def stats(self, range_rect: Rect) -> QueryStats:
+        return query_stats(self, range_rect)
+
+    def save(self, path: str | Path) -> None:
+        save_grid_flat(self, path)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "GridIndex":
+        return load_grid_flat(path)
+
+    def copy(self) -> "GridIndex":
+        """Niezależna kopia w pamięci (np. z indeksu otwartego przez mmap)."""
+        g = GridIndex.__new__(GridIndex)
+        g.__dict__.update(self.__dict__)
+        g.offsets, g.xs, g.ys, g.ids = (np.array(a) for a in (self.offsets, self.xs, self.ys, self.ids))
+        g._flat = None
+        return g
+
+    def close(self) -> None:
+        if self._flat is not None:
+            self.offsets = self.xs = self.ys = self.ids = None
+            self._flat.close()
+            self._flat = None
+
+
+def save_grid_flat(grid: GridIndex, path: str | Path) -> None:
+    meta = {
+        "nx": grid.nx, "ny": grid.ny, "x0": grid.x0, "y0": grid.y0, "x1": grid.x1, "y1": grid.y1,
+        "inv_cw": grid.inv_cw, "inv_ch": grid.inv_ch, "per_cell": grid.per_cell,
+        "n_points": len(grid),
+    }
+    sections = {
+        "offsets": to_array("q", grid.offsets),
+        "xs": to_array("d", grid.xs),
+        "ys": to_array("d", grid.ys),
+        "ids": to_array("q", grid.ids),
+    }
+    write_flat(path, GRID_KIND, meta, sections)
+
+
+def load_grid_flat(path: str | Path, use_mmap: bool = True) -> GridIndex:
+    """GridIndex gotowy do zapytań; tablice to widoki na plik (mmap) do close()."""
+    flat = read_flat(path, use_mmap=use_mmap)
+    if flat.kind != GRID_KIND:
+        raise ValueError(f"Oczekiwano '{GRID_KIND}', jest '{flat.kind}'.")
+    m = flat.meta
+    g = GridIndex.__new__(GridIndex)
+    g.per_cell = m["per_cell"]
+    g.nx, g.ny = m["nx"], m["ny"]
+    g.x0, g.y0 = m["x0"], m["y0"]
+    g.x1, g.y1 = m["x1"], m["y1"]
+    g.inv_cw, g.inv_ch = m["inv_cw"], m["inv_ch"]
+    s = flat.sections
+    g.offsets = np.frombuffer(s["offsets"], dtype=np.int64)
+    g.xs = np.frombuffer(s["xs"], dtype=np.float64)
+    g.ys = np.frombuffer(s["ys"], dtype=np.float64)
+    g.ids = np.frombuffer(s["ids"], dtype=np.int64)
+    g._flat = flat
+    return g
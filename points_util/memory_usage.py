@@ -0,0 +1,68 @@
+"""
+Pomiar pamięci struktur: szczyt/retencja przez tracemalloc oraz "głęboki"
+rozmiar grafu obiektów (suma sys.getsizeof po wszystkim, co osiągalne).
+"""
+import sys
+import tracemalloc
+from typing import Callable, Iterable, Optional, Tuple
+
+# nie schodzimy w typy/moduły/funkcje - to nie jest pamięć struktury
+_SKIP_TYPES = (type, type(sys), type(len), type(lambda: None))
+
+
+def deep_sizeof(obj, exclude: Optional[Iterable[int]] = None) -> int:
+    """
+    Suma sys.getsizeof po grafie obiektów osiągalnych z obj (każdy obiekt raz).
+    exclude: id obiektów do pominięcia (np. punkty współdzielone z listą wejściową,
+    żeby policzyć sam narzut indeksu).
+    Przechodzi po __dict__, __slots__, list/tuple/set/dict. Iteracyjnie - drzewa
+    mają miliony węzłów.
+    """
+    seen = set(exclude) if exclude is not None else set()
+    total = 0
+    stack = [obj]
+    while stack:
+        o = stack.pop()
+        oid = id(o)
+        if oid in seen or isinstance(o, _SKIP_TYPES):
+            continue
+        seen.add(oid)
+        total += sys.getsizeof(o)
+
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            stack.extend(o)
+        elif isinstance(o, (str, bytes, int, float, bool)) or o is None:
+            continue
+        else:
+            d = getattr(o, "__dict__", None)
+            if d is not None:
+                stack.append(d)
+            for cls in type(o).__mro__:
+                for name in getattr(cls, "__slots__", ()):
+                    if hasattr(o, name):
+                        stack.append(getattr(o, name))
+    return total
+
+
+def trace_memory(fn: Callable[[], object]) -> Tuple[object, int, int]:
+    """
+    Uruchamia fn() pod tracemalloc.
+    Zwraca (wynik, szczyt_bajtów, zatrzymane_bajtów) - oba względem stanu sprzed
+    wywołania; "zatrzymane" to to, co zostało zaalokowane i żyje po powrocie
+    (czyli głównie sam wynik).
+    """
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        result = fn()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+    return result, peak - before, after - before
@@ -0,0 +1,71 @@
+"""
+Wektorowe punkty odniesienia dla drzew (NumPy), bez żadnej struktury drzewiastej:
+- MaskScanIndex   - pełny skan: maska logiczna po wszystkich punktach, O(N) na zapytanie,
+- SortedXIndex    - punkty posortowane po x; searchsorted wycina pas [left, right),
+                    a y sprawdzamy maską tylko w tym pasie.
+
+Prostokąt jest półotwarty, jak Rect.contains_point: x ∈ [left, right), y ∈ [bottom, top),
+więc liczba trafień musi być identyczna z QuadTree/KDTree.
+query zwraca indeksy punktów (w kolejności wejściowej tablicy), nie obiekty Point.
+"""
+import numpy as np
+
+from points_util.points_classes import Rect
+
+
+def xy_arrays(xy):
+    """Lista par (x, y) -> dwie tablice float64."""
+    arr = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+    return np.ascontiguousarray(arr[:, 0]), np.ascontiguousarray(arr[:, 1])
+
+
+class MaskScanIndex:
+    def __init__(self, xs, ys):
+        self.xs = np.asarray(xs, dtype=np.float64)
+        self.ys = np.asarray(ys, dtype=np.float64)
+
+    def _mask(self, r: Rect):
+        xs, ys = self.xs, self.ys
+        return (xs >= r.left) & (xs < r.right) & (ys >= r.bottom) & (ys < r.top)
+
+    def query(self, range_rect: Rect) -> np.ndarray:
+        return np.flatnonzero(self._mask(range_rect))
+
+    def count(self, range_rect: Rect) -> int:
+        return int(np.count_nonzero(self._mask(range_rect)))
+
+    def __len__(self) -> int:
+        return len(self.xs)
+
+
+class SortedXIndex:
+    def __init__(self, xs, ys):
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        self.order = np.argsort(xs, kind="stable")
+        self.xs = xs[self.order]
+        self.ys = ys[self.order]
+
+    def _slab(self, r: Rect):
+        lo = np.searchsorted(self.xs, r.left, side="left")
+        hi = np.searchsorted(self.xs, r.right, side="left")
+        y = self.ys[lo:hi]
+        return lo, hi, (y >= r.bottom) & (y < r.top)
+
+    def query(self, range_rect: Rect) -> np.ndarray:
+        lo, hi, m = self._slab(range_rect)
+        return self.order[lo:hi][m]
+
+    def count(self, range_rect: Rect) -> int:
+        _, _, m = self._slab(range_rect)
+        return int(np.count_nonzero(m))
+
+    def __len__(self) -> int:
+        return len(self.xs)
+
+
+# tag (prefiks kolumn) -> klasa; tak jak BENCH_ENGINES w time_compare
+BASELINES = {
+    "scan": MaskScanIndex,
+    "sortx": SortedXIndex,
+}
@@ -49,3 +49,7 @@ class Rect:
                     other.bottom >= self.top or
                     other.top <= self.bottom)
 
+    def contains_rect(self, other: "Rect") -> bool:
+        """Czy other leży w całości wewnątrz tego prostokąta."""
+        return (self.left <= other.left and other.right <= self.right and
+                self.bottom <= other.bottom and other.top <= self.top)
@@ -0,0 +1,129 @@
+"""
+Opcjonalny cache wyników zapytań prostokątnych (LRU) przed query dowolnego
+indeksu (SpatialIndex, także FlatQuadTree/FlatKDTree).
+
+- klucz: dokładny prostokąt (Rect jest frozen -> hashowalny),
+- allow_enclosing=True: jeśli w cache jest prostokąt zawierający zapytanie,
+  wynik to przefiltrowany wynik większego prostokąta,
+- unieważnianie: dla QuadTree cache rejestruje się jako obserwator insert();
+  wstawiony punkt zmienia wynik tylko tych wpisów, których prostokąt go
+  zawiera - i tylko te są usuwane. Zbiór punktów pozostałych wpisów się nie
+  zmienia (kolejność może się różnić od świeżego zapytania, jeśli insert
+  podzielił liść).
+"""
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+from points_util.points_classes import Point, Rect
+
+
+class QueryResultCache:
+    def __init__(self, index, maxsize: int = 128, allow_enclosing: bool = False):
+        self.index = index
+        self.maxsize = maxsize
+        self.allow_enclosing = allow_enclosing
+
+        self._query = index.query
+
+        self._entries: "OrderedDict[Rect, List[Point]]" = OrderedDict()
+
+        self.hits = 0
+        self.enclosing_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self._time_hit = 0.0
+        self._time_enclosing = 0.0
+        self._time_miss = 0.0
+
+        if hasattr(index, "add_insert_listener"):
+            index.add_insert_listener(self.invalidate_point)
+
+    def detach(self) -> None:
+        """Odpina cache od drzewa (przestaje słuchać insert())."""
+        if hasattr(self.index, "remove_insert_listener"):
+            self.index.remove_insert_listener(self.invalidate_point)
+        self.clear()
+
+    def query(self, range_rect: Rect) -> List[Point]:
+        t0 = time.perf_counter()
+
+        cached = self._entries.get(range_rect)
+        if cached is not None:
+            self._entries.move_to_end(range_rect)
+            self.hits += 1
+            result = list(cached)
+            self._time_hit += time.perf_counter() - t0
+            return result
+
+        if self.allow_enclosing:
+            enclosing = self._find_enclosing(range_rect)
+            if enclosing is not None:
+                self._entries.move_to_end(enclosing)
+                result = [p for p in self._entries[enclosing] if range_rect.contains_point(p)]
+                self._store(range_rect, result)
+                self.enclosing_hits += 1
+                result = list(result)
+                self._time_enclosing += time.perf_counter() - t0
+                return result
+
+        result = self._query(range_rect)
+        self._store(range_rect, result)
+        self.misses += 1
+        result = list(result)
+        self._time_miss += time.perf_counter() - t0
+        return result
+
+    # alias, żeby cache dało się podstawić w miejsce KDTree
+    query_range = query
+
+    def _find_enclosing(self, range_rect: Rect) -> Optional[Rect]:
+        """Najmniejszy (po liczbie punktów) zapamiętany prostokąt zawierający range_rect."""
+        best = None
+        best_len = None
+        for rect, pts in self._entries.items():
+            if rect.contains_rect(range_rect) and (best_len is None or len(pts) < best_len):
+                best = rect
+                best_len = len(pts)
+        return best
+
+    def _store(self, range_rect: Rect, result: List[Point]) -> None:
+        self._entries[range_rect] = result
+        self._entries.move_to_end(range_rect)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate_point(self, p: Point) -> None:
+        """Usuwa wpisy, których wynik zmienia się po wstawieniu punktu p."""
+        stale = [rect for rect in self._entries if rect.contains_point(p)]
+        for rect in stale:
+            del self._entries[rect]
+        self.invalidations += len(stale)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def metrics(self) -> dict:
+        lookups = self.hits + self.enclosing_hits + self.misses
+
+        def avg(total, count):
+            return total / count if count else 0.0
+
+        return {
+            "lookups": lookups,
+            "hits": self.hits,
+            "enclosing_hits": self.enclosing_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.enclosing_hits) / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "avg_hit_s": avg(self._time_hit, self.hits),
+            "avg_enclosing_hit_s": avg(self._time_enclosing, self.enclosing_hits),
+            "avg_miss_s": avg(self._time_miss, self.misses),
+        }
@@ -0,0 +1,72 @@
+"""
+Śledzenie przejścia drzewa przy zapytaniu prostokątnym.
+
+QueryTracer to zestaw pustych zaczepów, które QuadTree.query i
+KDTree.query_range wołają, gdy dostaną tracer=...:
+    enter(node, depth)  - zapytanie wchodzi do węzła,
+    prune(node, depth)  - węzeł/poddrzewo odcięte testem prostokąta (bez wejścia),
+    leaf(node, depth)   - liść, w którym sprawdzane są punkty,
+    test(p)             - test contains_point dla punktu,
+    report(p)           - punkt trafia do wyniku,
+    leave(node, depth)  - koniec obsługi węzła (po dzieciach).
+Dla QuadTree node to węzeł QuadTree (ma boundary), dla KDTree - KDNode.
+Bez tracera zapytania idą starą ścieżką - śledzenie nic nie kosztuje, gdy jest wyłączone.
+
+QueryStats to tracer-licznik:
+    stats = QueryStats()
+    qt.query(rect, tracer=stats)
+    kd.query_range(rect, tracer=stats)
+Ten sam obiekt można przekazać do wielu zapytań - liczniki się sumują.
+Wizualizacje (GIF) to też tracery - rysują dokładnie to przejście, które mierzy benchmark.
+"""
+from dataclasses import dataclass, asdict
+
+
+class QueryTracer:
+    def enter(self, node, depth: int) -> None:
+        pass
+
+    def prune(self, node, depth: int) -> None:
+        pass
+
+    def leaf(self, node, depth: int) -> None:
+        pass
+
+    def test(self, p) -> None:
+        pass
+
+    def report(self, p) -> None:
+        pass
+
+    def leave(self, node, depth: int) -> None:
+        pass
+
+
+@dataclass
+class QueryStats(QueryTracer):
+    nodes_visited: int = 0   # węzły, do których zapytanie weszło
+    nodes_pruned: int = 0    # węzły/poddrzewa odcięte testem prostokąta
+    leaves_scanned: int = 0  # liście, w których sprawdzano punkty
+    points_tested: int = 0   # wywołania contains_point
+    max_depth: int = 0       # najgłębszy odwiedzony węzeł (korzeń = 0)
+
+    def enter(self, node, depth: int) -> None:
+        self.nodes_visited += 1
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def prune(self, node, depth: int) -> None:
+        self.nodes_pruned += 1
+
+    def leaf(self, node, depth: int) -> None:
+        self.leaves_scanned += 1
+
+    def test(self, p) -> None:
+        self.points_tested += 1
+
+    def reset(self) -> None:
+        self.nodes_visited = self.nodes_pruned = self.leaves_scanned = 0
+        self.points_tested = self.max_depth = 0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
@@ -0,0 +1,188 @@
+"""
+Wsadowe renderowanie obrazów i GIF-ów (QuadTree i KDTree) bez okien i bez pytania o query.
+
+run_images_for_N / run_for_N / run_gifs_for_N_kdtree rysują zbiór po zbiorze
+i (QuadTree) za każdym razem otwierają okno pick_query_for_existing_csv. Tu:
+- prostokąt zapytania zawsze czytamy z istniejącego *.query.csv (brak -> [SKIP]),
+- zadania (zbiór, rodzaj rysunku) idą do puli procesów z backendem Agg,
+- największe pliki startują pierwsze, żeby jeden duży GIF nie został na koniec sam,
+- overwrite=False pomija zadania, których wynik jest nowszy niż CSV i query.
+
+Układ wyjścia jak w dotychczasowych run_*:
+    QuadTree/times/<N_x>/images/<zbiór>_quadtree.png
+    QuadTree/times/<N_x>/gifs/<zbiór>_quadtree.gif (+ .png)
+    KDTree/results/<N_x>/images_kdtree/<zbiór>_kdtree.png
+    KDTree/results/<N_x>/gifs_kdtree/<zbiór>_kdtree.gif (+ .png)
+
+Uruchamianie (z katalogu głównego repo):
+    python -m points_util.render_parallel --kinds qt_image kd_image
+    python -m points_util.render_parallel --max-frames 200 --point-mode density --workers 4
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from points_util.points_loaders import load_query_rect
+
+RENDER_KINDS = ("qt_image", "qt_gif", "kd_image", "kd_gif")
+
+# rodzaj -> (katalog wyjściowy, podkatalog, przyrostek pliku, rozszerzenie)
+_KIND_LAYOUT = {
+    "qt_image": ("qt", "images", "_quadtree", ".png"),
+    "qt_gif": ("qt", "gifs", "_quadtree", ".gif"),
+    "kd_image": ("kd", "images_kdtree", "_kdtree", ".png"),
+    "kd_gif": ("kd", "gifs_kdtree", "_kdtree", ".gif"),
+}
+
+
+def _use_agg():
+    # musi być przed pierwszym importem pyplot (visualizer, query_picker ustawia TkAgg)
+    import matplotlib
+    matplotlib.use("Agg", force=True)
+
+
+def make_render_jobs(output_root="output", kinds=RENDER_KINDS, qt_out_root="QuadTree/times",
+                     kd_out_root="KDTree/results", overwrite=True):
+    """
+    Lista zadań (rodzaj, plik CSV, plik query, plik wyjściowy) dla wszystkich
+    zbiorów w output_root, od największego pliku CSV.
+    """
+    csv_files = sorted(glob.glob(os.path.join(output_root, "**", "*.csv"), recursive=True))
+    csv_files = [p for p in csv_files if not p.endswith(".query.csv")]
+    out_roots = {"qt": qt_out_root, "kd": kd_out_root}
+
+    jobs = []
+    for csv_path in csv_files:
+        query_path = csv_path.replace(".csv", ".query.csv")
+        if not os.path.exists(query_path):
+            print(f"[SKIP] brak query dla: {csv_path} (szukam: {query_path})")
+            continue
+
+        rel_dir = os.path.relpath(os.path.dirname(csv_path), output_root)
+        base = os.path.splitext(os.path.basename(csv_path))[0]
+        for kind in kinds:
+            tree, sub, suffix, ext = _KIND_LAYOUT[kind]
+            out_path = os.path.normpath(os.path.join(out_roots[tree], rel_dir, sub, base + suffix + ext))
+            if not overwrite and _is_fresh(out_path, csv_path, query_path):
+                print(f"[SKIP] aktualne: {out_path}")
+                continue
+            jobs.append((kind, csv_path, query_path, out_path))
+
+    jobs.sort(key=lambda j: os.path.getsize(j[1]), reverse=True)
+    return jobs
+
+
+def _is_fresh(out_path, *inputs):
+    if not os.path.exists(out_path):
+        return False
+    mtime = os.path.getmtime(out_path)
+    return all(os.path.getmtime(p) <= mtime for p in inputs)
+
+
+def render_job(job, capacity=8, max_depth=16, sample_points=5000, gif_sample_points=1500,
+               max_levels=10, point_mode="sample", show_pruned=False, interval=120,
+               max_frames=None, also_save_png=True):
+    """Renderuje jedno zadanie z make_render_jobs; zwraca (rodzaj, CSV, plik, trafienia, sekundy)."""
+    _use_agg()
+    from QuadTree.algorithmsVis import render_quadtree_image_from_csv, render_quadtree_gif_from_csv
+    from KDTree.kdtreeVis import render_kdtree_image_from_csv, render_kdtree_gif_from_csv
+    from points_util.points_classes import Point
+
+    kind, csv_path, query_path, out_path = job
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    query_rect = load_query_rect(query_path)
+    # Visualizer.save_gif sam dokleja ".gif" (run_* zostawiały przez to *.gif.gif)
+    stem = os.path.splitext(out_path)[0]
+    out_png = stem + ".png" if also_save_png else None
+
+    t0 = time.perf_counter()
+    if kind == "qt_image":
+        found = render_quadtree_image_from_csv(
+            csv_path=csv_path, query_square=query_rect, capacity=capacity, max_depth=max_depth,
+            out_png=out_path, sample_points=sample_points, max_levels=max_levels, point_mode=point_mode)
+    elif kind == "qt_gif":
+        found = render_quadtree_gif_from_csv(
+            csv_path=csv_path, query_square=query_rect, capacity=capacity, max_depth=max_depth,
+            out_gif=stem, out_png=out_png, sample_points=gif_sample_points, max_levels=max_levels,
+            show_pruned=show_pruned, interval=interval, max_frames=max_frames, point_mode=point_mode)
+    elif kind == "kd_image":
+        found = render_kdtree_image_from_csv(
+            csv_path=csv_path, query_rect=query_rect, PointClass=Point, out_png=out_path,
+            sample_points=sample_points, max_levels=max_levels, point_mode=point_mode)
+    elif kind == "kd_gif":
+        found = render_kdtree_gif_from_csv(
+            csv_path=csv_path, query_rect=query_rect, PointClass=Point, out_gif=stem,
+            out_png=out_png, sample_points=gif_sample_points, max_levels=max_levels,
+            show_pruned=show_pruned, interval=interval, max_frames=max_frames, point_mode=point_mode)
+    else:
+        raise ValueError(f"Nieznany rodzaj rysunku: {kind} ({'|'.join(RENDER_KINDS)})")
+    return kind, csv_path, out_path, len(found), time.perf_counter() - t0
+
+
+def render_all(output_root="output", kinds=RENDER_KINDS, workers=None, qt_out_root="QuadTree/times",
+               kd_out_root="KDTree/results", overwrite=True, **options):
+    """
+    Renderuje wszystkie zadania; workers=None -> po jednym procesie na rdzeń,
+    workers=1 -> w bieżącym procesie. options: jak w render_job.
+    Zwraca listę wyników render_job w kolejności ukończenia.
+    """
+    jobs = make_render_jobs(output_root, kinds, qt_out_root, kd_out_root, overwrite=overwrite)
+    if not jobs:
+        return []
+
+    if workers is None:
+        workers = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    workers = max(1, min(workers, len(jobs)))
+
+    t0 = time.perf_counter()
+    done = []
+    if workers == 1:
+        for job in jobs:
+            done.append(render_job(job, **options))
+            _print_done(done[-1], len(done), len(jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context(),
+                                 initializer=_use_agg) as pool:
+            futures = [pool.submit(render_job, job, **options) for job in jobs]
+            for fut in as_completed(futures):
+                done.append(fut.result())
+                _print_done(done[-1], len(done), len(jobs))
+
+    print(f"[RENDER] {len(done)} plików, {workers} proc., {time.perf_counter() - t0:.1f}s")
+    return done
+
+
+def _print_done(res, i, total):
+    kind, csv_path, out_path, hits, seconds = res
+    print(f"[RENDER {i}/{total}] {kind:8s} {csv_path} -> hits={hits} | {out_path} ({seconds:.2f}s)")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Wsadowe renderowanie PNG/GIF dla QuadTree i KDTree.")
+    ap.add_argument("--output-root", default="output")
+    ap.add_argument("--kinds", nargs="*", default=list(RENDER_KINDS), choices=RENDER_KINDS)
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--qt-out-root", default="QuadTree/times")
+    ap.add_argument("--kd-out-root", default="KDTree/results")
+    ap.add_argument("--skip-fresh", action="store_true", help="pomiń pliki nowsze niż CSV i query")
+    ap.add_argument("--capacity", type=int, default=8)
+    ap.add_argument("--max-depth", type=int, default=16)
+    ap.add_argument("--max-levels", type=int, default=10)
+    ap.add_argument("--point-mode", default="sample", choices=("sample", "density"))
+    ap.add_argument("--max-frames", type=int, default=None)
+    ap.add_argument("--show-pruned", action="store_true")
+    args = ap.parse_args(argv)
+
+    render_all(args.output_root, kinds=args.kinds, workers=args.workers, qt_out_root=args.qt_out_root,
+               kd_out_root=args.kd_out_root, overwrite=not args.skip_fresh, capacity=args.capacity,
+               max_depth=args.max_depth, max_levels=args.max_levels, point_mode=args.point_mode,
+               max_frames=args.max_frames, show_pruned=args.show_pruned)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+"""
+Zestaw skalowania: N = 10^2 .. 10^7 dla każdego rozkładu z data_generator.
+
+Dla każdego (rozkład, drzewo) mierzymy:
+- build_s          - budowa drzewa,
+- query_point_s    - zapytania zwracające ~10 punktów (koszt samego zejścia),
+- query_sel1e-3_s  - zapytania o selektywności 0.1% (koszt rośnie z wynikiem),
+dopasowujemy wykładnik t ~ c * N^k (regresja w skali log-log) i zapisujemy
+wszystko do JSON-a. Kolejne uruchomienie z --check porównuje się z tym plikiem
+i kończy się błędem, gdy któraś metryka jest wolniejsza o więcej niż tolerancja.
+
+Uruchamianie (z katalogu głównego repo):
+    python -m points_util.scaling --max-n 100000 --save times/scaling_baseline.json
+    python -m points_util.scaling --max-n 100000 --check times/scaling_baseline.json
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+from data_generators.data_generator import DATASET_NAMES, generate_dataset
+from data_generators.query_workload import generate_workload
+from points_util.bench_stats import measure, summarize
+from points_util.points_classes import Point, Rect
+from points_util.engines import ENGINES as INDEX_ENGINES, build_from_points
+
+DEFAULT_SIZES = [10 ** k for k in range(2, 8)]
+DEFAULT_TOLERANCE = 0.25
+# wykładnik może urosnąć o tyle, zanim uznamy to za regresję
+DEFAULT_EXPONENT_TOLERANCE = 0.15
+# różnice poniżej tego progu (w sekundach) to szum zegara, nie regresja
+DEFAULT_MIN_DELTA = 50e-6
+
+# nazwa silnika (points_util.engines) -> (budowa, zapytanie)
+ENGINES = {
+    name: (lambda pts, capacity, max_depth, name=name: build_from_points(name, pts, capacity, max_depth),
+           lambda tree, rect: tree.query(rect))
+    for name in INDEX_ENGINES
+}
+
+
+class PerformanceRegression(AssertionError):
+    pass
+
+
+def fit_exponent(ns, ts):
+    """Nachylenie prostej log(t) = k*log(N) + c (najmniejsze kwadraty). None, gdy za mało danych."""
+    pairs = [(math.log(n), math.log(t)) for n, t in zip(ns, ts) if t and t > 0]
+    if len(pairs) < 2:
+        return None
+    xs = np.array([p[0] for p in pairs])
+    ys = np.array([p[1] for p in pairs])
+    k, _ = np.polyfit(xs, ys, 1)
+    return float(k)
+
+
+def _query_rects(pts, selectivity=None, target_hits=None, count=50, seed=0):
+    xy = np.array([(p.x, p.y) for p in pts])
+    if target_hits is not None:
+        selectivity = target_hits / len(pts)
+    wl = generate_workload(xy[:, 0], xy[:, 1], selectivities=(selectivity,),
+                           per_selectivity=count, seed=seed)
+    return [Rect(w["cx"], w["cy"], w["hw"], w["hh"]) for w in wl]
+
+
+def _time_queries(tree, query, rects, warmup=1, repeat=3):
+    """Mediana (po zapytaniach) z median (po powtórzeniach) czasu pojedynczego zapytania."""
+    per_query = [summarize(measure(lambda r=r: query(tree, r), warmup=warmup, repeat=repeat))["median_s"]
+                 for r in rects]
+    return summarize(per_query)["median_s"]
+
+
+def run_scaling(sizes=DEFAULT_SIZES, distributions=DATASET_NAMES, engines=("quadtree", "kdtree"),
+                capacity=8, max_depth=16, queries=50, build_repeat=1, verbose=True):
+    """
+    Zwraca słownik:
+    {rozkład: {silnik: {metryka: {"n": [...], "t": [...], "exponent": k}}}}
+    """
+    results = {}
+    for dist in distributions:
+        results[dist] = {e: {} for e in engines}
+        for n in sizes:
+            _, xy = generate_dataset(dist, n)
+            pts = [Point(x, y) for (x, y) in xy]
+
+            rect_sets = {
+                "query_point_s": _query_rects(pts, target_hits=10, count=queries),
+                "query_sel1e-3_s": _query_rects(pts, selectivity=1e-3, count=queries),
+            }
+
+            for engine in engines:
+                build, query = ENGINES[engine]
+
+                tree = None
+
+                def run_build():
+                    nonlocal tree
+                    tree = build(pts, capacity, max_depth)
+
+                metrics = {"build_s": summarize(measure(run_build, warmup=0, repeat=build_repeat))["median_s"]}
+                for name, rects in rect_sets.items():
+                    metrics[name] = _time_queries(tree, query, rects)
+
+                for name, t in metrics.items():
+                    m = results[dist][engine].setdefault(name, {"n": [], "t": []})
+                    m["n"].append(len(pts))
+                    m["t"].append(t)
+
+                if verbose:
+                    print(f"[SCALING] {dist:18s} {engine:8s} N={len(pts):>9d} | " +
+                          " ".join(f"{k}={v:.6f}" for k, v in metrics.items()))
+                del tree
+
+        for engine in engines:
+            for m in results[dist][engine].values():
+                m["exponent"] = fit_exponent(m["n"], m["t"])
+    return results
+
+
+def make_baseline(results, **params):
+    return {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "params": params,
+        "results": results,
+    }
+
+
+def save_baseline(baseline, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, indent=2, ensure_ascii=False)
+
+
+def load_baseline(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare_to_baseline(results, baseline, tolerance=DEFAULT_TOLERANCE,
+                        exponent_tolerance=DEFAULT_EXPONENT_TOLERANCE, min_delta=DEFAULT_MIN_DELTA):
+    """
+    Zwraca listę regresji (opisów tekstowych). Porównujemy tylko punkty N obecne
+    w obu pomiarach: czas > baseline * (1 + tolerance) (i o co najmniej min_delta
+    sekund) albo wykładnik większy o więcej niż exponent_tolerance.
+    """
+    problems = []
+    base = baseline["results"]
+    for dist, engines in results.items():
+        for engine, metrics in engines.items():
+            for name, m in metrics.items():
+                b = base.get(dist, {}).get(engine, {}).get(name)
+                if b is None:
+                    continue
+
+                base_t = dict(zip(b["n"], b["t"]))
+                for n, t in zip(m["n"], m["t"]):
+                    if n not in base_t or base_t[n] <= 0:
+                        continue
+                    if t > base_t[n] * (1 + tolerance) and t - base_t[n] > min_delta:
+                        problems.append(
+                            f"{dist}/{engine}/{name} N={n}: {t:.6f}s vs baseline {base_t[n]:.6f}s "
+                            f"(+{(t / base_t[n] - 1) * 100:.0f}%)"
+                        )
+
+                # wykładniki dopasowujemy na wspólnych N, inaczej nie są porównywalne
+                cur_t = dict(zip(m["n"], m["t"]))
+                common = sorted(set(cur_t) & set(base_t))
+                k = fit_exponent(common, [cur_t[n] for n in common])
+                bk = fit_exponent(common, [base_t[n] for n in common])
+                if k is not None and bk is not None and k > bk + exponent_tolerance:
+                    problems.append(f"{dist}/{engine}/{name}: wykładnik {k:.3f} vs baseline {bk:.3f}")
+    return problems
+
+
+def check_against_baseline(results, baseline, **tolerances):
+    problems = compare_to_baseline(results, baseline, **tolerances)
+    if problems:
+        raise PerformanceRegression("Regresja wydajności:\n  " + "\n  ".join(problems))
+
+
+def print_exponents(results):
+    for dist, engines in results.items():
+        for engine, metrics in engines.items():
+            exps = " ".join(
+                f"{name}=N^{m['exponent']:.2f}" if m["exponent"] is not None else f"{name}=?"
+                for name, m in metrics.items()
+            )
+            print(f"[FIT] {dist:18s} {engine:8s} {exps}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Skalowanie QuadTree/KDTree z wykrywaniem regresji.")
+    ap.add_argument("--min-n", type=int, default=DEFAULT_SIZES[0])
+    ap.add_argument("--max-n", type=int, default=DEFAULT_SIZES[-1])
+    ap.add_argument("--dist", nargs="*", default=list(DATASET_NAMES))
+    ap.add_argument("--engines", nargs="*", default=["quadtree", "kdtree"], choices=list(ENGINES))
+    ap.add_argument("--capacity", type=int, default=8)
+    ap.add_argument("--max-depth", type=int, default=16)
+    ap.add_argument("--queries", type=int, default=50)
+    ap.add_argument("--save", help="zapisz wynik jako baseline JSON")
+    ap.add_argument("--check", help="porównaj z baseline JSON (kod wyjścia 1 przy regresji)")
+    ap.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    ap.add_argument("--exponent-tolerance", type=float, default=DEFAULT_EXPONENT_TOLERANCE)
+    ap.add_argument("--min-delta", type=float, default=DEFAULT_MIN_DELTA)
+    args = ap.parse_args(argv)
+
+    sizes = [n for n in DEFAULT_SIZES if args.min_n <= n <= args.max_n]
+    results = run_scaling(sizes=sizes, distributions=args.dist, engines=args.engines, capacity=args.capacity,
+                          max_depth=args.max_depth, queries=args.queries)
+    print_exponents(results)
+
+    if args.save:
+        save_baseline(make_baseline(results, sizes=sizes, capacity=args.capacity,
+                                    max_depth=args.max_depth, queries=args.queries), args.save)
+        print(f"Zapisano baseline: {args.save}")
+
+    if args.check:
+        try:
+            check_against_baseline(results, load_baseline(args.check), tolerance=args.tolerance,
+                                   exponent_tolerance=args.exponent_tolerance, min_delta=args.min_delta)
+        except PerformanceRegression as e:
+            print(e, file=sys.stderr)
+            return 1
+        print(f"OK - brak regresji względem {args.check}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
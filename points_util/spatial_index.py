@@ -0,0 +1,102 @@
+"""
+Wspólny interfejs indeksów przestrzennych (QuadTree, KDTree, siatka, R-drzewo, drzewo przedziałowe).
+
+SpatialIndex to Protocol - nie trzeba po nim dziedziczyć, wystarczy mieć metody:
+    build(xs, ys, **params)   - (klasowa) budowa z tablic współrzędnych,
+    query(rect, tracer=None)  - punkty w prostokącie (półotwartym, jak Rect.contains_point),
+    count(rect)               - liczba punktów w prostokącie,
+    nearest(x, y, k=1)        - k najbliższych punktów, od najbliższego,
+    stats(rect)               - QueryStats jednego zapytania,
+    save(path) / load(path)   - zapis do FLATTREE i odczyt (klasowa).
+Silniki są zarejestrowane po nazwie w points_util.engines.
+
+Tu są też pomocnicze implementacje dla silników, które nie mają własnej:
+query_stats (zapytanie z licznikami), nearest_by_count (kNN przez count)
+i sample_parts (losowanie z wyniku rozłożonego na poddrzewa o znanej liczności).
+"""
+from __future__ import annotations
+
+import math
+import random
+from bisect import bisect_right
+from itertools import accumulate
+from pathlib import Path
+from typing import Callable, List, Optional, Protocol, Sequence, Tuple, runtime_checkable
+
+from points_util.points_classes import Point, Rect
+from points_util.query_stats import QueryStats, QueryTracer
+
+
+@runtime_checkable
+class SpatialIndex(Protocol):
+    @classmethod
+    def build(cls, xs, ys, **params) -> "SpatialIndex": ...
+
+    def query(self, range_rect: Rect, tracer: Optional[QueryTracer] = None) -> List[Point]: ...
+
+    def count(self, range_rect: Rect) -> int: ...
+
+    def nearest(self, x: float, y: float, k: int = 1) -> List[Point]: ...
+
+    def stats(self, range_rect: Rect) -> QueryStats: ...
+
+    def save(self, path: str | Path) -> None: ...
+
+    @classmethod
+    def load(cls, path: str | Path) -> "SpatialIndex": ...
+
+
+def query_stats(index, range_rect: Rect) -> QueryStats:
+    """Jedno zapytanie z licznikami przejścia."""
+    stats = QueryStats()
+    index.query(range_rect, tracer=stats)
+    return stats
+
+
+def nearest_by_count(index, x: float, y: float, k: int, bounds) -> List[Point]:
+    """
+    kNN dla indeksów z tanim count(): kwadrat wokół (x, y) rośnie dwukrotnie, aż
+    zawiera >= k punktów (półbok h). Wtedy k-ty sąsiad jest w odległości <= h * sqrt(2),
+    więc wystarczy jedno zapytanie o kwadrat z półbokiem 1.5 * h i sortowanie kandydatów.
+    bounds: (minx, miny, maxx, maxy) punktów - z nich pierwsze h.
+    """
+    k = min(k, len(index))
+    if k <= 0:
+        return []
+    minx, miny, maxx, maxy = bounds
+    # odległość do prostokąta granicznego + bok kwadratu, w którym średnio jest k punktów
+    dx = max(minx - x, 0.0, x - maxx)
+    dy = max(miny - y, 0.0, y - maxy)
+    h = math.hypot(dx, dy) + max(maxx - minx, maxy - miny) * math.sqrt(k / len(index)) / 2
+    h = max(h, 1e-9 * (1.0 + abs(x) + abs(y)))
+    while index.count(Rect(x, y, h, h)) < k:
+        h *= 2
+    cand = index.query(Rect(x, y, 1.5 * h, 1.5 * h))
+    cand.sort(key=lambda p: (p.x - x) ** 2 + (p.y - y) ** 2)
+    return cand[:k]
+
+
+def sample_parts(full: Sequence[Tuple[object, int]], extra: Sequence[Point], k: int, seed,
+                 nth: Callable[[object, int], Point]) -> List[Point]:
+    """
+    Do k punktów losowanych jednostajnie bez powtórzeń z sumy:
+    - full: (węzeł, liczność) - poddrzewa w całości w prostokącie,
+    - extra: pojedyncze trafienia spoza tych poddrzew (już przetestowane).
+    Losujemy numery 0..total-1 (random.sample, O(k)); numer w bloku full
+    zamienia się na punkt przez nth(węzeł, j) - zejście po licznościach dzieci.
+    Kolejność wyniku jest losowa.
+    """
+    n_full = sum(c for _, c in full)
+    total = n_full + len(extra)
+    k = min(k, total)
+    if k <= 0:
+        return []
+    starts = [0, *accumulate(c for _, c in full)]
+    out = []
+    for i in random.Random(seed).sample(range(total), k):
+        if i >= n_full:
+            out.append(extra[i - n_full])
+        else:
+            b = bisect_right(starts, i) - 1
+            out.append(nth(full[b][0], i - starts[b]))
+    return out
@@ -6,31 +6,63 @@ import pandas as pd
 from pathlib import Path
 import pickle
 
-CACHE_DIR = Path("cache_quadtree")
-KD_CACHE_DIR = Path("cache_kdtree")
+SERIALIZATION_DIR = Path("cache_serialization")
 
-def load_cached_kdtree(cache_path: Path):
-    with cache_path.open("rb") as f:
-        return pickle.load(f)
 
-def save_cached_kdtree(tree, cache_path: Path):
-    cache_path.parent.mkdir(parents=True, exist_ok=True)
-    with cache_path.open("wb") as f:
+def save_pickle(tree, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("wb") as f:
         pickle.dump(tree, f, protocol=pickle.HIGHEST_PROTOCOL)
 
-def load_cached_quadtree(cache_path: Path):
-    with cache_path.open("rb") as f:
+def load_pickle(path: Path):
+    with path.open("rb") as f:
         return pickle.load(f)
 
-def save_cached_quadtree(tree, cache_path: Path):
-    cache_path.parent.mkdir(parents=True, exist_ok=True)
-    with cache_path.open("wb") as f:
-        pickle.dump(tree, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+def compare_serialization(tree, flat_path: Path, save_flat, load_flat):
+    """
+    Mierzy zapis/odczyt drzewa w formacie FLATTREE i w pickle (ten sam obiekt).
+    Plik pickle ląduje obok pliku flat (z sufiksem .pkl) i jest usuwany po pomiarze.
+    """
+    pkl_path = flat_path.with_suffix(flat_path.suffix + ".pkl")
+
+    t0 = time.perf_counter()
+    save_flat(tree, flat_path)
+    t1 = time.perf_counter()
+    flat_tree = load_flat(flat_path)
+    t2 = time.perf_counter()
+    flat_tree.close()
+
+    t3 = time.perf_counter()
+    save_pickle(tree, pkl_path)
+    t4 = time.perf_counter()
+    load_pickle(pkl_path)
+    t5 = time.perf_counter()
+
+    pkl_bytes = pkl_path.stat().st_size
+    pkl_path.unlink()
+
+    return {
+        "flat_save_s": t1 - t0,
+        "flat_load_s": t2 - t1,
+        "flat_bytes": flat_path.stat().st_size,
+        "pickle_save_s": t4 - t3,
+        "pickle_load_s": t5 - t4,
+        "pickle_bytes": pkl_bytes,
+    }
 
 
-from QuadTree.quadtree import bounding_rect_pairwise, QuadTree
 from points_util.points_classes import Point, Rect  # WAŻNE: Rect z left/right/top/bottom
-from KDTree.kdtree import KDTree
+from points_util.tree_format import (
+    save_quadtree_flat, load_quadtree_flat,
+    save_kdtree_flat, load_kdtree_flat,
+)
+from points_util.tree_cache import TreeCache, default_cache, SERIALIZERS
+from points_util.engines import ENGINES, get_engine
+from points_util.bench_stats import measure, summarize
+from points_util.memory_usage import deep_sizeof, trace_memory
+from points_util.query_stats import QueryStats
+from points_util.np_baselines import BASELINES, xy_arrays
 
 def load_xy_csv(path: str):
     pts = []
@@ -72,116 +104,579 @@ from pathlib import Path
 import time
 import os
 
-def bench_both_file(csv_path: str, query_rect: Rect, capacity=8, max_depth=16):
-    xy = load_xy_csv(csv_path)
-    n = len(xy)
-
-    pts = [Point(x, y) for (x, y) in xy]
+def bench_spec(name: str) -> dict:
+    """Jak zbudować/odtworzyć/odpytać silnik z rejestru (points_util.engines) w benchmarku."""
+    e = get_engine(name)
+    cls, params = e["cls"], e["params"]
+    save, load = SERIALIZERS[name]
+    return {
+        "engine": name,
+        "params": params,
+        "build": lambda pts, capacity, max_depth: cls.from_points(pts, **(params(capacity, max_depth) or {})),
+        "materialize": e["materialize"],
+        "query": lambda tree, rect: tree.query(rect),
+        "query_stats": lambda tree, rect, stats: tree.query(rect, tracer=stats),
+        "flat": (save, load, e["suffix"]),
+    }
 
-    csv_p = Path(csv_path)
-    cache_path = CACHE_DIR / f"{csv_p.stem}_cap{capacity}_d{max_depth}.pkl"
 
-    # -------- QuadTree build/load
-    t0 = time.perf_counter()
-    if cache_path.exists() and cache_path.stat().st_mtime >= csv_p.stat().st_mtime:
-        qt = load_cached_quadtree(cache_path)
+# silniki benchmarku: tag (prefiks kolumn) -> spec; kolejność jak w rejestrze
+BENCH_ENGINES = {e["tag"]: bench_spec(name) for name, e in ENGINES.items()}
+
+
+def bench_tree(tag: str, engine: str, pts, params, build, materialize, query, query_rect: Rect,
+               cache: TreeCache, cold_build=True, warmup=2, repeat=30, build_repeat=3, load_repeat=5,
+               min_time=0.0, query_stats=None):
+    """
+    Mierzy osobno trzy rzeczy dla jednego drzewa:
+    - zimną budowę (build_repeat razy, bez rozgrzewki),
+    - odczyt z cache do drzewa gotowego do zapytań: otwarcie pliku FLATTREE
+      + materialize (load_s, load_repeat razy) - to porównujemy z budową;
+      samo otwarcie (mmap + nagłówek) osobno jako open_s,
+    - zapytanie (warmup + repeat razy) - zawsze na drzewie obiektowym,
+      więc czasy zapytań są porównywalne niezależnie od źródła drzewa.
+    cold_build=False: jeśli wpis jest w cache, budowa jest pomijana (kolumny
+    build puste), a drzewo do zapytań powstaje z pliku (materialize).
+    query_stats(tree, rect, stats): jedno dodatkowe, niemierzone zapytanie
+    z licznikami przejścia (QueryStats) -> kolumny {tag}_nodes_visited itd.
+    Zwraca (słownik kolumn z prefiksem tag, drzewo obiektowe).
+    """
+    key = cache.key_for(engine, pts, params)
+    cache_hit = cache.lookup(engine, key) is not None
+    cache_path = cache.path_for(engine, key)
+    _, load = SERIALIZERS[engine]
+
+    tree = None
+    build_samples = []
+    if cold_build or not cache_hit:
+        def run_build():
+            nonlocal tree
+            tree = build(pts)
+        build_samples = measure(run_build, warmup=0, repeat=build_repeat)
+        if not cache_hit:
+            cache.put(engine, key, tree)
+        source = "build"
     else:
-        world = bounding_rect_pairwise(pts)
-        qt = QuadTree(world, capacity=capacity, max_depth=max_depth)
-        for p in pts:
-            qt.insert(p)
-        save_cached_quadtree(qt, cache_path)
-    t1 = time.perf_counter()
-    qt_build_s = t1 - t0
-    t2 = time.perf_counter()
-    qt_hits = qt.query(query_rect)
-    t3 = time.perf_counter()
-    qt_query_s = t3 - t2
-
-    # -------- KDTree build
-    kd_cache_path = KD_CACHE_DIR / f"{csv_p.stem}.pkl"
+        source = "cache"
+
+    open_samples = measure(lambda: load(cache_path).close(), warmup=1, repeat=load_repeat)
+
+    loaded = None
+
+    def run_load():
+        nonlocal loaded
+        flat = load(cache_path)
+        loaded = materialize(flat)
+        flat.close()
+    load_samples = measure(run_load, warmup=1, repeat=load_repeat)
+
+    if tree is None:
+        tree = loaded
+    del loaded
+
+    hits = len(query(tree, query_rect))
+    traversal = {}
+    if query_stats is not None:
+        stats = QueryStats()
+        query_stats(tree, query_rect, stats)
+        traversal = {f"{tag}_{k}": v for k, v in stats.as_dict().items()}
+    query_samples = measure(lambda: query(tree, query_rect), warmup=warmup, repeat=repeat, min_time=min_time)
+
+    b = summarize(build_samples)
+    ld = summarize(load_samples)
+    op = summarize(open_samples)
+    q = summarize(query_samples, items=hits)
+
+    result = {
+        f"{tag}_tree_source": source,
+        f"{tag}_cache_hit": cache_hit,
+        f"{tag}_hits": hits,
+
+        f"{tag}_build_s": b["median_s"],
+        f"{tag}_build_p95_s": b["p95_s"],
+        f"{tag}_build_runs": b["runs"],
+
+        f"{tag}_load_s": ld["median_s"],
+        f"{tag}_load_p95_s": ld["p95_s"],
+        f"{tag}_open_s": op["median_s"],
+
+        f"{tag}_query_s": q["median_s"],
+        f"{tag}_query_p95_s": q["p95_s"],
+        f"{tag}_query_p99_s": q["p99_s"],
+        f"{tag}_query_runs": q["runs"],
+        f"{tag}_query_qps": q["ops_s"],
+        f"{tag}_query_pts_s": q["items_s"],
+        **traversal,
+
+        # surowe próbki (nie trafiają do tabel xlsx/csv)
+        f"{tag}_build_samples": build_samples,
+        f"{tag}_load_samples": load_samples,
+        f"{tag}_open_samples": open_samples,
+        f"{tag}_query_samples": query_samples,
+    }
+    return result, tree
+
+
+def bench_baselines(xy, query_rect: Rect, warmup=2, repeat=30, min_time=0.0):
+    """
+    Wektorowe punkty odniesienia (np_baselines): budowa (konwersja do tablic
+    + ewentualne sortowanie) i zapytanie, z tym samym warmup/repeat co drzewa.
+    Kolumny z prefiksem scan_ / sortx_.
+    """
+    result = {}
+    for tag, cls in BASELINES.items():
+        index = None
+
+        def run_build():
+            nonlocal index
+            index = cls(*xy_arrays(xy))
+
+        build_samples = measure(run_build, warmup=0, repeat=1)
+        hits = len(index.query(query_rect))
+        query_samples = measure(lambda: index.query(query_rect), warmup=warmup, repeat=repeat, min_time=min_time)
+        q = summarize(query_samples, items=hits)
+        result.update({
+            f"{tag}_hits": hits,
+            f"{tag}_build_s": build_samples[0],
+            f"{tag}_query_s": q["median_s"],
+            f"{tag}_query_p95_s": q["p95_s"],
+            f"{tag}_query_qps": q["ops_s"],
+            f"{tag}_query_samples": query_samples,
+        })
+    return result
+
+
+def memory_profile(csv_path: str, capacity=8, max_depth=16, cache: TreeCache = None,
+                   engines=tuple(BENCH_ENGINES)):
+    """
+    Osobny przebieg (tracemalloc spowalnia, więc nie mierzymy go razem z czasami):
+    - wczytanie CSV -> lista Point,
+    - budowa każdego indeksu z engines (domyślnie wszystkie z BENCH_ENGINES),
+    dla każdego etapu szczyt i pamięć zatrzymaną, a dla drzew dodatkowo głęboki
+    rozmiar grafu obiektów: z punktami (deep) i bez nich (index = sam narzut).
+    *_bytes_per_point dzielą to przez N; *_flat_bytes_per_point to rozmiar
+    pliku FLATTREE z cache (dla porównania z reprezentacją zwartą).
+    """
+    if cache is None:
+        cache = default_cache()
+
+    pts, load_peak, load_retained = trace_memory(
+        lambda: [Point(x, y) for (x, y) in load_xy_csv(csv_path)]
+    )
+    n = len(pts)
+    point_ids = [id(p) for p in pts]
+
+    result = {
+        "load_peak_b": load_peak,
+        "load_retained_b": load_retained,
+        "points_deep_b": deep_sizeof(pts),
+    }
 
-    kd_used_cache = kd_cache_path.exists() and kd_cache_path.stat().st_mtime >= csv_p.stat().st_mtime
+    for tag in engines:
+        spec = BENCH_ENGINES[tag]
+        engine = spec["engine"]
+        params = spec["params"](capacity, max_depth)
+        tree, peak, retained = trace_memory(lambda: spec["build"](pts, capacity, max_depth))
+        deep = deep_sizeof(tree)
+        index = deep_sizeof(tree, exclude=point_ids)
+        result.update({
+            f"{tag}_build_peak_b": peak,
+            f"{tag}_retained_b": retained,
+            f"{tag}_deep_b": deep,
+            f"{tag}_index_b": index,
+            f"{tag}_bytes_per_point": deep / n if n else 0.0,
+            f"{tag}_index_bytes_per_point": index / n if n else 0.0,
+        })
+
+        flat_path = cache.path_for(engine, cache.key_for(engine, pts, params))
+        if flat_path.exists():
+            result[f"{tag}_flat_bytes_per_point"] = flat_path.stat().st_size / n if n else 0.0
+        del tree
+
+    return result
+
+
+def add_speedups(result: dict, engines) -> None:
+    """
+    Kolumny {tag}_speedup_{baseline} w wierszu, który ma już czasy drzew i baseline'ów
+    (bench_parallel liczy je po sklejeniu komórek). Liczba trafień musi się zgadzać.
+    """
+    for base in BASELINES:
+        for tag in engines:
+            if result[f"{tag}_hits"] != result[f"{base}_hits"]:
+                raise RuntimeError(
+                    f"Różna liczba trafień w {result['path']}: {tag}={result[f'{tag}_hits']} "
+                    f"{base}={result[f'{base}_hits']}"
+                )
+            result[f"{tag}_speedup_{base}"] = result[f"{base}_query_s"] / result[f"{tag}_query_s"]
+
+
+def bench_both_file(csv_path: str, query_rect: Rect, capacity=8, max_depth=16, compare_pickle=False,
+                    cache: TreeCache = None, cold_build=True, warmup=2, repeat=30, build_repeat=3,
+                    load_repeat=5, min_time=0.0, measure_memory=False, engines=tuple(BENCH_ENGINES),
+                    baselines=True):
+    """
+    Jeden wiersz wyników dla pliku CSV. engines: tagi z BENCH_ENGINES - domyślnie
+    wszystkie z BENCH_ENGINES; bench równoległy (bench_parallel) woła to osobno dla każdego
+    silnika i skleja wiersze.
+    baselines: także skan maską NumPy i sort po x + searchsorted (np_baselines);
+    liczba trafień musi się zgadzać z drzewami, a dla drzew dochodzą kolumny
+    {tag}_speedup_{baseline} = czas baseline / czas drzewa (>1 = drzewo szybsze).
+    """
+    if cache is None:
+        cache = default_cache()
 
-    t4 = time.perf_counter()
-    if kd_used_cache:
-        kd = load_cached_kdtree(kd_cache_path)
-    else:
-        kd = KDTree(list(pts))
-        save_cached_kdtree(kd, kd_cache_path)
-    t5 = time.perf_counter()
-    kd_build_s = t5 - t4
+    t0 = time.perf_counter()
+    xy = load_xy_csv(csv_path)
+    pts = [Point(x, y) for (x, y) in xy]
+    load_csv_s = time.perf_counter() - t0
+    n = len(pts)
 
-    # -------- KDTree query
-    t6 = time.perf_counter()
-    kd_hits = kd.query_range(query_rect)
-    t7 = time.perf_counter()
-    kd_query_s = t7 - t6
+    csv_p = Path(csv_path)
+    timing = dict(cache=cache, cold_build=cold_build, warmup=warmup, repeat=repeat,
+                  build_repeat=build_repeat, load_repeat=load_repeat, min_time=min_time)
 
-    return {
+    result = {
         "file": os.path.basename(csv_path),
         "path": csv_path,
         "n": n,
         "capacity": capacity,
         "max_depth": max_depth,
+        "load_csv_s": load_csv_s,
+        "cold_build": cold_build,
+        "warmup": warmup,
+        "repeat": repeat,
+    }
 
-        "qt_build_s": qt_build_s,
-        "qt_query_s": qt_query_s,
-        "qt_hits": len(qt_hits),
+    for tag in engines:
+        spec = BENCH_ENGINES[tag]
+        tag_result, tree = bench_tree(
+            tag, spec["engine"], pts, spec["params"](capacity, max_depth),
+            build=lambda p: spec["build"](p, capacity, max_depth),
+            materialize=spec["materialize"],
+            query=spec["query"],
+            query_stats=spec["query_stats"],
+            query_rect=query_rect, **timing,
+        )
+        result.update(tag_result)
 
-        "kd_build_s": kd_build_s,
-        "kd_query_s": kd_query_s,
-        "kd_hits": len(kd_hits),
-    }
+        # -------- FLATTREE vs pickle (na drzewie obiektowym)
+        if compare_pickle:
+            save_flat, load_flat, suffix = spec["flat"]
+            # katalog N_* w nazwie - te same nazwy zbiorów są w każdym rozmiarze
+            flat_name = f"{csv_p.parent.name}_{csv_p.stem}{suffix}"
+            for key, value in compare_serialization(tree, SERIALIZATION_DIR / flat_name,
+                                                    save_flat, load_flat).items():
+                result[f"{tag}_{key}"] = value
+        del tree
+
+    # -------- punkty odniesienia NumPy
+    if baselines:
+        result.update(bench_baselines(xy, query_rect, warmup=warmup, repeat=repeat, min_time=min_time))
+        add_speedups(result, engines)
+
+    # -------- pamięć (osobny przebieg)
+    if measure_memory:
+        result.update(memory_profile(csv_path, capacity=capacity, max_depth=max_depth, cache=cache,
+                                     engines=engines))
 
+    return result
 
 
-def bench_both_all(output_root: str, capacity=8, max_depth=16):
+def _fmt_s(value) -> str:
+    return "-" if value != value else f"{value:.4f}s"  # NaN -> "-"
+
+
+def dataset_files(output_root: str):
+    """Pary (plik CSV, prostokąt zapytania) dla wszystkich zbiorów w output_root."""
     csv_files = sorted(glob.glob(os.path.join(output_root, "**", "*.csv"), recursive=True))
     csv_files = [p for p in csv_files if not p.endswith(".query.csv")]
 
-    results = []
+    out = []
     for csv_path in csv_files:
         query_path = csv_path.replace(".csv", ".query.csv")
         if not os.path.exists(query_path):
             raise FileNotFoundError(f"Brak query: {query_path} (dla {csv_path})")
-
-        query_rect = load_query_rect(query_path)
-        r = bench_both_file(csv_path, query_rect, capacity=capacity, max_depth=max_depth)
-        results.append(r)
-
+        out.append((csv_path, load_query_rect(query_path)))
+    return out
+
+
+def print_bench_row(r, compare_pickle=False, measure_memory=False):
+    tags = [tag for tag in BENCH_ENGINES if f"{tag}_query_s" in r]
+    print(f"{r['path']} | " + " | ".join(
+        f"{tag.upper()}[{r[f'{tag}_tree_source']}] build={_fmt_s(r[f'{tag}_build_s'])} "
+        f"load={r[f'{tag}_load_s']:.4f}s (open={r[f'{tag}_open_s']:.4f}s) query med={r[f'{tag}_query_s'] * 1e3:.3f}ms "
+        f"p95={r[f'{tag}_query_p95_s'] * 1e3:.3f}ms hits={r[f'{tag}_hits']}"
+        for tag in tags
+    ))
+    traced = [tag for tag in tags if f"{tag}_nodes_visited" in r]
+    if traced:
+        print("    NODES " + " | ".join(
+            f"{tag.upper()} visited={r[f'{tag}_nodes_visited']} pruned={r[f'{tag}_nodes_pruned']} "
+            f"leaves={r[f'{tag}_leaves_scanned']} tested={r[f'{tag}_points_tested']} "
+            f"depth={r[f'{tag}_max_depth']}"
+            for tag in traced
+        ))
+    if "scan_query_s" in r and "sortx_query_s" in r:
         print(
-            f"{r['path']} | "
-            f"QT build={r['qt_build_s']:.4f}s query={r['qt_query_s']:.4f}s hits={r['qt_hits']} | "
-            f"KD build={r['kd_build_s']:.4f}s query={r['kd_query_s']:.4f}s hits={r['kd_hits']}"
+            f"    NUMPY scan={r['scan_query_s'] * 1e3:.3f}ms sortx={r['sortx_query_s'] * 1e3:.3f}ms | speedup " +
+            " ".join(f"{tag.upper()} x{r[f'{tag}_speedup_scan']:.3g}/x{r[f'{tag}_speedup_sortx']:.3g}"
+                     for tag in tags) +
+            " (vs scan/sortx)"
         )
+    if compare_pickle:
+        for tag in tags:
+            print(
+                f"    {tag.upper()} flat save={r[f'{tag}_flat_save_s']:.4f}s load={r[f'{tag}_flat_load_s']:.4f}s | "
+                f"pickle save={r[f'{tag}_pickle_save_s']:.4f}s load={r[f'{tag}_pickle_load_s']:.4f}s"
+            )
+    if measure_memory:
+        print(f"    MEM load peak={r['load_peak_b'] / 2**20:.1f}MiB | " + " | ".join(
+            f"{tag.upper()} peak={r[f'{tag}_build_peak_b'] / 2**20:.1f}MiB "
+            f"deep={r[f'{tag}_deep_b'] / 2**20:.1f}MiB ({r[f'{tag}_bytes_per_point']:.0f} B/pt)"
+            for tag in tags
+        ))
+
+
+def print_cache_stats(cache: TreeCache):
+    st = cache.stats()
+    print(f"[CACHE] hits={st['hits']} misses={st['misses']} evictions={st['evictions']} "
+          f"hit_rate={st['hit_rate']:.2f} size={st['bytes']}/{st['max_bytes']} B")
+
+
+def bench_both_all(output_root: str, capacity=8, max_depth=16, compare_pickle=False, cache: TreeCache = None,
+                   measure_memory=False, workers=1, param_grid=None, pin_cpus=True, **timing):
+    """
+    timing: parametry pomiaru przekazywane do bench_both_file (cold_build, warmup, repeat, ...).
+    workers != 1: komórki (plik, silnik, parametry) idą do puli procesów
+    (bench_parallel.run_parallel; workers=None = wszystkie dostępne rdzenie).
+    param_grid: lista par (capacity, max_depth) zamiast pojedynczej pary.
+    """
+    if cache is None:
+        cache = default_cache()
+    if param_grid is None:
+        param_grid = [(capacity, max_depth)]
+
+    inputs = dataset_files(output_root)
+
+    if workers != 1:
+        from points_util.bench_parallel import run_parallel
+        results = run_parallel(inputs, param_grid, workers=workers, pin_cpus=pin_cpus, cache=cache,
+                               compare_pickle=compare_pickle, measure_memory=measure_memory, **timing)
+        for r in results:
+            print_bench_row(r, compare_pickle, measure_memory)
+        print_cache_stats(cache)
+        return results
 
+    results = []
+    for csv_path, query_rect in inputs:
+        for cap, depth in param_grid:
+            r = bench_both_file(csv_path, query_rect, capacity=cap, max_depth=depth,
+                                compare_pickle=compare_pickle, cache=cache, measure_memory=measure_memory,
+                                **timing)
+            results.append(r)
+            print_bench_row(r, compare_pickle, measure_memory)
+
+    print_cache_stats(cache)
     return results
 
 
+def get_object_tree(cache: TreeCache, engine: str, pts, params, build, materialize):
+    """Drzewo obiektowe z cache (zmaterializowane) albo świeżo zbudowane."""
+    tree, used_cache = cache.get_or_build(engine, pts, params, build)
+    if used_cache:
+        flat = tree
+        tree = materialize(flat)
+        flat.close()
+    return tree
+
+
+def bench_workload_file(csv_path: str, workload, capacity=8, max_depth=16, cache: TreeCache = None,
+                        warmup=1, repeat=3, engines=("qt", "kd")):
+    """
+    Uruchamia cały workload (lista słowników z cx, cy, hw, hh, target_selectivity)
+    na silnikach z engines (tagi BENCH_ENGINES, domyślnie QuadTree i KDTree).
+    Każde zapytanie: mediana z repeat pomiarów.
+    Zwraca listę wierszy (po jednym na zapytanie). expected_hits to dokładna
+    liczba trafień z generatora (pole hits workloadu); hits_match = False, gdy
+    któryś silnik zwrócił inną liczbę niż pozostałe albo generator (błąd silnika
+    albo nieaktualny wpis w cache) - czas takiego zapytania nie jest porównywalny.
+    """
+    if cache is None:
+        cache = default_cache()
+
+    pts = [Point(x, y) for (x, y) in load_xy_csv(csv_path)]
+
+    trees = {}
+    for tag in engines:
+        spec = BENCH_ENGINES[tag]
+        trees[tag] = get_object_tree(cache, spec["engine"], pts, spec["params"](capacity, max_depth),
+                                     lambda p: spec["build"](p, capacity, max_depth), spec["materialize"])
+
+    rows = []
+    for i, w in enumerate(workload):
+        rect = Rect(cx=w["cx"], cy=w["cy"], hw=w["hw"], hh=w["hh"])
+
+        row = {
+            "file": os.path.basename(csv_path),
+            "path": csv_path,
+            "n": len(pts),
+            "query_idx": i,
+            "target_selectivity": w["target_selectivity"],
+        }
+        for tag, tree in trees.items():
+            row[f"{tag}_hits"] = len(tree.query(rect))
+            row[f"{tag}_query_s"] = summarize(
+                measure(lambda: tree.query(rect), warmup=warmup, repeat=repeat))["median_s"]
+        hits = {row[f"{tag}_hits"] for tag in trees}
+        if w.get("hits") is not None:
+            row["expected_hits"] = w["hits"]
+            hits.add(w["hits"])
+        row["hits_match"] = len(hits) == 1
+        rows.append(row)
+
+    bad = [r for r in rows if not r["hits_match"]]
+    if bad:
+        r = bad[0]
+        print(f"[WORKLOAD] uwaga: {csv_path}: różna liczba trafień w {len(bad)}/{len(rows)} zapytaniach "
+              f"(pierwsze #{r['query_idx']}: " +
+              " ".join(f"{tag}={r[f'{tag}_hits']}" for tag in trees) +
+              (f" oczekiwane={r['expected_hits']}" if "expected_hits" in r else "") + ")")
+    return rows
+
+
+def bench_workload_all(output_root="output", workload_root="workloads", capacity=8, max_depth=16,
+                       cache: TreeCache = None, out_dir="times/workload", limit=None, **timing):
+    """
+    Dla każdego zbioru z output_root, który ma workload w workload_root:
+    uruchamia zapytania, zapisuje CSV z czasami i wykres czas(trafienia).
+    limit: maks. liczba zapytań na zbiór (None = wszystkie).
+    """
+    from data_generators.query_workload import load_workload, workload_path_for
+
+    csv_files = sorted(glob.glob(os.path.join(output_root, "**", "*.csv"), recursive=True))
+    csv_files = [p for p in csv_files if not p.endswith(".query.csv")]
+
+    os.makedirs(out_dir, exist_ok=True)
+    all_rows = []
+    for csv_path in csv_files:
+        wl_path = workload_path_for(csv_path, output_root, workload_root)
+        if not os.path.exists(wl_path):
+            print(f"[SKIP] brak workloadu: {wl_path}")
+            continue
+
+        workload = load_workload(wl_path)
+        if limit is not None:
+            workload = workload[:limit]
+
+        rows = bench_workload_file(csv_path, workload, capacity=capacity, max_depth=max_depth,
+                                   cache=cache, **timing)
+        all_rows.extend(rows)
+
+        rel = os.path.splitext(os.path.relpath(csv_path, output_root))[0].replace(os.sep, "_")
+        pd.DataFrame(rows).to_csv(os.path.join(out_dir, f"{rel}.csv"), index=False)
+        png = plot_workload(rows, os.path.join(out_dir, f"{rel}.png"),
+                            title=f"{dataset_name_from_file(os.path.basename(csv_path))}, N={rows[0]['n']}")
+        n_bad = sum(not r["hits_match"] for r in rows)
+        print(f"[WORKLOAD] {csv_path} | queries={len(rows)} | hits_mismatch={n_bad} | png={png}")
+
+    return all_rows
+
+
+def plot_workload(rows, out_png: str, title: str = ""):
+    """
+    Czas zapytania vs liczba trafień (log-log) dla każdego silnika z wierszy.
+    Zapytania z hits_match = False są zaznaczone krzyżykiem.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots()
+    for tag, spec in BENCH_ENGINES.items():
+        if f"{tag}_query_s" not in rows[0]:
+            continue
+        # log-skala nie zniesie zera trafień - rysujemy je na 1
+        ok = [r for r in rows if r.get("hits_match", True)]
+        bad = [r for r in rows if not r.get("hits_match", True)]
+        points = ax.scatter([max(r[f"{tag}_hits"], 1) for r in ok], [r[f"{tag}_query_s"] for r in ok],
+                            s=6, alpha=0.5, label=ENGINES[spec["engine"]]["label"])
+        if bad:
+            ax.scatter([max(r[f"{tag}_hits"], 1) for r in bad], [r[f"{tag}_query_s"] for r in bad],
+                       s=18, marker="x", color=points.get_facecolor()[0],
+                       label=f"{ENGINES[spec['engine']]['label']} (różne trafienia)")
+    ax.set_xscale("log")
+    ax.set_yscale("log")
+    ax.set_xlabel("liczba trafień")
+    ax.set_ylabel("czas zapytania [s]")
+    if title:
+        ax.set_title(title)
+    ax.grid(True, which="both", alpha=0.3)
+    ax.legend()
+    fig.savefig(out_png, dpi=120)
+    plt.close(fig)
+    return out_png
+
+
 def save_separate_tables_both(results, out_dir="times", prefer_xlsx=True):
     os.makedirs(out_dir, exist_ok=True)
 
     df = pd.DataFrame(results).copy()
     df["Dataset"] = df["file"].apply(dataset_name_from_file)
 
-    out = df.rename(columns={
-        "n": "PointsNo",
-
-        "qt_hits": "QT_FoundPoints",
-        "qt_build_s": "QuadTreeBuildTime",
-        "qt_query_s": "QuadTreeQueryTime",
-
-        "kd_hits": "KD_FoundPoints",
-        "kd_build_s": "KDTreeBuildTime",
-        "kd_query_s": "KDTreeQueryTime",
-    })
-
-    out = out[[
-        "Dataset", "PointsNo",
-        "QT_FoundPoints", "QuadTreeBuildTime", "QuadTreeQueryTime",
-        "KD_FoundPoints", "KDTreeBuildTime", "KDTreeQueryTime",
-    ]]
+    out = df.rename(columns={"n": "PointsNo"})
+
+    columns = ["Dataset", "PointsNo"]
+    # przy przeglądzie parametrów (param_grid) wiersze różnią się tylko nimi
+    if df[["capacity", "max_depth"]].drop_duplicates().shape[0] > 1:
+        out = out.rename(columns={"capacity": "Capacity", "max_depth": "MaxDepth"})
+        columns += ["Capacity", "MaxDepth"]
+
+    # nazwy kolumn silników z rejestru (label/short/traversal); kolejność jak w BENCH_ENGINES
+    engines = [(tag, get_engine(spec["engine"])) for tag, spec in BENCH_ENGINES.items()]
+
+    def engine_columns(fields, before=None, after=None):
+        """Zmiany nazw jednej grupy: before, pola każdego silnika (fields(e) -> {pole: nazwa}), after."""
+        group = dict(before or {})
+        for tag, e in engines:
+            for field, name in fields(e).items():
+                group[f"{tag}_{field}"] = name.format(label=e["label"], short=e["short"])
+        group.update(after or {})
+        return group
+
+    groups = [
+        # mediany trafień i czasów; silniki tylko, gdy były w engines
+        engine_columns(lambda e: {"hits": "{short}_FoundPoints", "build_s": "{label}BuildTime",
+                                  "query_s": "{label}QueryTime"}),
+        # rozkład czasów (mediany powyżej) + skąd pochodziło drzewo
+        engine_columns(lambda e: {"tree_source": "{label}Source", "load_s": "{label}CacheLoadTime",
+                                  "open_s": "{label}CacheOpenTime",
+                                  "query_p95_s": "{label}QueryP95", "query_p99_s": "{label}QueryP99",
+                                  "query_qps": "{label}QueriesPerSec"},
+                       after={"repeat": "QueryRuns"}),
+        # punkty odniesienia NumPy i przyspieszenie drzew względem nich
+        engine_columns(lambda e: {"speedup_scan": "{label}SpeedupVsScan",
+                                  "speedup_sortx": "{label}SpeedupVsSortedX"},
+                       before={"scan_query_s": "NumpyScanQueryTime", "sortx_build_s": "SortedXBuildTime",
+                               "sortx_query_s": "SortedXQueryTime"}),
+        # liczniki przejścia drzewa dla zapytania (QueryStats)
+        engine_columns(lambda e: {field: "{label}" + name for field, name in e["traversal"].items()}),
+        # kolumny porównania FLATTREE vs pickle (tylko gdy bench liczył je z compare_pickle=True)
+        engine_columns(lambda e: {"flat_save_s": "{label}FlatSaveTime", "flat_load_s": "{label}FlatLoadTime",
+                                  "pickle_save_s": "{label}PickleSaveTime",
+                                  "pickle_load_s": "{label}PickleLoadTime"}),
+        # kolumny pamięci (tylko gdy bench liczył je z measure_memory=True)
+        engine_columns(lambda e: {"build_peak_b": "{label}BuildPeakBytes", "retained_b": "{label}RetainedBytes",
+                                  "bytes_per_point": "{label}BytesPerPoint",
+                                  "index_bytes_per_point": "{label}IndexBytesPerPoint",
+                                  "flat_bytes_per_point": "{label}FlatBytesPerPoint"},
+                       before={"load_peak_b": "LoadPeakBytes"}),
+    ]
+    for group in groups:
+        out = out.rename(columns=group)
+        columns += [c for c in group.values() if c in out.columns]
+
+    out = out[columns]
 
     can_xlsx = False
     if prefer_xlsx:
@@ -193,7 +688,7 @@ def save_separate_tables_both(results, out_dir="times", prefer_xlsx=True):
 
     saved = []
     for dataset, g in out.groupby("Dataset"):
-        g = g.sort_values("PointsNo")
+        g = g.sort_values([c for c in ("PointsNo", "Capacity", "MaxDepth") if c in g.columns])
         safe = dataset.replace("/", "_").replace("\\", "_")
 
         # nadpisujemy (bez timestampu)
@@ -216,3 +711,56 @@ def save_separate_tables_both(results, out_dir="times", prefer_xlsx=True):
     print("Zapisano pliki:")
     for p in paths:
         print(" -", p)
+
+
+# metryki kompromisu: (kolumna wyniku bench, nazwa w tabeli)
+TRADEOFF_METRICS = (
+    ("build_s", "BuildTime"),
+    ("query_s", "QueryTime"),
+    ("query_p99_s", "QueryP99"),
+    ("build_peak_b", "BuildPeakBytes"),
+    ("bytes_per_point", "BytesPerPoint"),
+    ("flat_bytes_per_point", "FlatBytesPerPoint"),
+)
+
+
+def save_tradeoff_table(results, base="kd", other="rg", out_dir="times", prefer_xlsx=True):
+    """
+    Kompromis dwóch silników w funkcji N (mediana po zbiorach jednego rozmiaru):
+    dla każdej metryki z TRADEOFF_METRICS kolumny {base}, {other} i iloraz other/base
+    (np. domyślnie: ile razy drzewo przedziałowe buduje się dłużej i zajmuje więcej niż KDTree,
+    a ile szybciej odpowiada). Kolumny pamięci tylko z measure_memory=True.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    df = pd.DataFrame(results)
+    # rozmiar = katalog N_* (N zbiorów w jednym katalogu różni się o kilka punktów)
+    df["Size"] = df["path"].map(lambda p: Path(p).parent.name)
+    groups = df.groupby("Size")
+    names = {base: base.upper(), other: other.upper()}
+
+    table = groups["n"].median().sort_values().rename("PointsNo").reset_index()
+    for key, label in TRADEOFF_METRICS:
+        cols = [f"{base}_{key}", f"{other}_{key}"]
+        if not all(c in df.columns for c in cols):
+            continue
+        med = groups[cols].median().reindex(table["Size"]).to_numpy()
+        table[f"{names[base]}{label}"] = med[:, 0]
+        table[f"{names[other]}{label}"] = med[:, 1]
+        table[f"{label}Ratio"] = med[:, 1] / med[:, 0]
+
+    can_xlsx = False
+    if prefer_xlsx:
+        try:
+            import openpyxl  # noqa
+            can_xlsx = True
+        except Exception:
+            can_xlsx = False
+
+    stem = os.path.join(out_dir, f"tradeoff_{base}_{other}")
+    if can_xlsx:
+        path = stem + ".xlsx"
+        table.to_excel(path, index=False)
+    else:
+        path = stem + ".csv"
+        table.to_csv(path, index=False)
+    return path
@@ -0,0 +1,260 @@
+"""
+Wspólny cache zbudowanych drzew (benchmark + wizualizacje).
+
+Klucz to hash zawartości punktów (w kolejności wstawiania) + nazwa silnika
++ wersja silnika (ENGINE_VERSIONS) + parametry budowy, więc:
+- zbiory o tej samej nazwie w różnych katalogach N_* nie kolidują,
+- to samo drzewo zbudowane w benchmarku i w wizualizacji trafia do jednego pliku,
+- po zmianie algorytmu budowy (podbita wersja) stare wpisy przestają trafiać
+  i wypadają z cache przez LRU.
+
+Pliki są zapisywane w formacie FLATTREE (points_util.tree_format).
+Cache ma budżet dyskowy (max_bytes); po przekroczeniu usuwane są najdawniej
+używane wpisy (LRU po mtime - przy trafieniu plik jest "dotykany").
+Obok wpisu może leżeć plik JSON z metadanymi (put_meta, np. wybór silnika
+z points_util.advisor); znika razem z wpisem.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from array import array
+from pathlib import Path
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+from points_util.points_classes import Point
+from points_util.tree_format import (
+    save_quadtree_flat, load_quadtree_flat,
+    save_kdtree_flat, load_kdtree_flat,
+)
+from points_util.grid_index import save_grid_flat, load_grid_flat
+from points_util.curve_index import save_curve_flat, load_curve_flat
+from RTree.rtree import save_rtree_flat, load_rtree_flat
+from RangeTree.range_tree import save_range_tree_flat, load_range_tree_flat
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent.parent / "cache_trees"
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+# silnik -> (zapis, odczyt); odczyt zwraca drzewo gotowe do zapytań
+SERIALIZERS: Dict[str, Tuple[Callable, Callable]] = {
+    "quadtree": (save_quadtree_flat, load_quadtree_flat),
+    "kdtree": (save_kdtree_flat, load_kdtree_flat),
+    "grid": (save_grid_flat, load_grid_flat),
+    "rtree": (save_rtree_flat, load_rtree_flat),
+    "rangetree": (save_range_tree_flat, load_range_tree_flat),
+    "zorder": (save_curve_flat, load_curve_flat),
+    "hilbert": (save_curve_flat, load_curve_flat),
+}
+
+# silnik -> wersja algorytmu budowy (brak wpisu = 1); podbić, gdy ten sam zbiór
+# i parametry dają teraz inne drzewo
+ENGINE_VERSIONS: Dict[str, int] = {
+    "quadtree": 2,  # 2: punkty na linii podziału kierowane po (cx, cy), a nie gubione
+}
+
+_SUFFIX = ".flat"
+_META_SUFFIX = ".json"
+
+
+def register_serializer(engine: str, save: Callable, load: Callable, version: Optional[int] = None) -> None:
+    SERIALIZERS[engine] = (save, load)
+    if version is not None:
+        ENGINE_VERSIONS[engine] = version
+
+
+def engine_version(engine: str) -> int:
+    return ENGINE_VERSIONS.get(engine, 1)
+
+
+def points_digest(points: Sequence[Point]) -> str:
+    """Hash zawartości punktów (x, y jako float64, w kolejności listy)."""
+    h = hashlib.blake2b(digest_size=16)
+    chunk = 1 << 16
+    for i in range(0, len(points), chunk):
+        buf = array("d")
+        for p in points[i:i + chunk]:
+            buf.append(p.x)
+            buf.append(p.y)
+        h.update(buf.tobytes())
+    h.update(str(len(points)).encode("ascii"))
+    return h.hexdigest()
+
+
+def cache_key(engine: str, digest: str, params: Optional[dict] = None) -> str:
+    params_json = json.dumps(params or {}, sort_keys=True)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(engine.encode("utf-8"))
+    h.update(b"\0")
+    h.update(str(engine_version(engine)).encode("ascii"))
+    h.update(b"\0")
+    h.update(params_json.encode("utf-8"))
+    h.update(b"\0")
+    h.update(digest.encode("ascii"))
+    return h.hexdigest()
+
+
+class TreeCache:
+    def __init__(self, root: str | Path = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path_for(self, engine: str, key: str) -> Path:
+        return self.root / f"{engine}-{key}{_SUFFIX}"
+
+    def meta_path(self, engine: str, key: str) -> Path:
+        return self.root / f"{engine}-{key}{_META_SUFFIX}"
+
+    def key_for(self, engine: str, points: Sequence[Point], params: Optional[dict] = None) -> str:
+        return cache_key(engine, points_digest(points), params)
+
+    def lookup(self, engine: str, key: str) -> Optional[Path]:
+        """Ścieżka wpisu albo None (liczy trafienie/chybienie, odświeża LRU)."""
+        path = self.path_for(engine, key)
+        if not path.exists():
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)  # LRU: ostatnie użycie
+        except FileNotFoundError:
+            # usunięty w międzyczasie przez inny proces (eviction)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def load(self, engine: str, key: str):
+        """Wczytuje wpis. Zwraca None, jeśli go nie ma."""
+        path = self.lookup(engine, key)
+        if path is None:
+            return None
+        _, load = SERIALIZERS[engine]
+        return load(path)
+
+    def get_or_build(self, engine: str, points: Sequence[Point], params: Optional[dict],
+                     build: Callable[[Sequence[Point]], object]):
+        """
+        Zwraca (drzewo, czy_z_cache).
+        Przy trafieniu drzewo jest wczytane z pliku (np. FlatQuadTree),
+        przy chybieniu - świeżo zbudowane obiektowe drzewo (i zapisane do cache).
+        """
+        if engine not in SERIALIZERS:
+            raise KeyError(f"Brak serializera dla silnika: {engine}")
+
+        key = self.key_for(engine, points, params)
+        tree = self.load(engine, key)
+        if tree is not None:
+            return tree, True
+
+        tree = build(points)
+        self.put(engine, key, tree)
+        return tree, False
+
+    def put(self, engine: str, key: str, tree) -> Path:
+        save, _ = SERIALIZERS[engine]
+        path = self.path_for(engine, key)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        # zapis atomowy - równoległe procesy nie zobaczą połowy pliku
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        save(tree, tmp)
+        os.replace(tmp, path)
+
+        self.evict(keep=path)
+        return path
+
+    def put_meta(self, engine: str, key: str, meta: dict) -> Path:
+        """Zapisuje metadane obok wpisu (JSON, atomowo)."""
+        path = self.meta_path(engine, key)
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2, sort_keys=True)
+        os.replace(tmp, path)
+        return path
+
+    def load_meta(self, engine: str, key: str) -> Optional[dict]:
+        try:
+            with open(self.meta_path(engine, key), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def metas(self):
+        """Wszystkie metadane w cache jako (ścieżka, słownik)."""
+        if not self.root.exists():
+            return
+        for p in self.root.glob(f"*{_META_SUFFIX}"):
+            try:
+                with open(p, encoding="utf-8") as f:
+                    yield p, json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue
+
+    def _remove(self, path: Path) -> None:
+        """Usuwa wpis razem z jego metadanymi."""
+        for p in (path, path.with_suffix(_META_SUFFIX)):
+            try:
+                p.unlink()
+            except FileNotFoundError:
+                pass
+
+    def entries(self):
+        """Lista (ścieżka, rozmiar, mtime) od najdawniej używanego."""
+        if not self.root.exists():
+            return []
+        out = []
+        for p in self.root.glob(f"*{_SUFFIX}"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            out.append((p, st.st_size, st.st_mtime))
+        out.sort(key=lambda e: e[2])
+        return out
+
+    def size_bytes(self) -> int:
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, keep: Optional[Path] = None) -> None:
+        """Usuwa najdawniej używane wpisy, aż cache zmieści się w max_bytes."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for p, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if keep is not None and p == keep:
+                continue
+            self._remove(p)
+            total -= size
+            self.evictions += 1
+
+    def clear(self) -> None:
+        for p, _, _ in self.entries():
+            self._remove(p)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "bytes": self.size_bytes(),
+            "max_bytes": self.max_bytes,
+        }
+
+
+_default_cache: Optional[TreeCache] = None
+
+
+def default_cache() -> TreeCache:
+    """Wspólna instancja cache (katalog cache_trees/ w korzeniu repo)."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = TreeCache()
+    return _default_cache
@@ -0,0 +1,469 @@
+"""
+Zwarty, wersjonowany format binarny dla drzew (QuadTree, KDTree).
+
+Zamiast picklować cały graf obiektów, węzły są spłaszczane do tablic
+(array.array), a plik ma postać:
+
+    MAGIC | wersja | byteorder | kind | meta (JSON) | tabela sekcji | dane
+
+Każda sekcja to ciągła tablica jednego typu (typecode z modułu array),
+wyrównana do 8 bajtów. Dzięki temu plik można otworzyć przez mmap
+i czytać bez deserializacji - zimny start to praktycznie tylko open().
+"""
+from __future__ import annotations
+
+import json
+import mmap
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from points_util.points_classes import Point, Rect
+
+MAGIC = b"FLATTREE"
+FORMAT_VERSION = 1
+
+QUADTREE_KIND = "quadtree"
+KDTREE_KIND = "kdtree"
+
+_ALIGN = 8
+
+
+def _pad(n: int) -> int:
+    return (-n) % _ALIGN
+
+
+def write_flat(path: str | Path, kind: str, meta: dict, sections: Dict[str, array]) -> None:
+    """Zapisuje nazwane tablice (array.array) do pliku w formacie FLATTREE."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    kind_b = kind.encode("ascii")
+    meta_b = json.dumps(meta, sort_keys=True).encode("utf-8")
+    byteorder = b"L" if sys.byteorder == "little" else b"B"
+
+    head = bytearray()
+    head += MAGIC
+    head += struct.pack("<I", FORMAT_VERSION)
+    head += byteorder
+    head += struct.pack("<I", len(kind_b)) + kind_b
+    head += struct.pack("<I", len(meta_b)) + meta_b
+    head += struct.pack("<I", len(sections))
+
+    # tabela sekcji ma stały rozmiar na wpis (poza nazwą), więc offsety
+    # danych można policzyć przed zapisem
+    table_size = sum(4 + len(name.encode("ascii")) + 1 + 8 + 8 for name in sections)
+    offset = len(head) + table_size
+    offset += _pad(offset)
+
+    table = bytearray()
+    layout: List[Tuple[int, array]] = []
+    for name, arr in sections.items():
+        name_b = name.encode("ascii")
+        table += struct.pack("<I", len(name_b)) + name_b
+        table += arr.typecode.encode("ascii")
+        table += struct.pack("<QQ", offset, len(arr))
+        layout.append((offset, arr))
+        offset += len(arr) * arr.itemsize
+        offset += _pad(offset)
+
+    with path.open("wb") as f:
+        f.write(head)
+        f.write(table)
+        pos = len(head) + len(table)
+        for data_offset, arr in layout:
+            f.write(b"\0" * (data_offset - pos))
+            arr.tofile(f)
+            pos = data_offset + len(arr) * arr.itemsize
+
+
+class FlatFile:
+    """
+    Otwarty plik FLATTREE.
+    sections: nazwa -> memoryview (rzutowany na typ sekcji), bez kopiowania danych
+    gdy plik otwarto przez mmap.
+    """
+    def __init__(self, kind: str, meta: dict, sections: Dict[str, memoryview], buffer=None):
+        self.kind = kind
+        self.meta = meta
+        self.sections = sections
+        self._buffer = buffer  # trzyma mmap przy życiu
+
+    def close(self) -> None:
+        for mv in self.sections.values():
+            mv.release()
+        self.sections = {}
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+        self._buffer = None
+
+
+def read_flat(path: str | Path, use_mmap: bool = True) -> FlatFile:
+    """Otwiera plik FLATTREE. Przy use_mmap=True sekcje są widokami na mmap."""
+    path = Path(path)
+    with path.open("rb") as f:
+        if use_mmap:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            buf = f.read()
+
+    view = memoryview(buf)
+    if bytes(view[:8]) != MAGIC:
+        raise ValueError(f"Plik {path} nie jest w formacie FLATTREE.")
+
+    pos = 8
+    (version,) = struct.unpack_from("<I", view, pos)
+    pos += 4
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Nieobsługiwana wersja formatu: {version} (oczekiwano {FORMAT_VERSION}).")
+
+    byteorder = bytes(view[pos:pos + 1])
+    pos += 1
+    if byteorder != (b"L" if sys.byteorder == "little" else b"B"):
+        raise ValueError(f"Plik {path} zapisano z inną kolejnością bajtów.")
+
+    (kind_len,) = struct.unpack_from("<I", view, pos)
+    pos += 4
+    kind = bytes(view[pos:pos + kind_len]).decode("ascii")
+    pos += kind_len
+
+    (meta_len,) = struct.unpack_from("<I", view, pos)
+    pos += 4
+    meta = json.loads(bytes(view[pos:pos + meta_len]).decode("utf-8"))
+    pos += meta_len
+
+    (n_sections,) = struct.unpack_from("<I", view, pos)
+    pos += 4
+
+    sections: Dict[str, memoryview] = {}
+    for _ in range(n_sections):
+        (name_len,) = struct.unpack_from("<I", view, pos)
+        pos += 4
+        name = bytes(view[pos:pos + name_len]).decode("ascii")
+        pos += name_len
+        typecode = bytes(view[pos:pos + 1]).decode("ascii")
+        pos += 1
+        offset, count = struct.unpack_from("<QQ", view, pos)
+        pos += 16
+
+        itemsize = array(typecode).itemsize
+        sections[name] = view[offset:offset + count * itemsize].cast(typecode)
+
+    view.release()
+    return FlatFile(kind, meta, sections, buffer=buf)
+
+
+def to_array(typecode: str, values) -> array:
+    """Tablica NumPy (albo sekwencja) -> array.array do sekcji write_flat."""
+    out = array(typecode)
+    out.frombytes(np.ascontiguousarray(values, dtype=np.dtype(typecode)).tobytes())
+    return out
+
+
+def gather_ranges(starts, ends):
+    """Sklejone indeksy z zakresów [start, koniec) (tablice NumPy) - np. kubełki sekcji."""
+    lens = ends - starts
+    total = int(lens.sum())
+    if not total:
+        return np.zeros(0, np.int64)
+    return np.repeat(starts - np.cumsum(lens) + lens, lens) + np.arange(total)
+
+
+# ----------------------------------------------------------------------------
+# QuadTree
+# ----------------------------------------------------------------------------
+
+def flatten_quadtree(root) -> Tuple[dict, Dict[str, array]]:
+    """
+    Spłaszcza QuadTree do tablic (kolejność BFS, dzieci węzła leżą obok siebie):
+    - bounds:  4 * n_nodes (cx, cy, hw, hh)
+    - child:   indeks pierwszego dziecka (NW, NE, SW, SE kolejno) albo -1 dla liścia
+    - pt_start, pt_count: zakres punktów liścia w xs/ys
+    """
+    bounds = array("d")
+    child = array("q")
+    pt_start = array("q")
+    pt_count = array("q")
+    xs = array("d")
+    ys = array("d")
+
+    queue = [root]
+    i = 0
+    while i < len(queue):
+        node = queue[i]
+        i += 1
+
+        b = node.boundary
+        bounds.extend((b.cx, b.cy, b.hw, b.hh))
+
+        if node.divided:
+            child.append(len(queue))
+            queue.extend((node.nw, node.ne, node.sw, node.se))
+            pt_start.append(len(xs))
+            pt_count.append(0)
+        else:
+            child.append(-1)
+            pt_start.append(len(xs))
+            pt_count.append(len(node.points))
+            for p in node.points:
+                xs.append(p.x)
+                ys.append(p.y)
+
+    meta = {
+        "capacity": root.capacity,
+        "max_depth": root.max_depth,
+        "depth": root.depth,
+        "n_nodes": len(queue),
+        "n_points": len(xs),
+    }
+    sections = {
+        "bounds": bounds,
+        "child": child,
+        "pt_start": pt_start,
+        "pt_count": pt_count,
+        "xs": xs,
+        "ys": ys,
+    }
+    return meta, sections
+
+
+def save_quadtree_flat(tree, path: str | Path) -> None:
+    meta, sections = flatten_quadtree(tree)
+    write_flat(path, QUADTREE_KIND, meta, sections)
+
+
+class FlatQuadTree:
+    """
+    QuadTree tylko do odczytu, działający bezpośrednio na tablicach z pliku
+    FLATTREE (bez odtwarzania obiektów węzłów). API zapytań jak w QuadTree.
+    """
+    def __init__(self, flat: FlatFile):
+        if flat.kind != QUADTREE_KIND:
+            raise ValueError(f"Oczekiwano drzewa '{QUADTREE_KIND}', jest '{flat.kind}'.")
+        self._flat = flat
+        self.capacity = flat.meta["capacity"]
+        self.max_depth = flat.meta["max_depth"]
+        self.depth = flat.meta["depth"]
+
+        s = flat.sections
+        self._bounds = s["bounds"]
+        self._child = s["child"]
+        self._pt_start = s["pt_start"]
+        self._pt_count = s["pt_count"]
+        self._xs = s["xs"]
+        self._ys = s["ys"]
+
+    @property
+    def boundary(self) -> Rect:
+        b = self._bounds
+        return Rect(b[0], b[1], b[2], b[3])
+
+    def __len__(self) -> int:
+        return len(self._xs)
+
+    def arrays(self) -> Dict[str, memoryview]:
+        """Sekcje pliku (bounds, child, pt_start, pt_count, xs, ys) - jak z flatten_quadtree."""
+        return self._flat.sections
+
+    def query(self, range_rect: Rect, found: Optional[List[Point]] = None) -> List[Point]:
+        """Jak QuadTree.query - punkty sprawdzamy tylko w liściach."""
+        if found is None:
+            found = []
+
+        left, right = range_rect.left, range_rect.right
+        bottom, top = range_rect.bottom, range_rect.top
+
+        bounds, child = self._bounds, self._child
+        pt_start, pt_count = self._pt_start, self._pt_count
+        xs, ys = self._xs, self._ys
+
+        stack = [0]
+        while stack:
+            i = stack.pop()
+            cx, cy, hw, hh = bounds[4 * i], bounds[4 * i + 1], bounds[4 * i + 2], bounds[4 * i + 3]
+            if (left >= cx + hw or right <= cx - hw or
+                    bottom >= cy + hh or top <= cy - hh):
+                continue
+
+            c = child[i]
+            if c < 0:
+                start = pt_start[i]
+                for j in range(start, start + pt_count[i]):
+                    x, y = xs[j], ys[j]
+                    if left <= x < right and bottom <= y < top:
+                        found.append(Point(x, y))
+            else:
+                # odwrotnie, żeby kolejność wyników była taka jak w QuadTree.query
+                stack.extend((c + 3, c + 2, c + 1, c))
+        return found
+
+    def to_quadtree(self):
+        """Odtwarza pełne drzewo obiektowe QuadTree (np. do wizualizacji)."""
+        from QuadTree.quadtree import QuadTree
+
+        bounds, child = self._bounds, self._child
+        pt_start, pt_count = self._pt_start, self._pt_count
+        xs, ys = self._xs, self._ys
+
+        def make(i: int, depth: int) -> QuadTree:
+            b = Rect(bounds[4 * i], bounds[4 * i + 1], bounds[4 * i + 2], bounds[4 * i + 3])
+            return QuadTree(b, self.capacity, self.max_depth, depth)
+
+        root = make(0, self.depth)
+        order = []
+        stack = [(0, root)]
+        while stack:
+            i, node = stack.pop()
+            order.append(node)
+            c = child[i]
+            if c < 0:
+                start = pt_start[i]
+                node.points = [Point(xs[j], ys[j]) for j in range(start, start + pt_count[i])]
+                node.size = pt_count[i]
+                continue
+            node.divided = True
+            node.nw = make(c, node.depth + 1)
+            node.ne = make(c + 1, node.depth + 1)
+            node.sw = make(c + 2, node.depth + 1)
+            node.se = make(c + 3, node.depth + 1)
+            stack.extend(((c, node.nw), (c + 1, node.ne), (c + 2, node.sw), (c + 3, node.se)))
+        # liczności poddrzew: rodzic jest w order przed dziećmi
+        for node in reversed(order):
+            if node.divided:
+                node.size = node.nw.size + node.ne.size + node.sw.size + node.se.size
+        return root
+
+    def close(self) -> None:
+        self._flat.close()
+
+
+def load_quadtree_flat(path: str | Path, use_mmap: bool = True) -> FlatQuadTree:
+    return FlatQuadTree(read_flat(path, use_mmap=use_mmap))
+
+
+# ----------------------------------------------------------------------------
+# KDTree
+# ----------------------------------------------------------------------------
+
+def flatten_kdtree(tree) -> Tuple[dict, Dict[str, array]]:
+    """
+    KDTree budowany przez medianę ma kształt wyznaczony przez liczbę punktów:
+    poddrzewo zakresu [lo, hi) ma korzeń w lo + (hi - lo) // 2.
+    Wystarczy więc zapisać punkty w kolejności in-order - bez wskaźników.
+    """
+    xs = array("d")
+    ys = array("d")
+
+    # in-order iteracyjnie; przy okazji sprawdzamy, czy kształt drzewa
+    # zgadza się z układem medianowym (inaczej odtworzenie byłoby błędne)
+    stack = []
+    node = tree.root
+    while stack or node is not None:
+        while node is not None:
+            stack.append(node)
+            node = node.left
+        node = stack.pop()
+        xs.append(node.point.x)
+        ys.append(node.point.y)
+        node = node.right
+
+    n = len(xs)
+    _check_median_shape(tree.root, n)
+
+    meta = {"n_points": n}
+    return meta, {"xs": xs, "ys": ys}
+
+
+def _check_median_shape(root, n: int) -> None:
+    stack = [(root, 0, n)]
+    while stack:
+        node, lo, hi = stack.pop()
+        if node is None:
+            if lo != hi:
+                raise ValueError("KDTree nie ma kształtu medianowego - nie da się go spłaszczyć.")
+            continue
+        if lo >= hi:
+            raise ValueError("KDTree nie ma kształtu medianowego - nie da się go spłaszczyć.")
+        mid = lo + (hi - lo) // 2
+        stack.append((node.left, lo, mid))
+        stack.append((node.right, mid + 1, hi))
+
+
+def save_kdtree_flat(tree, path: str | Path) -> None:
+    meta, sections = flatten_kdtree(tree)
+    write_flat(path, KDTREE_KIND, meta, sections)
+
+
+class FlatKDTree:
+    """
+    KDTree tylko do odczytu na tablicy punktów w kolejności in-order.
+    Węzeł zakresu [lo, hi) to punkt o indeksie lo + (hi - lo) // 2.
+    """
+    def __init__(self, flat: FlatFile):
+        if flat.kind != KDTREE_KIND:
+            raise ValueError(f"Oczekiwano drzewa '{KDTREE_KIND}', jest '{flat.kind}'.")
+        self._flat = flat
+        self._xs = flat.sections["xs"]
+        self._ys = flat.sections["ys"]
+
+    def __len__(self) -> int:
+        return len(self._xs)
+
+    def query_range(self, range_rect: Rect) -> List[Point]:
+        """Jak KDTree.query_range."""
+        result: List[Point] = []
+        left, right = range_rect.left, range_rect.right
+        bottom, top = range_rect.bottom, range_rect.top
+        xs, ys = self._xs, self._ys
+
+        stack = [(0, len(xs), 0)]
+        while stack:
+            lo, hi, depth = stack.pop()
+            if lo >= hi:
+                continue
+            mid = lo + (hi - lo) // 2
+            x, y = xs[mid], ys[mid]
+
+            if left <= x < right and bottom <= y < top:
+                result.append(Point(x, y))
+
+            if depth % 2 == 0:
+                val, low, high = x, left, right
+            else:
+                val, low, high = y, bottom, top
+
+            # prawe na stos najpierw, żeby kolejność była jak w KDTree._search
+            if high >= val:
+                stack.append((mid + 1, hi, depth + 1))
+            if low <= val:
+                stack.append((lo, mid, depth + 1))
+        return result
+
+    query = query_range
+
+    def to_kdtree(self):
+        """Odtwarza obiektowe KDTree (bez ponownego sortowania)."""
+        from KDTree.kdtree import KDTree, KDNode
+
+        xs, ys = self._xs, self._ys
+
+        def make(lo: int, hi: int):
+            if lo >= hi:
+                return None
+            mid = lo + (hi - lo) // 2
+            return KDNode(Point(xs[mid], ys[mid]), make(lo, mid), make(mid + 1, hi))
+
+        tree = KDTree.__new__(KDTree)
+        tree.root = make(0, len(xs))
+        return tree
+
+    def close(self) -> None:
+        self._flat.close()
+
+
+def load_kdtree_flat(path: str | Path, use_mmap: bool = True) -> FlatKDTree:
+    return FlatKDTree(read_flat(path, use_mmap=use_mmap))
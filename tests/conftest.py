@@ -0,0 +1,61 @@
+import random
+import sys
+from collections import Counter
+from pathlib import Path
+
+import pytest
+
+# importy absolutne od korzenia repo (QuadTree.quadtree, points_util...), także przy gołym `pytest`
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from points_util.points_classes import Point, Rect  # noqa: E402
+
+
+def _datasets():
+    rng = random.Random(1)
+    return {
+        "random": [Point(rng.uniform(0, 100), rng.uniform(0, 100)) for _ in range(300)],
+        # duplikaty: połowa zbioru w jednym punkcie
+        "duplicates": [Point(5.0, 5.0)] * 40 + [Point(rng.uniform(0, 10), rng.uniform(0, 10)) for _ in range(40)],
+        # współliniowe: prostokąt graniczny o zerowej wysokości / szerokości
+        "collinear_x": [Point(float(i), 3.0) for i in range(60)],
+        "collinear_y": [Point(2.0, i * 0.5) for i in range(60)],
+        "one_point": [Point(1.0, 2.0)],
+        "two_points": [Point(0.0, 0.0), Point(1.0, 1.0)],
+        # siatka: współrzędne dokładnie na liniach podziału
+        "grid": [Point(float(x), float(y)) for x in range(15) for y in range(15)],
+    }
+
+
+DATASETS = _datasets()
+
+
+@pytest.fixture(params=sorted(DATASETS))
+def points(request):
+    return DATASETS[request.param]
+
+
+@pytest.fixture
+def rects(points):
+    """Prostokąty zapytań: cały zbiór, losowe (także puste i poza zbiorem) i z brzegiem na punktach."""
+    xs = [p.x for p in points]
+    ys = [p.y for p in points]
+    x0, x1, y0, y1 = min(xs), max(xs), min(ys), max(ys)
+    rng = random.Random(2)
+    out = [Rect((x0 + x1) / 2, (y0 + y1) / 2, (x1 - x0) / 2 + 1, (y1 - y0) / 2 + 1)]
+    for _ in range(30):
+        out.append(Rect(rng.uniform(x0 - 1, x1 + 1), rng.uniform(y0 - 1, y1 + 1),
+                        rng.uniform(0, (x1 - x0) / 2 + 1), rng.uniform(0, (y1 - y0) / 2 + 1)))
+    for p in points[:10]:
+        out.append(Rect(p.x, p.y, 1.0, 1.0))
+        out.append(Rect(p.x + 0.5, p.y + 0.5, 0.5, 0.5))  # lewy / dolny brzeg na punkcie
+    return out
+
+
+def brute(points, rect) -> Counter:
+    """Wynik zapytania jako multizbiór (x, y) - duplikaty liczą się osobno."""
+    return Counter((p.x, p.y) for p in points if rect.contains_point(p))
+
+
+def as_counter(found) -> Counter:
+    return Counter((p.x, p.y) for p in found)
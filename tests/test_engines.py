@@ -0,0 +1,39 @@
+"""
+Każdy zarejestrowany silnik (points_util.engines) kontra skan wszystkich punktów:
+query i count w prostokącie półotwartym, nearest po odległościach (przy remisach
+kolejność punktów jest dowolna).
+"""
+import pytest
+
+from conftest import as_counter, brute
+from points_util.engines import ENGINES, build_from_points
+
+# małe capacity/max_depth - dużo podziałów także na małych zbiorach
+CAPACITY, MAX_DEPTH = 4, 8
+
+
+@pytest.fixture(params=sorted(ENGINES))
+def engine(request):
+    return request.param
+
+
+def test_query_matches_brute_force(engine, points, rects):
+    index = build_from_points(engine, points, capacity=CAPACITY, max_depth=MAX_DEPTH)
+    for rect in rects:
+        assert as_counter(index.query(rect)) == brute(points, rect), rect
+
+
+def test_count_matches_brute_force(engine, points, rects):
+    index = build_from_points(engine, points, capacity=CAPACITY, max_depth=MAX_DEPTH)
+    for rect in rects:
+        assert index.count(rect) == sum(brute(points, rect).values()), rect
+
+
+@pytest.mark.parametrize("k", [1, 3, 10**6])
+def test_nearest_matches_brute_force(engine, points, k):
+    index = build_from_points(engine, points, capacity=CAPACITY, max_depth=MAX_DEPTH)
+    for x, y in [(points[0].x, points[0].y), (50.3, 49.7), (-3.0, 7.0)]:
+        found = index.nearest(x, y, k)
+        expected = sorted((p.x - x) ** 2 + (p.y - y) ** 2 for p in points)[:k]
+        assert [(p.x - x) ** 2 + (p.y - y) ** 2 for p in found] == expected
+        assert not as_counter(found) - as_counter(points)
@@ -0,0 +1,48 @@
+"""
+Remisy z wartością podziału KDTree: mediana trafia do węzła, a punkty z tą samą
+współrzędną także do lewego poddrzewa - zapytanie z brzegiem dokładnie na tej
+współrzędnej musi więc zejść w lewo.
+"""
+from conftest import as_counter, brute
+from KDTree.kdtree import KDTree
+from points_util.points_classes import Point, Rect
+from points_util.query_stats import QueryStats
+from points_util.tree_format import save_kdtree_flat, load_kdtree_flat
+
+# korzeń dzieli po x = 1: (1, 0) jest w lewym poddrzewie, (1, 1) w korzeniu, (1, 2) w prawym
+POINTS = [Point(1.0, 0.0), Point(1.0, 1.0), Point(1.0, 2.0), Point(0.0, 0.0), Point(2.0, 0.0)]
+# lewy brzeg dokładnie na x = 1
+RECT = Rect(cx=1.5, cy=1.0, hw=0.5, hh=1.5)
+
+
+def test_query_on_split_coordinate():
+    tree = KDTree(list(POINTS))
+    assert tree.root.point == Point(1.0, 1.0)
+    assert as_counter(tree.query_range(RECT)) == brute(POINTS, RECT)
+
+
+def test_traced_query_on_split_coordinate():
+    tree = KDTree(list(POINTS))
+    stats = QueryStats()
+    found = tree.query_range(RECT, tracer=stats)
+    assert as_counter(found) == brute(POINTS, RECT)
+    assert stats.points_tested >= len(found)
+
+
+def test_flat_query_on_split_coordinate(tmp_path):
+    save_kdtree_flat(KDTree(list(POINTS)), tmp_path / "t.kdf")
+    flat = load_kdtree_flat(tmp_path / "t.kdf")
+    try:
+        assert as_counter(flat.query_range(RECT)) == brute(POINTS, RECT)
+    finally:
+        flat.close()
+
+
+def test_grid_ties_match_brute_force():
+    # siatka: wiele punktów z tą samą współrzędną na każdej osi
+    points = [Point(float(i), float(j)) for i in range(7) for j in range(7)]
+    tree = KDTree(list(points))
+    for left in range(7):
+        for bottom in range(7):
+            rect = Rect(cx=left + 1.5, cy=bottom + 1.5, hw=1.5, hh=1.5)
+            assert as_counter(tree.query_range(rect)) == brute(points, rect)
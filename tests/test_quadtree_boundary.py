@@ -0,0 +1,33 @@
+"""
+Punkty leżące dokładnie na linii podziału QuadTree: granice dzieci są liczone
+z zaokrągleniem (środek +/- połowa), więc o dziecku decyduje linia (cx, cy) -
+inaczej punkt nie trafiał do żadnego półotwartego dziecka i znikał z drzewa.
+"""
+from conftest import as_counter, brute
+from QuadTree.quadtree import QuadTree, bounding_rect_pairwise
+from points_util.points_classes import Point
+
+
+def build(points):
+    tree = QuadTree(bounding_rect_pairwise(points), capacity=4, max_depth=8)
+    assert all(tree.insert(p) for p in points)
+    return tree
+
+
+def test_collinear_points_are_kept():
+    # zerowa wysokość prostokąta granicznego: każdy podział po y przechodzi przez punkty
+    points = [Point(float(i), 3.0) for i in range(60)]
+    assert as_counter(build(points).query(bounding_rect_pairwise(points))) == as_counter(points)
+
+
+def test_grid_points_are_kept():
+    # w tym zbiorze linie podziału wypadają na współrzędnych punktów
+    points = [Point(float(x), float(y)) for x in range(15) for y in range(15)]
+    tree = build(points)
+    assert as_counter(tree.query(bounding_rect_pairwise(points))) == as_counter(points)
+
+
+def test_query_matches_brute_force(points, rects):
+    tree = build(points)
+    for rect in rects:
+        assert as_counter(tree.query(rect)) == brute(points, rect), rect
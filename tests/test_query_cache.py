@@ -0,0 +1,157 @@
+"""
+QueryResultCache przed QuadTree: trafienia po dokładnym prostokącie, odpowiedź
+z zapamiętanego prostokąta zawierającego zapytanie, unieważnianie po insert()
+tylko wpisów, których prostokąt zawiera nowy punkt, kolejność LRU i metryki.
+"""
+import pytest
+
+from conftest import DATASETS, as_counter, brute
+from QuadTree.quadtree import QuadTree
+from points_util.points_classes import Point, Rect
+from points_util.query_cache import QueryResultCache
+
+BIG = Rect(40.0, 40.0, 30.0, 30.0)
+SMALL = Rect(40.0, 40.0, 10.0, 10.0)  # w środku BIG
+OTHER = Rect(85.0, 85.0, 10.0, 10.0)  # rozłączny z BIG
+
+
+@pytest.fixture
+def points():
+    return list(DATASETS["random"])
+
+
+@pytest.fixture
+def tree(points):
+    # stały boundary - insert() punktów spoza prostokąta granicznego zbioru też przechodzi
+    tree = QuadTree(Rect(50.0, 50.0, 50.0, 50.0), capacity=4, max_depth=8)
+    for p in points:
+        tree.insert(p)
+    # licznik zapytań do drzewa (cache bierze index.query przy konstrukcji)
+    tree.calls = 0
+    query = tree.query
+
+    def counted(rect, *args, **kwargs):
+        tree.calls += 1
+        return query(rect, *args, **kwargs)
+
+    tree.query = counted
+    return tree
+
+
+def test_exact_rect_hit_skips_the_index(tree, points):
+    cache = QueryResultCache(tree)
+    first = cache.query(SMALL)
+    second = cache.query(SMALL)
+    assert tree.calls == 1
+    assert as_counter(second) == as_counter(first) == brute(points, SMALL)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_result_is_a_copy(tree):
+    cache = QueryResultCache(tree)
+    cache.query(SMALL).clear()
+    assert cache.query(SMALL)
+
+
+def test_enclosing_rect_answers_by_filtering(tree, points):
+    cache = QueryResultCache(tree, allow_enclosing=True)
+    cache.query(BIG)
+    found = cache.query(SMALL)
+    assert tree.calls == 1
+    assert as_counter(found) == brute(points, SMALL)
+    assert cache.enclosing_hits == 1
+    # wynik z filtrowania jest zapamiętany pod własnym prostokątem
+    cache.query(SMALL)
+    assert (tree.calls, cache.hits) == (1, 1)
+
+
+def test_enclosing_lookup_is_opt_in(tree):
+    cache = QueryResultCache(tree)
+    cache.query(BIG)
+    cache.query(SMALL)
+    assert tree.calls == 2
+    assert cache.enclosing_hits == 0
+
+
+def test_insert_inside_invalidates_only_containing_entries(tree, points):
+    cache = QueryResultCache(tree)
+    cache.query(BIG)
+    cache.query(OTHER)
+    p = Point(41.25, 39.5)
+    assert tree.insert(p)
+    assert len(cache) == 1
+    assert cache.invalidations == 1
+
+    # OTHER nie zawiera p - nadal trafienie
+    cache.query(OTHER)
+    assert (tree.calls, cache.hits) == (2, 1)
+    # BIG idzie do drzewa i widzi nowy punkt
+    assert as_counter(cache.query(BIG)) == brute(points + [p], BIG)
+    assert tree.calls == 3
+
+
+def test_insert_outside_keeps_entries(tree, points):
+    cache = QueryResultCache(tree)
+    cache.query(BIG)
+    assert tree.insert(Point(99.0, 1.0))
+    assert cache.invalidations == 0
+    assert as_counter(cache.query(BIG)) == brute(points, BIG)
+    assert tree.calls == 1
+
+
+def test_enclosing_lookup_after_insert(tree, points):
+    cache = QueryResultCache(tree, allow_enclosing=True)
+    cache.query(BIG)
+    # punkt w SMALL (więc i w BIG): BIG znika, SMALL musi pójść do drzewa
+    p = Point(40.5, 40.5)
+    assert tree.insert(p)
+    found = cache.query(SMALL)
+    assert p in found
+    assert as_counter(found) == brute(points + [p], SMALL)
+    assert (tree.calls, cache.enclosing_hits) == (2, 0)
+
+    # punkt poza BIG: wpis zostaje i dalej odpowiada na zapytania w środku
+    cache.query(BIG)
+    q = Point(95.0, 5.0)
+    assert tree.insert(q)
+    inner = Rect(35.0, 45.0, 4.0, 4.0)
+    assert as_counter(cache.query(inner)) == brute(points + [p, q], inner)
+    assert (tree.calls, cache.enclosing_hits) == (3, 1)
+
+
+def test_lru_evicts_least_recently_used(tree):
+    cache = QueryResultCache(tree, maxsize=2)
+    cache.query(BIG)
+    cache.query(OTHER)
+    cache.query(BIG)  # BIG staje się najświeższy
+    cache.query(SMALL)  # przekracza maxsize - wypada OTHER
+    assert cache.evictions == 1
+    assert len(cache) == 2
+    calls = tree.calls
+    cache.query(BIG)
+    cache.query(SMALL)
+    assert tree.calls == calls
+    cache.query(OTHER)
+    assert tree.calls == calls + 1
+
+
+def test_metrics(tree):
+    cache = QueryResultCache(tree, allow_enclosing=True)
+    cache.query(BIG)
+    cache.query(BIG)
+    cache.query(SMALL)
+    cache.query(OTHER)
+    m = cache.metrics()
+    assert (m["lookups"], m["hits"], m["enclosing_hits"], m["misses"]) == (4, 1, 1, 2)
+    assert m["hit_rate"] == pytest.approx(0.5)
+    assert m["entries"] == 3
+    assert m["avg_hit_s"] > 0 and m["avg_enclosing_hit_s"] > 0 and m["avg_miss_s"] > 0
+
+
+def test_detach_stops_invalidation(tree):
+    cache = QueryResultCache(tree)
+    cache.detach()
+    cache.query(BIG)
+    assert tree.insert(Point(40.5, 40.5))
+    assert cache.invalidations == 0
+    assert len(cache) == 1
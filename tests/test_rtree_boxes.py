@@ -0,0 +1,86 @@
+"""
+RTree.from_boxes: wpisy-prostokąty przez query_indices, count i nearest_indices
+kontra skan wszystkich prostokątów - trafienie to przecięcie z zapytaniem
+półotwartym (także prostokąt zawierający zapytanie, którego róg leży poza nim),
+kNN po odległości do prostokąta. Ten sam wynik po zapisie i odczycie FLATTREE.
+"""
+import random
+
+import numpy as np
+import pytest
+
+from RTree.rtree import RTree
+from points_util.points_classes import Rect
+
+
+def _boxes():
+    rng = random.Random(3)
+    out = [(0.0, 0.0, 10.0, 10.0), (20.0, 20.0, 30.0, 30.0), (5.0, 5.0, 25.0, 6.0), (40.0, 40.0, 40.0, 40.0)]
+    for _ in range(200):
+        x, y = rng.uniform(0, 100), rng.uniform(0, 100)
+        out.append((x, y, x + rng.uniform(0, 8), y + rng.uniform(0, 8)))
+    return out
+
+
+BOXES = _boxes()
+
+
+def brute_boxes(r: Rect) -> set:
+    return {i for i, (x0, y0, x1, y1) in enumerate(BOXES)
+            if x0 < r.right and x1 >= r.left and y0 < r.top and y1 >= r.bottom}
+
+
+def box_dist2(x, y, box):
+    x0, y0, x1, y1 = box
+    dx = max(x0 - x, 0.0, x - x1)
+    dy = max(y0 - y, 0.0, y - y1)
+    return dx * dx + dy * dy
+
+
+def rects():
+    rng = random.Random(4)
+    out = [Rect(5.0, 5.0, 1.0, 1.0),  # w środku pierwszego prostokąta, bez jego rogu
+           Rect(50.0, 50.0, 60.0, 60.0),
+           Rect(40.0, 40.0, 0.5, 0.5)]  # prostokąt zdegenerowany do punktu
+    for _ in range(40):
+        out.append(Rect(rng.uniform(0, 100), rng.uniform(0, 100), rng.uniform(0, 15), rng.uniform(0, 15)))
+    return out
+
+
+@pytest.fixture(params=["memory", "flat"])
+def tree(request, tmp_path):
+    cols = [np.array(c) for c in zip(*BOXES)]
+    tree = RTree.from_boxes(*cols, fanout=4)
+    if request.param == "flat":
+        tree.save(tmp_path / "t.flat")
+        tree = RTree.load(tmp_path / "t.flat")
+    yield tree
+    tree.close()
+
+
+def test_box_containing_the_query_is_hit(tree):
+    # róg (0, 0) leży poza zapytaniem, prostokąt [0, 10] x [0, 10] je zawiera
+    r = Rect(5.0, 5.0, 1.0, 1.0)
+    assert r.left > BOXES[0][0] and r.bottom > BOXES[0][1]
+    assert 0 in tree.query_indices(r).tolist()
+    assert 2 in tree.query_indices(r).tolist()
+
+
+def test_query_indices_and_count_match_brute_force(tree):
+    for r in rects():
+        expected = brute_boxes(r)
+        found = tree.query_indices(r).tolist()
+        assert len(found) == len(set(found))
+        assert set(found) == expected, r
+        assert tree.count(r) == len(expected), r
+        # query zwraca lewe dolne rogi tych samych wpisów
+        assert sorted((p.x, p.y) for p in tree.query(r)) == sorted(BOXES[i][:2] for i in expected), r
+
+
+@pytest.mark.parametrize("k", [1, 5, 10**6])
+def test_nearest_indices_use_box_distance(tree, k):
+    for x, y in [(5.0, 5.0), (15.0, 15.0), (-3.0, 7.0), (120.0, 50.0)]:
+        found = tree.nearest_indices(x, y, k).tolist()
+        expected = sorted(box_dist2(x, y, b) for b in BOXES)[:k]
+        assert [box_dist2(x, y, BOXES[i]) for i in found] == pytest.approx(expected)
+        assert len(found) == len(set(found))
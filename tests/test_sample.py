@@ -0,0 +1,59 @@
+"""
+sample(rect, k, seed) w QuadTree i KDTree: min(k, liczba trafień) różnych punktów
+z wyniku query (duplikaty współrzędnych to osobne punkty), ten sam wynik dla tego
+samego seeda - także na drzewie odtworzonym z FLATTREE (liczności poddrzew z pliku).
+"""
+import pytest
+
+from conftest import as_counter, brute
+from KDTree.kdtree import KDTree
+from QuadTree.quadtree import QuadTree
+from points_util.tree_format import load_kdtree_flat, load_quadtree_flat
+
+
+def build_quadtree(points, tmp_path):
+    return QuadTree.from_points(points, capacity=4, max_depth=8)
+
+
+def build_kdtree(points, tmp_path):
+    return KDTree.from_points(points)
+
+
+def load_quadtree(points, tmp_path):
+    build_quadtree(points, tmp_path).save(tmp_path / "t.qtf")
+    flat = load_quadtree_flat(tmp_path / "t.qtf")
+    try:
+        return flat.to_quadtree()
+    finally:
+        flat.close()
+
+
+def load_kdtree(points, tmp_path):
+    build_kdtree(points, tmp_path).save(tmp_path / "t.kdf")
+    flat = load_kdtree_flat(tmp_path / "t.kdf")
+    try:
+        return flat.to_kdtree()
+    finally:
+        flat.close()
+
+
+@pytest.fixture(params=[build_quadtree, build_kdtree, load_quadtree, load_kdtree],
+                ids=lambda f: f.__name__)
+def tree(request, points, tmp_path):
+    return request.param(points, tmp_path)
+
+
+@pytest.mark.parametrize("k", [1, 5, 10**6])
+def test_sample_is_subset_of_query(tree, points, rects, k):
+    for rect in rects:
+        expected = brute(points, rect)
+        found = tree.sample(rect, k, seed=7)
+        assert len(found) == min(k, sum(expected.values())), rect
+        assert not as_counter(found) - expected, rect
+        if k >= sum(expected.values()):
+            assert as_counter(found) == expected, rect
+
+
+def test_sample_is_deterministic_per_seed(tree, rects):
+    for rect in rects:
+        assert tree.sample(rect, 5, seed=3) == tree.sample(rect, 5, seed=3)
@@ -0,0 +1,79 @@
+"""
+Zapis -> odczyt FLATTREE dla każdego serializera z TreeCache (SERIALIZERS):
+drzewo odczytane z pliku (widoki na mmap) i zmaterializowane w pamięci
+odpowiada na zapytania tak samo jak skan punktów.
+"""
+import pytest
+
+from conftest import DATASETS, as_counter, brute
+from points_util.engines import ENGINES, build_from_points
+from points_util.tree_cache import ENGINE_VERSIONS, SERIALIZERS, TreeCache, engine_version
+
+
+@pytest.fixture(params=sorted(SERIALIZERS))
+def engine(request):
+    return request.param
+
+
+def test_save_load_round_trip(engine, points, rects, tmp_path):
+    save, load = SERIALIZERS[engine]
+    save(build_from_points(engine, points, capacity=4, max_depth=8), tmp_path / "t.flat")
+    loaded = load(tmp_path / "t.flat")
+    tree = ENGINES[engine]["materialize"](loaded)
+    try:
+        assert len(loaded) == len(points)
+        for rect in rects:
+            expected = brute(points, rect)
+            assert as_counter(loaded.query(rect)) == expected, rect
+            assert as_counter(tree.query(rect)) == expected, rect
+    finally:
+        if tree is not loaded and hasattr(tree, "close"):
+            tree.close()
+        loaded.close()
+
+
+def test_class_save_load_round_trip(engine, points, rects, tmp_path):
+    cls = ENGINES[engine]["cls"]
+    build_from_points(engine, points, capacity=4, max_depth=8).save(tmp_path / "t.flat")
+    tree = cls.load(tmp_path / "t.flat")
+    try:
+        for rect in rects:
+            assert as_counter(tree.query(rect)) == brute(points, rect), rect
+    finally:
+        if hasattr(tree, "close"):
+            tree.close()
+
+
+def test_cache_hit_returns_same_tree(engine, points, rects, tmp_path):
+    cache = TreeCache(tmp_path)
+    params = ENGINES[engine]["params"](4, 8)
+
+    def build(pts):
+        return build_from_points(engine, pts, capacity=4, max_depth=8)
+
+    _, hit = cache.get_or_build(engine, points, params, build)
+    assert not hit
+    loaded, hit = cache.get_or_build(engine, points, params, build)
+    assert hit
+    try:
+        for rect in rects:
+            assert as_counter(loaded.query(rect)) == brute(points, rect), rect
+    finally:
+        loaded.close()
+
+
+def test_engine_version_bump_misses_cache(engine, tmp_path, monkeypatch):
+    # drzewo zbudowane starszą wersją silnika nie może trafić
+    cache = TreeCache(tmp_path)
+    points = DATASETS["random"]
+    params = ENGINES[engine]["params"](4, 8)
+
+    def build(pts):
+        return build_from_points(engine, pts, capacity=4, max_depth=8)
+
+    _, hit = cache.get_or_build(engine, points, params, build)
+    assert not hit
+    monkeypatch.setitem(ENGINE_VERSIONS, engine, engine_version(engine) + 1)
+    _, hit = cache.get_or_build(engine, points, params, build)
+    assert not hit
+    assert len(list(tmp_path.glob(f"{engine}-*.flat"))) == 2
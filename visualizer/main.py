@@ -4,6 +4,9 @@ from .figures.circle import Circle
 from .figures.polygon import Polygon
 from .figures.line import Line
 from .figures.half_line import HalfLine
+from .figures.image import Image, density_raster
+import numpy as np
+from matplotlib.colors import LogNorm
 from .plot.plot import Plot
 
 
@@ -51,6 +54,18 @@ class Visualizer:
         self.data.append(semi_line)
         return semi_line
 
+    def add_image(self, data, **kwargs):
+        image = Image(data, kwargs)
+        self.data.append(image)
+        return image
+
+    def add_density(self, xs, ys, bins=512, extent=None, **kwargs):
+        counts, extent = density_raster(xs, ys, bins=bins, extent=extent)
+        if not counts.any():
+            return None
+        options = {'cmap': 'Blues', 'norm': LogNorm(vmin=1, vmax=counts.max()), 'zorder': 0, **kwargs}
+        return self.add_image(np.ma.masked_equal(counts, 0), extent=extent, **options)
+
     def remove_figure(self, figure):
         figure.to_be_removed = True
         self.data.append(figure)
@@ -69,5 +84,31 @@ class Visualizer:
         gif = Plot.show_gif(self.plot_data, self.data, interval)
         return gif
 
-    def save_gif(self, filename='animation', interval=256):
+    def save_gif(self, filename='animation', interval=256, max_frames=None, stream=False):
+        if stream or max_frames is not None:
+            return Plot.save_gif_stream(self.plot_data, self.data, interval, filename, max_frames)
         Plot.save_gif(self.plot_data, self.data, interval, filename)
+
+
+def add_points_layer(vis: Visualizer, points, point_mode="sample", sample_points=5000, extent=None,
+                     density_bins=512):
+    """
+    Warstwa punktów pod drzewem:
+    - "sample": co k-ty punkt (k = len // sample_points) jako scatter,
+    - "density": wszystkie punkty zliczone w siatce density_bins x density_bins
+      (NumPy bincount) i narysowane jako obraz - wierne dla danych skupionych.
+    extent: (left, right, bottom, top) siatki gęstości.
+    """
+    if point_mode == "density":
+        xs = np.fromiter((p.x for p in points), dtype=np.float64, count=len(points))
+        ys = np.fromiter((p.y for p in points), dtype=np.float64, count=len(points))
+        return vis.add_density(xs, ys, bins=density_bins, extent=extent)
+    if point_mode != "sample":
+        raise ValueError(f"Nieznany point_mode: {point_mode} (sample|density)")
+
+    if sample_points is not None and len(points) > sample_points:
+        step = max(1, len(points) // sample_points)
+        pts_vis = points[::step]
+    else:
+        pts_vis = points
+    return vis.add_point([(p.x, p.y) for p in pts_vis], color="blue", s=8, alpha=0.6)
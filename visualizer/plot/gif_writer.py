@@ -0,0 +1,44 @@
+import io
+
+import matplotlib.animation as animation
+from PIL import Image, GifImagePlugin
+
+
+class StreamingGifWriter(animation.AbstractMovieWriter):
+    """
+    Writer GIF, który koduje i zapisuje każdą klatkę od razu w grab_frame
+    (nagłówek z pierwszej klatki, potem ramki z lokalną paletą), zamiast
+    trzymać wszystkie klatki do końca jak PillowWriter.
+    Działa też jako writer dla Animation.save(writer=StreamingGifWriter(fps)).
+    """
+    def __init__(self, fps=5, metadata=None, codec=None, bitrate=None, loop=0):
+        super().__init__(fps=fps, metadata=metadata, codec=codec, bitrate=bitrate)
+        self.loop = loop
+        self.frames = 0
+        self._fp = None
+
+    def setup(self, fig, outfile, dpi=None):
+        super().setup(fig, outfile, dpi=dpi)
+        self._fp = open(outfile, 'wb')
+        self.frames = 0
+
+    def grab_frame(self, **savefig_kwargs):
+        buf = io.BytesIO()
+        self.fig.savefig(buf, **{**savefig_kwargs, 'format': 'rgba', 'dpi': self.dpi})
+        im = Image.frombuffer('RGBA', self.frame_size, buf.getbuffer(), 'raw', 'RGBA', 0, 1)
+        self.write_image(im)
+
+    def write_image(self, im):
+        im = im.convert('RGB').convert('P', palette=Image.Palette.ADAPTIVE)
+        if self.frames == 0:
+            header, _ = GifImagePlugin.getheader(im, info={'loop': self.loop})
+            for chunk in header:
+                self._fp.write(chunk)
+        for chunk in GifImagePlugin.getdata(im, duration=int(1000 / self.fps), include_color_table=True):
+            self._fp.write(chunk)
+        self.frames += 1
+
+    def finish(self):
+        self._fp.write(b';')
+        self._fp.close()
+        self._fp = None
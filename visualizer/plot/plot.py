@@ -1,8 +1,45 @@
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 from IPython.display import Image
+import math
 import os
 
+from .gif_writer import StreamingGifWriter
+
+
+class _DeltaFrames:
+    """
+    Odtwarzanie klatek z różnic: klatka k = klatka k-1 + dodane - usunięte
+    (set_visible). Koszt klatki jest proporcjonalny do jej zmian, a nie do
+    liczby wszystkich narysowanych figur. Skok wstecz (np. pętla animacji
+    w show_gif) - reset i odtworzenie od początku.
+    """
+    def __init__(self, deltas):
+        self.deltas = deltas
+        self.current = 0
+
+    def reset(self):
+        for added, _ in self.deltas:
+            for a in added:
+                a.set_visible(False)
+        self.current = 0
+        return [a for added, _ in self.deltas for a in added]
+
+    def __call__(self, k):
+        changed = []
+        if k < self.current:
+            changed = self.reset()
+        while self.current < k:
+            self.current += 1
+            added, removed = self.deltas[self.current]
+            for a in removed:
+                a.set_visible(False)
+            for a in added:
+                a.set_visible(True)
+            changed.extend(removed)
+            changed.extend(added)
+        return changed
+
 
 class Plot:
     @staticmethod
@@ -30,33 +67,37 @@ class Plot:
     @staticmethod
     def __build_gif(plot_data, data, interval):
         fig, ax = plt.subplots()
-        artists = []
-        frames = [ax.set_xlabel('x'), ax.set_ylabel('y')]
-        artists.append(frames[:])
+        ax.set_xlabel('x')
+        ax.set_ylabel('y')
 
         if 'title' in plot_data:
             ax.set_title(plot_data['title'])
         if 'grid' in plot_data:
             ax.grid()
 
+        # klatka 0 to pusty wykres, każda figura z data to jedna klatka;
+        # zamiast pełnej listy widocznych artystów na klatkę trzymamy tylko
+        # różnicę względem poprzedniej (dodane, usunięte)
+        deltas = [((), ())]
         for figure in data:
             if figure.to_be_removed and figure.artist:
-                first = frames.index(figure.artist[0])
-                last = frames.index(figure.artist[-1])
+                deltas.append(((), figure.artist))
                 figure.artist = None
-                frames = frames[:first] + frames[last+1:]
             else:
                 artist = figure.draw(ax)
+                for a in artist:
+                    a.set_visible(False)
                 figure.artist = artist
-                frames.extend(artist)
-            artists.append(frames[:])
-                
+                deltas.append((artist, ()))
+
         if 'axis_equal' in plot_data:
             ax.axis('equal')
         else:
             ax.autoscale()
-            
-        return animation.ArtistAnimation(fig=fig, artists=artists, interval=interval, blit=True)
+
+        frames = _DeltaFrames(deltas)
+        return animation.FuncAnimation(fig=fig, func=frames, frames=len(deltas), init_func=frames.reset,
+                                       interval=interval, blit=True)
 
     @staticmethod
     def show(plot_data, data):
@@ -78,6 +119,58 @@ class Plot:
         os.remove(f'{__file__}.__tmp_animation_holder__.gif')
         return gif
 
+    @staticmethod
+    def save_gif_stream(plot_data, data, interval, filename, max_frames=None):
+        """
+        GIF bez budowania animacji: figury są rysowane po kolei, każda klatka
+        od razu renderowana i zapisywana (StreamingGifWriter), a usunięte
+        figury znikają z osi (artist.remove()) - w pamięci są tylko widoczne.
+        max_frames: łączy kolejne zdarzenia (dodanie/usunięcie figury) po
+        ceil(zdarzenia / max_frames) w jedną klatkę.
+        Zwraca liczbę zapisanych klatek.
+        """
+        fig, ax = plt.subplots()
+        ax.set_xlabel('x')
+        ax.set_ylabel('y')
+
+        if 'title' in plot_data:
+            ax.set_title(plot_data['title'])
+        if 'grid' in plot_data:
+            ax.grid()
+
+        # 1. przebieg: zakres osi jak w animacji, czyli ze wszystkich figur;
+        # remove() nie zmniejsza dataLim, więc późniejsze rysowanie go nie zmienia
+        for figure in data:
+            if not (figure.to_be_removed and figure.artist):
+                for a in figure.draw(ax):
+                    a.remove()
+        if 'axis_equal' in plot_data:
+            ax.axis('equal')
+        else:
+            ax.autoscale()
+
+        # klatka 0 (pusty wykres) + jedna na każde zdarzenie
+        events = len(data) + 1
+        group = 1 if not max_frames or events <= max_frames else math.ceil(events / max_frames)
+
+        writer = StreamingGifWriter(fps=1000 / interval)
+        with writer.saving(fig, f'{filename}.gif', fig.dpi):
+            writer.grab_frame()
+            pending = 0
+            for i, figure in enumerate(data):
+                if figure.to_be_removed and figure.artist:
+                    for a in figure.artist:
+                        a.remove()
+                    figure.artist = None
+                else:
+                    figure.artist = figure.draw(ax)
+                pending += 1
+                if pending == group or i == len(data) - 1:
+                    writer.grab_frame()
+                    pending = 0
+        plt.close(fig)
+        return writer.frames
+
     @staticmethod
     def save_gif(plot_data, data, interval, filename):
         anim = Plot.__build_gif(plot_data, data, interval)